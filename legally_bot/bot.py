@@ -21,6 +21,9 @@ async def main():
     # Initialize DB
     logging.info("🔌 Connecting to MongoDB...")
     MongoDB.connect()
+    await MongoDB.ensure_indexes()
+    from legally_bot.database.users_repo import UsersRepository
+    await UsersRepository.backfill_role_request_flags()
     
     # Initialize Bot & Dispatcher
     logging.info("🤖 Initializing Bot...")
@@ -41,6 +44,19 @@ async def main():
     # Register Middleware
     from legally_bot.middlewares.logging_middleware import LoggingMiddleware
     dp.update.middleware(LoggingMiddleware())
+    from legally_bot.middlewares.user_context_middleware import UserContextMiddleware
+    dp.update.middleware(UserContextMiddleware())
+
+    # Buffered writes for chat logs and feedback
+    from legally_bot.database.event_log import event_log
+    event_log.start()
+
+    # Resume batch jobs interrupted by the last shutdown
+    asyncio.create_task(admin_lms.resume_batch_jobs(bot))
+
+    # Precompute student case answers in the background
+    from legally_bot.services.answer_pool import answer_pool
+    asyncio.create_task(answer_pool.run_forever(admin_lms.batch_service))
 
     # Start Polling
     try:
@@ -55,6 +71,9 @@ async def main():
         
         await dp.start_polling(bot)
     finally:
+        await event_log.close()
+        from legally_bot.services.rag_engine import close_http
+        await close_http()
         MongoDB.close()
         await bot.session.close()
 
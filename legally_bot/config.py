@@ -1,6 +1,6 @@
 import os
 from pydantic_settings import BaseSettings, SettingsConfigDict
-from typing import List
+from typing import Dict, List
 
 class Settings(BaseSettings):
     BOT_TOKEN: str
@@ -23,6 +23,77 @@ class Settings(BaseSettings):
     SMTP_PASS: str = ""
     SMTP_FROM: str = "noreply@legallybot.com"
 
+    # RAG Tuning
+    RERANK_CACHE_SIZE: int = 5000  # Max cached (query, passage) cross-encoder scores
+
+    # RAG Scheduler
+    RAG_MAX_CONCURRENCY: int = 6    # Pipelines running at once across all callers
+    RAG_USER_CONCURRENCY: int = 2   # Per-user cap for chat / case work
+    RAG_BATCH_CONCURRENCY: int = 4  # Per-user cap for batch jobs
+
+    # Batch Jobs (bulk retrieval)
+    BATCH_RETRIEVAL_SIZE: int = 64   # Questions retrieved together in bulk mode
+    BATCH_QUERY_CONCURRENCY: int = 8 # Concurrent vector DB queries in bulk mode
+    ENCODE_BATCH_SIZE: int = 32      # Sentence-transformer batch size
+    RERANK_BATCH_SIZE: int = 128     # Cross-encoder batch size in bulk mode
+
+    # User Cache (request-scoped user context)
+    USER_CACHE_SIZE: int = 10000
+    USER_CACHE_TTL_SECONDS: int = 60
+
+    # MongoDB
+    MONGO_TRANSACTIONS: bool = False  # Multi-document transactions (needs a replica set)
+    RATED_COPY_BUFFERED: bool = False  # Without transactions: rated copies go through the event log (bulk, write-behind)
+
+    # Passage Store (retrieved texts stored once, referenced everywhere else)
+    PASSAGE_CACHE_SIZE: int = 50000          # Keys known to be stored already
+    PASSAGE_CACHE_TTL_SECONDS: int = 3600
+
+    # Write-behind event log (chat logs, feedback, buffered rated copies)
+    EVENT_LOG_BATCH_SIZE: int = 200        # Queued events per collection that trigger a flush
+    EVENT_LOG_FLUSH_SECONDS: float = 2.0   # Max time an event waits before being written
+    EVENT_LOG_MAX_PENDING: int = 10000     # Backpressure threshold across all collections
+    EVENT_LOG_MAX_WAIT_SECONDS: float = 5.0  # How long log() waits for room before dropping
+    EVENT_LOG_MAX_RETRIES: int = 5         # Failed flushes in a row before a collection's queued events are dropped
+
+    # MongoDB retention (TTL indexes)
+    CHAT_LOG_TTL_DAYS: int = 180
+    USAGE_TTL_DAYS: int = 400  # Longer than a month so monthly quota docs survive
+
+    # Paginated lists (inline next/prev buttons)
+    PAGE_SIZE: int = 10
+
+    # Professor Review Queue
+    REVIEW_LEASE_SECONDS: int = 600  # How long a claimed correction stays reserved for one professor
+
+    # Student Case Answer Pool
+    ANSWER_POOL_LANGS: List[str] = ["ru", "en", "kk"]
+    ANSWER_POOL_INTERVAL_SECONDS: int = 3600  # Re-check for new cases / index versions
+    ANSWER_POOL_REQUESTER_ID: int = 0  # Pseudo user the pool's batch work is capped and metered as
+
+    # LLM Rate Governor (requests / tokens per minute, per provider)
+    DEEPSEEK_RPM: int = 20
+    DEEPSEEK_TPM: int = 100000
+    GEMINI_RPM: int = 15
+    GEMINI_TPM: int = 1000000
+    GROQ_RPM: int = 30
+    GROQ_TPM: int = 12000
+    LLM_PERMIT_MAX_WAIT: float = 20.0  # Seconds to wait for a permit before trying the next provider
+
+    # Chat
+    CHAT_DEBOUNCE_SECONDS: float = 1.5  # Rapid-fire messages within this window become one query
+
+    # Overload / Load Shedding
+    OVERLOAD_QUEUE_DEPTH: int = 20          # Scheduler queue depth that triggers retrieval-only answers
+    PROVIDER_FAILURE_THRESHOLD: int = 3     # Consecutive failures before a provider is marked unhealthy
+    PROVIDER_COOLDOWN_SECONDS: float = 60.0
+    PROVIDER_SLOW_SECONDS: float = 25.0     # Latency EWMA above this marks a provider unhealthy
+    FOLLOWUP_MAX_WAIT_SECONDS: float = 600.0  # How long a deferred full answer may wait for capacity
+
+    # Token Quotas per role (0 = unlimited). Over quota -> cheaper 'lite' pipeline.
+    DAILY_TOKEN_QUOTAS: Dict[str, int] = {"guest": 30000, "user": 30000, "student": 150000, "professor": 300000, "admin": 0, "developer": 0}
+    MONTHLY_TOKEN_QUOTAS: Dict[str, int] = {"guest": 300000, "user": 300000, "student": 2000000, "professor": 4000000, "admin": 0, "developer": 0}
+
     ADMIN_IDS: str  # Comma separated list of admin IDs
 
     @property
@@ -0,0 +1,74 @@
+from legally_bot.database.mongo_db import db
+from datetime import datetime
+import random
+
+class AnswerPoolRepository:
+    """
+    Precomputed answers for practice cases, one document per (case, language).
+    e.g. {"case_id": ObjectId, "lang": "ru", "index_version": 3, "rand": 0.42,
+          "case_text": "...", "domain": "Civil", "answer": "...", "chunks": [...], "articles": [...]}
+    'rand' is a random key so a random case is one indexed read instead of $sample.
+    """
+    collection = "case_answers"
+
+    @classmethod
+    async def save_answer(cls, case: dict, lang: str, index_version: int, answer: str, chunks: list, articles: list):
+        await db.get_db()[cls.collection].update_one(
+            {"case_id": case["_id"], "lang": lang},
+            {"$set": {
+                "index_version": index_version,
+                "case_text": case.get("text") or case.get("question"),
+                "domain": case.get("domain") or case.get("subject") or "General",
+                "answer": answer,
+                "chunks": chunks,
+                "articles": articles,
+                "rand": random.random(),
+                "generated_at": datetime.utcnow()
+            }},
+            upsert=True
+        )
+
+    @classmethod
+    async def get_answers(cls, lang: str, case_ids: list) -> dict:
+        """case_id -> stored answer (version, case text and passage keys only) for the given cases."""
+        cursor = db.get_db()[cls.collection].find(
+            {"lang": lang, "case_id": {"$in": case_ids}},
+            {"case_id": 1, "index_version": 1, "case_text": 1, "chunks.key": 1, "articles.key": 1}
+        )
+        return {doc["case_id"]: doc async for doc in cursor}
+
+    @classmethod
+    async def mark_current(cls, lang: str, case_ids: list, index_version: int):
+        """Answers whose retrieved context did not change are carried over to the new version."""
+        if case_ids:
+            await db.get_db()[cls.collection].update_many(
+                {"lang": lang, "case_id": {"$in": case_ids}}, {"$set": {"index_version": index_version}}
+            )
+
+    @classmethod
+    async def prune_orphans(cls) -> int:
+        """Deletes answers of cases that no longer exist. Returns the number deleted."""
+        pipeline = [
+            {"$lookup": {"from": "cases", "localField": "case_id", "foreignField": "_id", "as": "case"}},
+            {"$match": {"case": {"$size": 0}}},
+            {"$project": {"_id": 1}}
+        ]
+        orphans = [doc["_id"] async for doc in db.get_db()[cls.collection].aggregate(pipeline)]
+        deleted = 0
+        for start in range(0, len(orphans), 1000):
+            result = await db.get_db()[cls.collection].delete_many({"_id": {"$in": orphans[start:start + 1000]}})
+            deleted += result.deleted_count
+        return deleted
+
+    @classmethod
+    async def get_random(cls, lang: str):
+        """
+        Random precomputed case via the (lang, rand) index.
+        Answers from an older index version are served until the worker replaces them.
+        """
+        col = db.get_db()[cls.collection]
+        r = random.random()
+        doc = await col.find_one({"lang": lang, "rand": {"$gte": r}}, sort=[("rand", 1)])
+        if not doc:
+            doc = await col.find_one({"lang": lang, "rand": {"$lt": r}}, sort=[("rand", -1)])
+        return doc
@@ -0,0 +1,165 @@
+from legally_bot.database.mongo_db import db
+from datetime import datetime
+from bson import ObjectId
+from pymongo import ReturnDocument
+import logging
+
+class BatchJobRepository:
+    """
+    Persistent batch jobs. One document per job in 'batch_jobs' and one per
+    question in 'batch_items', so a run can resume after a restart from the
+    last completed item.
+    Item status: pending -> success | failed | skipped
+    Job status: creating -> running -> completed | cancelled | failed
+    """
+    jobs = "batch_jobs"
+    items = "batch_items"
+    CHUNK_SIZE = 500  # Items per bulk insert / cursor batch
+
+    @classmethod
+    async def create_job(cls, filename: str, requested_by: int, chat_id: int, columns: list, chunks, output_format: str = "xlsx") -> ObjectId:
+        """
+        chunks: async iterable of lists of original file rows (dicts with a
+        'question' key), in input order, e.g. tabular_io.read_chunks().
+        Each chunk is inserted in bulk as it arrives, never all at once.
+        If reading or inserting fails, the items are removed, the job is
+        marked failed and the error is re-raised.
+        """
+        now = datetime.utcnow()
+        job = {
+            "filename": filename,
+            "requested_by": requested_by,
+            "chat_id": chat_id,
+            "columns": columns,
+            "output_format": output_format,
+            "status": "creating",
+            "total": 0,
+            "done": 0,
+            "failed": 0,
+            "created_at": now,
+            "updated_at": now
+        }
+        result = await db.get_db()[cls.jobs].insert_one(job)
+        job_id = result.inserted_id
+
+        total = 0
+        try:
+            async for rows in chunks:
+                items = []
+                for row in rows:
+                    items.append({
+                        "job_id": job_id,
+                        "index": total,
+                        "question": row.get("question"),
+                        "row": row,
+                        "status": "pending",
+                        "saved": False
+                    })
+                    total += 1
+                await db.get_db()[cls.items].insert_many(items, ordered=False)
+        except Exception as e:
+            # A file that fails mid-parse (or a failed insert) must not leave a half-built job behind
+            logging.error(f"❌ Creating batch job {job_id} failed after {total} items: {e}")
+            await db.get_db()[cls.items].delete_many({"job_id": job_id})
+            await db.get_db()[cls.jobs].update_one(
+                {"_id": job_id}, {"$set": {"status": "failed", "updated_at": datetime.utcnow()}}
+            )
+            raise
+
+        await db.get_db()[cls.jobs].update_one(
+            {"_id": job_id}, {"$set": {"status": "running", "total": total, "updated_at": datetime.utcnow()}}
+        )
+        logging.info(f"🗂️ Created batch job {job_id} with {total} items")
+        return job_id
+
+    @classmethod
+    async def get_job(cls, job_id: ObjectId):
+        return await db.get_db()[cls.jobs].find_one({"_id": job_id})
+
+    @classmethod
+    async def get_recent_jobs(cls, limit: int = 10):
+        cursor = db.get_db()[cls.jobs].find().sort("created_at", -1)
+        return await cursor.to_list(length=limit)
+
+    @classmethod
+    async def get_unfinished_jobs(cls):
+        cursor = db.get_db()[cls.jobs].find({"status": "running"})
+        return await cursor.to_list(length=100)
+
+    @classmethod
+    async def count_pending(cls, job_id: ObjectId) -> int:
+        return await db.get_db()[cls.items].count_documents({"job_id": job_id, "status": "pending"})
+
+    @classmethod
+    async def iter_pending_items(cls, job_id: ObjectId):
+        """
+        Pending items in input order (async for), CHUNK_SIZE at a time.
+        Each chunk is a short query continuing after the last index, so no
+        cursor has to stay open for the length of the job.
+        """
+        last = -1
+        while True:
+            chunk = await db.get_db()[cls.items].find(
+                {"job_id": job_id, "status": "pending", "index": {"$gt": last}}, {"index": 1, "question": 1}
+            ).sort("index", 1).to_list(length=cls.CHUNK_SIZE)
+            for item in chunk:
+                yield item
+            if len(chunk) < cls.CHUNK_SIZE:
+                return
+            last = chunk[-1]["index"]
+
+    @classmethod
+    def iter_items(cls, job_id: ObjectId):
+        """Cursor over all items of a job in input order (async for)."""
+        return db.get_db()[cls.items].find({"job_id": job_id}).sort("index", 1).batch_size(cls.CHUNK_SIZE)
+
+    @classmethod
+    async def save_item_result(cls, job_id: ObjectId, index: int, result: dict):
+        """Checkpoints one finished question and bumps the job counters."""
+        status = "success" if result["status"] == "success" else ("skipped" if result["status"].startswith("skipped") else "failed")
+        await db.get_db()[cls.items].update_one(
+            {"job_id": job_id, "index": index},
+            {"$set": {
+                "status": status,
+                "error": None if status != "failed" else result["status"],
+                "answer": result["answer"],
+                "chunks": result["chunks"],
+                "articles": result["articles"],
+                "elapsed_s": result.get("elapsed_s"),
+                "finished_at": datetime.utcnow()
+            }}
+        )
+        await db.get_db()[cls.jobs].update_one(
+            {"_id": job_id},
+            {"$inc": {"done": 1, "failed": 1 if status == "failed" else 0}, "$set": {"updated_at": datetime.utcnow()}}
+        )
+
+    @classmethod
+    async def set_status(cls, job_id: ObjectId, status: str):
+        return await db.get_db()[cls.jobs].find_one_and_update(
+            {"_id": job_id},
+            {"$set": {"status": status, "updated_at": datetime.utcnow()}},
+            return_document=ReturnDocument.AFTER
+        )
+
+    @classmethod
+    async def reset_failed(cls, job_id: ObjectId) -> int:
+        """Puts failed items back to pending and reopens the job. Returns the number of items reset."""
+        result = await db.get_db()[cls.items].update_many(
+            {"job_id": job_id, "status": "failed"},
+            {"$set": {"status": "pending", "error": None}}
+        )
+        if result.modified_count:
+            await db.get_db()[cls.jobs].update_one(
+                {"_id": job_id},
+                {"$inc": {"done": -result.modified_count, "failed": -result.modified_count},
+                 "$set": {"status": "running", "updated_at": datetime.utcnow()}}
+            )
+        return result.modified_count
+
+    @classmethod
+    async def mark_saved(cls, job_id: ObjectId, indexes: list):
+        if indexes:
+            await db.get_db()[cls.items].update_many(
+                {"job_id": job_id, "index": {"$in": indexes}}, {"$set": {"saved": True}}
+            )
@@ -1,21 +1,33 @@
 
 from datetime import datetime
 from motor.motor_asyncio import AsyncIOMotorDatabase
+from pymongo import ReturnDocument
+from pymongo.errors import BulkWriteError, DuplicateKeyError
+from legally_bot.config import settings
+from legally_bot.database.event_log import event_log
+from legally_bot.database.stats_repo import StatsRepository
+from legally_bot.database.pagination import keyset_query, keyset_page
 import logging
 
+class AssignResult:
+    ASSIGNED = "assigned"
+    ALREADY_ASSIGNED = "already_assigned"  # Unique (case_id, assigned_to): the existing assignment is kept
+    NOT_FOUND = "not_found"
+
+RATING_FIELDS = ("ratings", "comment", "rated_by", "rated_at")
+
 class CaseRepository:
     def __init__(self, db: AsyncIOMotorDatabase):
         self.db = db
         # Collections
         self.cases = db.cases                 # Admin Library of Questions
-        self.student_cases = db.student_cases # Assigned to Student
-        self.professor_cases = db.professor_cases # Assigned to Professor (or escalated)
+        self.assignments = db.assignments     # References: (case, assignee, role, status, ratings)
         self.rated_questions = db.rated_questions # Final Rated Data
         self.chat_questions = db.chat_questions # Regular Chat History
 
     async def log_chat_question(self, user_id, question, answer, chunks, articles):
-        """Logs normal chat interactions."""
-        await self.chat_questions.insert_one({
+        """Logs normal chat interactions (buffered; see database/event_log.py)."""
+        await event_log.log(self.chat_questions.name, {
             "user_id": user_id,
             "question": question,
             "answer": answer,
@@ -25,71 +37,178 @@ class CaseRepository:
         })
 
     async def save_admin_cases(self, cases_data: list, saver_id: int):
-        """Saves a batch of questions uploaded by Admin/Dev."""
+        """
+        Saves a batch of questions uploaded by Admin/Dev.
+        chunks/articles are lists of structured references (see services/references.py).
+        """
         documents = []
         for case in cases_data:
             documents.append({
                 "question": case['question'],
                 "answer": case['ai_answer'],
-                "chunks": case['chunks'],
-                "articles": case['articles'],
+                "chunks": case.get('chunks') or [],
+                "articles": case.get('articles') or [],
                 "saved_by": saver_id,
                 "saved_at": datetime.utcnow(),
-                "subject": case.get('subject', 'General'),
+                "subject": case.get('subject') or 'General',
                 "status": "new"
             })
         if documents:
-            await self.cases.insert_many(documents)
+            # Unordered: one bad document does not stop the rest of the batch
+            try:
+                await self.cases.insert_many(documents, ordered=False)
+            except BulkWriteError as e:
+                logging.error(f"Some cases failed to save: {len(e.details.get('writeErrors', []))} errors")
             logging.info(f"💾 Saved {len(documents)} cases to Admin Library.")
 
+    async def _assign(self, case_id, assignee_id, assignee_role, escalated_from=None) -> str:
+        """
+        Inserts an assignment reference. Returns an AssignResult. If the assignee
+        already has the case, an escalation is linked to the open assignment.
+        """
+        if not await self.cases.find_one({"_id": case_id}, {"_id": 1}):
+            return AssignResult.NOT_FOUND
+        try:
+            await self.assignments.insert_one({
+                "case_id": case_id,
+                "assigned_to": assignee_id,
+                "assignee_role": assignee_role,
+                "escalated_from": escalated_from,
+                "assigned_at": datetime.utcnow(),
+                "status": "assigned"
+            })
+        except DuplicateKeyError:
+            logging.info(f"Case {case_id} is already assigned to {assignee_id}")
+            if escalated_from is not None:
+                await self.assignments.update_one(
+                    {"case_id": case_id, "assigned_to": assignee_id, "status": "assigned", "escalated_from": None},
+                    {"$set": {"escalated_from": escalated_from}}
+                )
+            return AssignResult.ALREADY_ASSIGNED
+        return AssignResult.ASSIGNED
+
     async def assign_case_to_student(self, case_id, student_id):
-        """Copies a case to student_cases."""
-        case = await self.cases.find_one({"_id": case_id})
-        if not case:
-            return False
-        
-        # Create assignment
-        assignment = case.copy()
-        assignment["original_case_id"] = case["_id"]
-        assignment["assigned_to"] = student_id
-        assignment["assigned_at"] = datetime.utcnow()
-        assignment["status"] = "assigned"
-        del assignment["_id"] # New ID for assignment
-        
-        await self.student_cases.insert_one(assignment)
-        return True
+        """Assigns a library case to a student (reference only, the case is not copied)."""
+        return await self._assign(case_id, student_id, "student")
 
     async def assign_case_to_professor(self, case_id, professor_id, from_collection="cases"):
-        """Copies a case to professor_cases."""
-        # Can be from 'cases' (direct assignment) or 'student_cases' (escalation)
+        """
+        Assigns a case to a professor.
+        from_collection='cases': case_id is a library case (direct assignment).
+        from_collection='assignments': case_id is a student's assignment (escalation).
+        """
         if from_collection == "cases":
-            source_col = self.cases
-        elif from_collection == "student_cases":
-            source_col = self.student_cases
-        else:
-            return False
+            return await self._assign(case_id, professor_id, "professor")
+        if from_collection == "assignments":
+            source = await self.assignments.find_one({"_id": case_id}, {"case_id": 1})
+            if not source:
+                return AssignResult.NOT_FOUND
+            return await self._assign(source["case_id"], professor_id, "professor", escalated_from=case_id)
+        return AssignResult.NOT_FOUND
 
-        case = await source_col.find_one({"_id": case_id})
-        if not case:
-            return False
+    async def bulk_assign(self, pairs: list, assignee_role: str, assigned_by: int = None) -> dict:
+        """
+        Writes many (case_id, assignee_id) assignments in one unordered bulk insert.
+        Existing assignments are skipped by the unique (case_id, assigned_to) index.
+        Returns {"inserted", "duplicates", "errors"}.
+        """
+        now = datetime.utcnow()
+        documents = [{
+            "case_id": case_id,
+            "assigned_to": assignee_id,
+            "assignee_role": assignee_role,
+            "escalated_from": None,
+            "assigned_by": assigned_by,
+            "assigned_at": now,
+            "status": "assigned"
+        } for case_id, assignee_id in dict.fromkeys(pairs)]  # Drop repeats, keep order
+        result = {"inserted": 0, "duplicates": len(pairs) - len(documents), "errors": 0}
+        if not documents:
+            return result
+        try:
+            inserted = await self.assignments.insert_many(documents, ordered=False)
+            result["inserted"] = len(inserted.inserted_ids)
+        except BulkWriteError as e:
+            write_errors = e.details.get("writeErrors", [])
+            duplicates = sum(1 for err in write_errors if err.get("code") == 11000)
+            result["inserted"] = e.details.get("nInserted", 0)
+            result["duplicates"] += duplicates
+            result["errors"] = len(write_errors) - duplicates
+        logging.info(f"📌 Bulk assignment: {result}")
+        return result
 
-        assignment = case.copy()
-        assignment["assigned_to"] = professor_id
-        assignment["assigned_at"] = datetime.utcnow()
-        assignment["status"] = "assigned"
-        if "_id" in assignment:
-             del assignment["_id"]
-             
-        await self.professor_cases.insert_one(assignment)
-        return True
+    async def get_open_loads(self, assignee_ids: list) -> dict:
+        """Open (status 'assigned') assignment count per assignee."""
+        pipeline = [
+            {"$match": {"assigned_to": {"$in": assignee_ids}, "status": "assigned"}},
+            {"$group": {"_id": "$assigned_to", "open": {"$sum": 1}}}
+        ]
+        return {doc["_id"]: doc["open"] async for doc in self.assignments.aggregate(pipeline)}
+
+    async def get_case_ids(self, subject: str = None) -> list:
+        query = {"subject": subject} if subject else {}
+        return [doc["_id"] async for doc in self.cases.find(query, {"_id": 1}).sort("_id", 1)]
+
+    async def get_existing_case_ids(self, case_ids: list) -> set:
+        return {doc["_id"] async for doc in self.cases.find({"_id": {"$in": case_ids}}, {"_id": 1})}
 
-    async def submit_rating(self, collection_name, case_id, ratings, comment, rater_id):
+    async def get_open_assignments_page(self, user_id, after=None, before=None, limit: int = settings.PAGE_SIZE) -> dict:
+        """One keyset page of a user's pending assignments, newest first, with the case question and subject."""
+        query, sort = keyset_query({"assigned_to": user_id, "status": "assigned"}, after, before, descending=True)
+        pipeline = [
+            {"$match": query},
+            {"$sort": dict(sort)},
+            {"$limit": limit + 1},
+            {"$lookup": {
+                "from": "cases",
+                "localField": "case_id",
+                "foreignField": "_id",
+                "as": "case"
+            }},
+            {"$unwind": "$case"},
+            {"$project": {"question": "$case.question", "subject": "$case.subject", "assigned_at": 1}}
+        ]
+        docs = await self.assignments.aggregate(pipeline).to_list(length=limit + 1)
+        return keyset_page(docs, limit, after, before)
+
+    async def get_cases_page(self, subject: str = None, after=None, before=None, limit: int = settings.PAGE_SIZE) -> dict:
+        """One keyset page of the case library (optionally one subject), newest first."""
+        query, sort = keyset_query({"subject": subject} if subject else {}, after, before, descending=True)
+        cursor = self.cases.find(query, {"question": 1, "subject": 1, "status": 1}).sort(sort).limit(limit + 1)
+        return keyset_page(await cursor.to_list(length=limit + 1), limit, after, before)
+
+    async def get_assignment_with_case(self, assignment_id):
+        """One assignment joined with the case fields needed to display and rate it."""
+        pipeline = [
+            {"$match": {"_id": assignment_id}},
+            {"$lookup": {
+                "from": "cases",
+                "localField": "case_id",
+                "foreignField": "_id",
+                "as": "case"
+            }},
+            {"$unwind": "$case"},
+            {"$project": {
+                "case_id": 1, "assigned_to": 1, "assignee_role": 1, "status": 1,
+                "question": "$case.question", "answer": "$case.answer",
+                "chunks": "$case.chunks", "articles": "$case.articles", "subject": "$case.subject"
+            }}
+        ]
+        docs = await self.assignments.aggregate(pipeline).to_list(length=1)
+        return docs[0] if docs else None
+
+    async def submit_rating(self, assignment_id, ratings, comment, rater_id) -> bool:
         """
-        Updates the case with ratings and copies to rated_questions.
-        collection_name: 'student_cases' or 'professor_cases'
+        Rates an assignment and copies it to rated_questions.
+        The rating is one find_one_and_update that only matches an assignment
+        not yet rated, so a double submit cannot produce two copies. The copy
+        references the library case by case_id. With MONGO_TRANSACTIONS both
+        writes share a transaction (replica set required); otherwise, with
+        RATED_COPY_BUFFERED, the copy is queued on the event log and written
+        in bulk (flushed every EVENT_LOG_FLUSH_SECONDS and on shutdown).
+        Stats are updated afterwards.
+        Returns False if the assignment does not exist or was already rated.
         """
-        collection = self.db[collection_name]
-        
         update_data = {
             "ratings": ratings, # {question: 0-10, chunk: 0-10, article: 0-10}
             "comment": comment,
@@ -97,14 +216,89 @@ class CaseRepository:
             "rated_at": datetime.utcnow(),
             "status": "rated"
         }
-        
-        await collection.update_one({"_id": case_id}, {"$set": update_data})
-        
-        # Copy to Global Rated Collection
-        rated_doc = await collection.find_one({"_id": case_id})
-        if rated_doc:
-            rated_doc["original_collection"] = collection_name
-            del rated_doc["_id"]
-            await self.rated_questions.insert_one(rated_doc)
-            
+
+        async def write(session=None):
+            rated = await self.assignments.find_one_and_update(
+                {"_id": assignment_id, "status": {"$ne": "rated"}},
+                {"$set": update_data},
+                return_document=ReturnDocument.AFTER,
+                session=session
+            )
+            if not rated:
+                return None
+            # Copy to Global Rated Collection
+            rated["assignment_id"] = rated.pop("_id")
+            rated["original_collection"] = "assignments"
+            if session is None and settings.RATED_COPY_BUFFERED:
+                await event_log.log(self.rated_questions.name, dict(rated))
+            else:
+                await self.rated_questions.insert_one(rated, session=session)
+            return rated
+
+        if settings.MONGO_TRANSACTIONS:
+            async with await self.db.client.start_session() as session:
+                async with session.start_transaction():
+                    rated = await write(session)
+        else:
+            rated = await write()
+        if not rated:
+            return False
+        await self._record_rating_stats(rated)
         return True
+
+    async def _record_rating_stats(self, rated: dict):
+        """Rolls a rating into the rater, subject and article stats. Failures are repaired by a stats rebuild."""
+        try:
+            case = await self.cases.find_one({"_id": rated.get("case_id")}, {"subject": 1, "articles": 1}) or {}
+            articles = case.get("articles")
+            await StatsRepository.record_rating(
+                rated["rated_by"], rated["ratings"], case.get("subject"),
+                articles if isinstance(articles, list) else []
+            )
+        except Exception as e:
+            logging.error(f"Failed to update rating stats for {rated.get('assignment_id')}: {e}")
+
+    async def migrate_legacy_assignments(self) -> int:
+        """
+        Moves copied assignments from student_cases/professor_cases into references
+        in 'assignments'. Copies without an original case id are matched to a library
+        case by question and answer, and added to the library only if none matches.
+        A copy whose assignment already exists merges its rating into it (unless
+        that one is rated) before the copy is deleted.
+        """
+        migrated = 0
+        for legacy, role in ((self.db.student_cases, "student"), (self.db.professor_cases, "professor")):
+            async for doc in legacy.find():
+                case_id = doc.get("original_case_id")
+                if not case_id or not await self.cases.find_one({"_id": case_id}, {"_id": 1}):
+                    match = await self.cases.find_one({"question": doc.get("question"), "answer": doc.get("answer")}, {"_id": 1})
+                    case_id = match["_id"] if match else None
+                if not case_id:
+                    case = {k: doc.get(k) for k in ("question", "answer", "chunks", "articles", "subject", "saved_by", "saved_at")}
+                    case["status"] = "migrated"
+                    case_id = (await self.cases.insert_one(case)).inserted_id
+                assignment = {
+                    "case_id": case_id,
+                    "assigned_to": doc.get("assigned_to"),
+                    "assignee_role": role,
+                    "escalated_from": None,
+                    "assigned_at": doc.get("assigned_at") or datetime.utcnow(),
+                    "status": doc.get("status", "assigned")
+                }
+                for key in RATING_FIELDS:
+                    if key in doc:
+                        assignment[key] = doc[key]
+                try:
+                    await self.assignments.insert_one(assignment)
+                except DuplicateKeyError:
+                    if assignment["status"] == "rated":
+                        rating = {k: assignment[k] for k in RATING_FIELDS + ("status",) if k in assignment}
+                        await self.assignments.update_one(
+                            {"case_id": case_id, "assigned_to": assignment["assigned_to"], "status": {"$ne": "rated"}},
+                            {"$set": rating}
+                        )
+                await legacy.delete_one({"_id": doc["_id"]})
+                migrated += 1
+        if migrated:
+            logging.info(f"📦 Migrated {migrated} legacy assignments to references")
+        return migrated
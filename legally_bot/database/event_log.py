@@ -0,0 +1,157 @@
+import asyncio
+import logging
+import time
+from datetime import datetime
+import bson
+from pymongo.errors import BulkWriteError
+from legally_bot.database.mongo_db import db
+from legally_bot.config import settings
+from legally_bot.services.metrics import metrics
+
+class EventLogger:
+    """
+    Write-behind buffer for append-only event documents (chat logs, feedback,
+    rated copies with RATED_COPY_BUFFERED).
+    log() only queues the document; a background flusher writes each
+    collection's queue with one unordered insert_many when EVENT_LOG_BATCH_SIZE
+    documents are waiting or every EVENT_LOG_FLUSH_SECONDS.
+    When EVENT_LOG_MAX_PENDING documents are queued (Mongo slow or down),
+    log() waits for a flush to make room, up to EVENT_LOG_MAX_WAIT_SECONDS,
+    and then drops the event.
+    A failed flush is retried EVENT_LOG_MAX_RETRIES times before the queued
+    events are dropped. Documents that cannot be encoded are never retried;
+    they go to DEAD_LETTERS as a text dump.
+    """
+    DEAD_LETTERS = "event_log_dead_letters"
+    MAX_DOCUMENT_BYTES = 16 * 1024 * 1024  # MongoDB document size limit
+
+    def __init__(self):
+        self._buffers = {}  # collection -> [documents]
+        self._failures = {}  # collection -> failed flushes in a row
+        self._pending = 0
+        self._wake = asyncio.Event()
+        self._space = asyncio.Event()
+        self._flush_lock = asyncio.Lock()
+        self._task = None
+
+    @property
+    def pending(self) -> int:
+        return self._pending
+
+    async def log(self, collection: str, doc: dict) -> bool:
+        """Queues one document. Returns False if it was dropped under backpressure."""
+        if self._pending >= settings.EVENT_LOG_MAX_PENDING:
+            metrics.inc("event_log.backpressure")
+            self._wake.set()
+            try:
+                while self._pending >= settings.EVENT_LOG_MAX_PENDING:
+                    self._space.clear()
+                    await asyncio.wait_for(self._space.wait(), settings.EVENT_LOG_MAX_WAIT_SECONDS)
+            except asyncio.TimeoutError:
+                metrics.inc("event_log.dropped")
+                logging.warning(f"⚠️ Event log full ({self._pending} pending); dropped a {collection} event")
+                return False
+
+        self._buffers.setdefault(collection, []).append(doc)
+        self._pending += 1
+        metrics.set_gauge("event_log.pending", self._pending)
+        if self._task is None:
+            # No flusher running (scripts, tests): write through
+            await self.flush()
+        elif len(self._buffers[collection]) >= settings.EVENT_LOG_BATCH_SIZE:
+            self._wake.set()
+        return True
+
+    async def flush(self) -> int:
+        """Writes everything queued so far. Failed documents are re-queued, up to EVENT_LOG_MAX_RETRIES times."""
+        async with self._flush_lock:
+            written = 0
+            for collection in list(self._buffers):
+                docs = self._buffers.pop(collection)
+                if not docs:
+                    continue
+                started = time.perf_counter()
+                try:
+                    await db.get_db()[collection].insert_many(docs, ordered=False)
+                    count = len(docs)
+                except BulkWriteError as e:
+                    # Per-document errors (e.g. duplicates) are not retried
+                    count = e.details.get("nInserted", 0)
+                    logging.error(f"❌ Event log: {len(docs) - count} {collection} events rejected")
+                except Exception as e:
+                    docs = await self._dead_letter(collection, docs)
+                    self._failures[collection] = self._failures.get(collection, 0) + 1
+                    if docs and self._failures[collection] < settings.EVENT_LOG_MAX_RETRIES:
+                        logging.error(f"❌ Event log flush to {collection} failed, will retry: {e}")
+                        self._buffers[collection] = docs + self._buffers.get(collection, [])
+                        continue
+                    if docs:
+                        metrics.inc("event_log.dropped", len(docs))
+                        logging.error(f"❌ Event log flush to {collection} failed {self._failures[collection]} times, dropped {len(docs)} events: {e}")
+                    self._pending -= len(docs)
+                    del self._failures[collection]
+                    continue
+                self._failures.pop(collection, None)
+                metrics.observe("event_log.flush_s", time.perf_counter() - started)
+                metrics.inc("event_log.written", count)
+                self._pending -= len(docs)
+                written += count
+            metrics.set_gauge("event_log.pending", self._pending)
+            if self._pending < settings.EVENT_LOG_MAX_PENDING:
+                self._space.set()
+            return written
+
+    async def _dead_letter(self, collection: str, docs: list) -> list:
+        """
+        Moves documents that cannot be encoded (bad types, over the size limit)
+        to DEAD_LETTERS and returns the rest, which are worth retrying.
+        """
+        valid, invalid = [], []
+        for doc in docs:
+            try:
+                if len(bson.encode(doc)) <= self.MAX_DOCUMENT_BYTES:
+                    valid.append(doc)
+                    continue
+                error = "document too large"
+            except Exception as e:
+                error = str(e)
+            invalid.append({"collection": collection, "error": error, "dump": repr(doc)[:10000], "failed_at": datetime.utcnow()})
+        if invalid:
+            self._pending -= len(invalid)
+            metrics.inc("event_log.dead_lettered", len(invalid))
+            logging.error(f"❌ Event log: {len(invalid)} {collection} events cannot be stored, moved to {self.DEAD_LETTERS}")
+            try:
+                await db.get_db()[self.DEAD_LETTERS].insert_many(invalid, ordered=False)
+            except Exception as e:
+                logging.error(f"❌ Event log: dead-lettering failed, events lost: {e}")
+        return valid
+
+    async def _run(self):
+        while True:
+            try:
+                await asyncio.wait_for(self._wake.wait(), settings.EVENT_LOG_FLUSH_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+            self._wake.clear()
+            if self._pending:
+                await self.flush()
+
+    def start(self):
+        if self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self):
+        """Stops the flusher and writes whatever is still queued (call before closing Mongo)."""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        written = await self.flush()
+        if self._pending:
+            logging.error(f"❌ Event log closed with {self._pending} unwritten events")
+        logging.info(f"🗒️ Event log flushed {written} events on shutdown")
+
+event_log = EventLogger()
@@ -1,6 +1,10 @@
 from legally_bot.database.mongo_db import db
-from datetime import datetime
+from datetime import datetime, timedelta
 from bson.objectid import ObjectId
+from pymongo import ReturnDocument
+from legally_bot.config import settings
+from legally_bot.database.event_log import event_log
+from legally_bot.database.pagination import keyset_query, keyset_page
 
 class FeedbackRepository:
     cases_collection = "cases"
@@ -44,19 +48,81 @@ class FeedbackRepository:
             "professor_validation_status": "pending" if error_type else "approved", # If no error, auto-approve
             "created_at": datetime.utcnow()
         }
-        await db.get_db()[cls.feedback_collection].insert_one(feedback_data)
+        # Written behind by the event log, off the interaction's critical path
+        await event_log.log(cls.feedback_collection, feedback_data)
+
+    # --- Professor review queue (leases) ---
+    # A pending item is free when it has no lease or its lease has expired, so
+    # abandoned claims return to the queue on their own.
+    @staticmethod
+    def _unleased(now: datetime) -> list:
+        return [{"lease_expires_at": None}, {"lease_expires_at": {"$lte": now}}]
 
     @classmethod
-    async def get_pending_feedback(cls):
-        cursor = db.get_db()[cls.feedback_collection].find({"professor_validation_status": "pending"})
-        return await cursor.to_list(length=50)
+    async def claim_next(cls, professor_id: int, exclude_id: str = None):
+        """
+        Returns the pending item this professor already holds, or else atomically
+        leases the oldest free one. Either way the lease runs for another
+        REVIEW_LEASE_SECONDS. Returns None when nothing is available.
+        """
+        now = datetime.utcnow()
+        lease = {"$set": {
+            "lease_owner": professor_id,
+            "lease_expires_at": now + timedelta(seconds=settings.REVIEW_LEASE_SECONDS)
+        }}
+        held = {"professor_validation_status": "pending", "lease_owner": professor_id, "lease_expires_at": {"$gt": now}}
+        free = {"professor_validation_status": "pending", "$or": cls._unleased(now)}
+        collection = db.get_db()[cls.feedback_collection]
+        # A professor holds at most one item: finish (or skip) it before taking another
+        for query in (held, free):
+            if exclude_id:
+                query["_id"] = {"$ne": ObjectId(exclude_id)}
+            item = await collection.find_one_and_update(
+                query, lease, sort=[("created_at", 1)], return_document=ReturnDocument.AFTER
+            )
+            if item:
+                return item
+        return None
 
     @classmethod
-    async def validate_feedback(cls, feedback_id: str, status: str): # status: approved/rejected
+    async def release(cls, feedback_id: str, professor_id: int):
+        """Gives a leased item back to the queue (e.g. the professor skipped it)."""
         await db.get_db()[cls.feedback_collection].update_one(
-            {"_id": ObjectId(feedback_id)},
-            {"$set": {"professor_validation_status": status}}
+            {"_id": ObjectId(feedback_id), "lease_owner": professor_id},
+            {"$set": {"lease_owner": None, "lease_expires_at": None}}
+        )
+
+    @classmethod
+    async def get_pending_page(cls, after=None, before=None, limit: int = settings.PAGE_SIZE) -> dict:
+        """One keyset page of pending corrections, oldest first (read-only; reviewing goes through claim_next)."""
+        query, sort = keyset_query({"professor_validation_status": "pending"}, after, before)
+        cursor = db.get_db()[cls.feedback_collection].find(query).sort(sort).limit(limit + 1)
+        return keyset_page(await cursor.to_list(length=limit + 1), limit, after, before)
+
+    @classmethod
+    async def count_pending(cls) -> int:
+        return await db.get_db()[cls.feedback_collection].count_documents({"professor_validation_status": "pending"})
+
+    @classmethod
+    async def validate_feedback(cls, feedback_id: str, status: str, professor_id: int = None) -> bool: # status: approved/rejected
+        """
+        Resolves a pending item. With professor_id the caller must still hold
+        the lease (or it must have lapsed unclaimed). Returns False otherwise.
+        """
+        query = {"_id": ObjectId(feedback_id), "professor_validation_status": "pending"}
+        if professor_id is not None:
+            query["$or"] = [{"lease_owner": professor_id}] + cls._unleased(datetime.utcnow())
+        result = await db.get_db()[cls.feedback_collection].update_one(
+            query,
+            {"$set": {
+                "professor_validation_status": status,
+                "validated_by": professor_id,
+                "validated_at": datetime.utcnow(),
+                "lease_owner": None,
+                "lease_expires_at": None
+            }}
         )
+        return result.modified_count == 1
 
     # --- RAG Chat Feedback ---
     @classmethod
@@ -68,4 +134,4 @@ class FeedbackRepository:
             "comment": comment,
             "created_at": datetime.utcnow()
         }
-        await db.get_db()["chat_feedback"].insert_one(data)
+        await event_log.log("chat_feedback", data)
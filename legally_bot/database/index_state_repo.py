@@ -0,0 +1,26 @@
+from legally_bot.database.mongo_db import db
+from datetime import datetime
+from pymongo import ReturnDocument
+
+class IndexStateRepository:
+    """
+    Monotonic version of the vector index contents.
+    Bumped after every ingestion; precomputed answers are tagged with it.
+    """
+    collection = "index_state"
+    key = "pinecone"
+
+    @classmethod
+    async def get_version(cls) -> int:
+        doc = await db.get_db()[cls.collection].find_one({"_id": cls.key})
+        return doc.get("version", 0) if doc else 0
+
+    @classmethod
+    async def bump(cls, reason: str = "") -> int:
+        doc = await db.get_db()[cls.collection].find_one_and_update(
+            {"_id": cls.key},
+            {"$inc": {"version": 1}, "$set": {"updated_at": datetime.utcnow(), "reason": reason}},
+            upsert=True,
+            return_document=ReturnDocument.AFTER
+        )
+        return doc["version"]
@@ -0,0 +1,121 @@
+import logging
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import OperationFailure
+from legally_bot.config import settings
+
+DAY = 24 * 3600
+
+# Declarative index registry: (collection, keys, options).
+# Applied at startup; create_index is a no-op when the same index already exists.
+INDEXES = [
+    # users
+    ("users", [("telegram_id", ASCENDING)], {"unique": True, "name": "telegram_id_unique"}),
+    ("users", [("actual_role", ASCENDING), ("_id", ASCENDING)], {"name": "actual_role"}),
+    ("users", [("role_request_pending", ASCENDING), ("_id", ASCENDING)], {"name": "role_request_pending"}),
+
+    # assignments (per assignee, by status, newest first by _id; one per case and assignee)
+    ("assignments", [("assigned_to", ASCENDING), ("status", ASCENDING), ("_id", DESCENDING)], {"name": "assignee_status_id"}),
+    ("assignments", [("case_id", ASCENDING), ("assigned_to", ASCENDING)], {"unique": True, "name": "case_assignee"}),
+
+    # case library / rated data
+    ("cases", [("status", ASCENDING), ("saved_at", DESCENDING)], {"name": "status_saved_at"}),
+    ("cases", [("subject", ASCENDING), ("_id", DESCENDING)], {"name": "subject_id"}),
+    ("rated_questions", [("rated_by", ASCENDING), ("rated_at", DESCENDING)], {"name": "rater"}),
+
+    # feedback
+    ("feedback_logs", [("professor_validation_status", ASCENDING), ("created_at", ASCENDING)], {"name": "validation_queue"}),
+    ("feedback_logs", [("professor_validation_status", ASCENDING), ("_id", ASCENDING)], {"name": "validation_id"}),
+    # review leases: free/expired items, and the items a professor already holds
+    ("feedback_logs", [("professor_validation_status", ASCENDING), ("lease_expires_at", ASCENDING), ("created_at", ASCENDING)], {"name": "validation_lease"}),
+    ("feedback_logs", [("professor_validation_status", ASCENDING), ("lease_owner", ASCENDING)], {"name": "validation_lease_owner"}),
+    ("feedback_logs", [("student_id", ASCENDING), ("created_at", DESCENDING)], {"name": "student"}),
+
+    # logs (expire automatically)
+    ("chat_questions", [("timestamp", ASCENDING)], {"name": "ttl_timestamp", "expireAfterSeconds": settings.CHAT_LOG_TTL_DAYS * DAY}),
+    ("chat_questions", [("user_id", ASCENDING), ("timestamp", DESCENDING)], {"name": "user_timestamp"}),
+
+    # token usage
+    ("token_usage", [("user_id", ASCENDING), ("period", ASCENDING), ("key", ASCENDING)], {"unique": True, "name": "user_period_key"}),
+    ("token_usage", [("period", ASCENDING), ("key", ASCENDING), ("tokens", DESCENDING)], {"name": "period_top"}),
+    ("token_usage", [("updated_at", ASCENDING)], {"name": "ttl_updated_at", "expireAfterSeconds": settings.USAGE_TTL_DAYS * DAY}),
+
+    # batch jobs
+    ("batch_jobs", [("status", ASCENDING)], {"name": "status"}),
+    ("batch_jobs", [("created_at", DESCENDING)], {"name": "created_at"}),
+    ("batch_items", [("job_id", ASCENDING), ("index", ASCENDING)], {"unique": True, "name": "job_index"}),
+    ("batch_items", [("job_id", ASCENDING), ("status", ASCENDING), ("index", ASCENDING)], {"name": "job_status_index"}),
+
+    # materialized stats (documents are read by _id; this serves the top lists)
+    ("stats", [("scope", ASCENDING), ("ratings", DESCENDING)], {"name": "scope_ratings"}),
+
+    # precomputed case answers
+    ("case_answers", [("case_id", ASCENDING), ("lang", ASCENDING)], {"unique": True, "name": "case_lang"}),
+    ("case_answers", [("lang", ASCENDING), ("rand", ASCENDING)], {"name": "lang_rand"}),
+    ("case_answers", [("lang", ASCENDING), ("index_version", ASCENDING)], {"name": "lang_version"}),
+]
+
+# Representative repository queries for /explain_indexes: (collection, filter, sort)
+VERIFY_QUERIES = [
+    ("users", {"telegram_id": 0}, None),
+    ("users", {"actual_role": "student"}, [("_id", ASCENDING)]),
+    ("users", {"role_request_pending": True}, [("_id", ASCENDING)]),
+    ("assignments", {"assigned_to": 0, "status": "assigned"}, [("_id", DESCENDING)]),
+    ("cases", {"subject": "General"}, [("_id", DESCENDING)]),
+    ("feedback_logs", {"professor_validation_status": "pending"}, [("_id", ASCENDING)]),
+    ("feedback_logs", {"professor_validation_status": "pending", "$or": [{"lease_expires_at": None}, {"lease_owner": 0}]}, [("created_at", ASCENDING)]),
+    ("token_usage", {"user_id": 0, "$or": [{"period": "day", "key": ""}, {"period": "month", "key": ""}]}, None),
+    ("token_usage", {"period": "day", "key": ""}, [("tokens", DESCENDING)]),
+    ("batch_jobs", {"status": "running"}, None),
+    ("batch_jobs", {}, [("created_at", DESCENDING)]),
+    ("batch_items", {"job_id": None, "status": "pending"}, [("index", ASCENDING)]),
+    ("batch_items", {"job_id": None}, [("index", ASCENDING)]),
+    ("stats", {"scope": "subject"}, [("ratings", DESCENDING)]),
+    ("case_answers", {"lang": "ru", "rand": {"$gte": 0.5}}, [("rand", ASCENDING)]),
+    ("case_answers", {"lang": "ru", "index_version": 0}, None),
+]
+
+async def apply_indexes(database) -> int:
+    """Creates every registry index. Returns the number applied; conflicts are logged, not raised."""
+    applied = 0
+    for collection, keys, options in INDEXES:
+        try:
+            await database[collection].create_index(keys, **options)
+            applied += 1
+        except OperationFailure as e:
+            # e.g. duplicates block a unique index, or an index with the same name has other options
+            logging.error(f"❌ Index {collection}.{options.get('name')} not applied: {e}")
+    logging.info(f"🗂️ Mongo indexes ensured: {applied}/{len(INDEXES)}")
+    return applied
+
+def _plan_stages(plan: dict) -> list:
+    stages = [plan.get("stage")]
+    for child in ("inputStage", "queryPlan"):
+        if child in plan:
+            stages += _plan_stages(plan[child])
+    for sub in plan.get("inputStages", []):
+        stages += _plan_stages(sub)
+    return [s for s in stages if s]
+
+async def verify_indexes(database) -> list:
+    """
+    Runs explain() on every VERIFY_QUERIES entry.
+    Returns [{"collection", "filter", "stages", "collscan"}].
+    """
+    report = []
+    for collection, query, sort in VERIFY_QUERIES:
+        cursor = database[collection].find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        try:
+            explain = await cursor.explain()
+            plan = explain.get("queryPlanner", {}).get("winningPlan", {})
+            stages = _plan_stages(plan)
+        except Exception as e:
+            stages = [f"error: {e}"]
+        report.append({
+            "collection": collection,
+            "filter": query,
+            "stages": stages,
+            "collscan": "COLLSCAN" in stages
+        })
+    return report
@@ -16,6 +16,15 @@ class MongoDB:
             logging.error(f"Could not connect to MongoDB: {e}", exc_info=True)
             raise e
 
+    @classmethod
+    async def ensure_indexes(cls):
+        """Applies the index registry (database/indexes.py). Safe to run on every start."""
+        from legally_bot.database.indexes import apply_indexes
+        try:
+            await apply_indexes(cls.db)
+        except Exception as e:
+            logging.error(f"Could not apply MongoDB indexes: {e}", exc_info=True)
+
     @classmethod
     def close(cls):
         if cls.client:
@@ -0,0 +1,47 @@
+from bson import ObjectId
+
+# Keyset (cursor) pagination on _id. A page is requested relative to the
+# first or last _id of the page on screen, so every page is one bounded,
+# indexed query however deep the user pages:
+#   after=<last id>  -> next page
+#   before=<first id> -> previous page
+# Pages are shown oldest first, or newest first with descending=True.
+
+def keyset_query(query: dict, after: ObjectId = None, before: ObjectId = None, descending: bool = False):
+    """Returns (filter, sort) for one page; fetch limit + 1 documents with them."""
+    display = -1 if descending else 1
+    direction = -display if before is not None else display
+    bound = before if before is not None else after
+    if bound is not None:
+        query = {**query, "_id": {"$gt" if direction == 1 else "$lt": bound}}
+    return query, [("_id", direction)]
+
+def keyset_page(docs: list, limit: int, after: ObjectId = None, before: ObjectId = None) -> dict:
+    """
+    Trims the limit + 1 fetched documents to a page in display order.
+    Returns {"items", "has_prev", "has_next", "first", "last"} (first/last are page cursors).
+    """
+    has_more = len(docs) > limit
+    items = docs[:limit]
+    if before is not None:
+        items.reverse()
+        has_prev, has_next = has_more, True
+    else:
+        has_prev, has_next = after is not None, has_more
+    return {
+        "items": items,
+        "has_prev": has_prev and bool(items),
+        "has_next": has_next and bool(items),
+        "first": items[0]["_id"] if items else None,
+        "last": items[-1]["_id"] if items else None
+    }
+
+def parse_cursor(direction: str, cursor: str) -> dict:
+    """'n'/'p' plus an id from a page button -> keyword args for a repository page method."""
+    if not cursor:
+        return {}  # ObjectId(None) would mint a new id
+    try:
+        oid = ObjectId(cursor)
+    except Exception:
+        return {}
+    return {"after": oid} if direction == "n" else {"before": oid}
@@ -0,0 +1,50 @@
+from legally_bot.database.mongo_db import db
+from datetime import datetime
+from pymongo import UpdateOne
+from pymongo.errors import BulkWriteError
+import logging
+
+class PassageRepository:
+    """
+    Retrieved passages stored once, keyed by vector id (or content hash).
+    e.g. {"_id": "civil_code_15_0", "type": "article", "source": "Civil Code",
+          "article": "15", "url": ..., "content": "...", "length": 1840}
+    Logs, cases and answers keep only {"key", ..., "score"} references.
+    """
+    collection = "passages"
+
+    @classmethod
+    async def store_many(cls, passages: list) -> int:
+        """
+        Upserts passages in one unordered bulk write. A stored passage is only
+        replaced by a longer text for the same key (e.g. a full passage over a
+        snippet recovered by compaction); otherwise the upsert hits the
+        duplicate _id and is ignored. Returns the number written.
+        """
+        if not passages:
+            return 0
+        now = datetime.utcnow()
+        requests = [
+            UpdateOne(
+                {"_id": p["_id"], "length": {"$lt": p["length"]}},
+                {"$set": {**{k: v for k, v in p.items() if k != "_id"}, "stored_at": now}},
+                upsert=True
+            ) for p in passages
+        ]
+        try:
+            result = await db.get_db()[cls.collection].bulk_write(requests, ordered=False)
+            return result.upserted_count + result.modified_count
+        except BulkWriteError as e:
+            errors = e.details.get("writeErrors", [])
+            other = [err for err in errors if err.get("code") != 11000]
+            if other:
+                logging.error(f"❌ Failed to store {len(other)} passages: {other[0].get('errmsg')}")
+            return e.details.get("nUpserted", 0) + e.details.get("nModified", 0)
+
+    @classmethod
+    async def get_many(cls, keys: list) -> dict:
+        """key -> passage, in one $in query."""
+        if not keys:
+            return {}
+        cursor = db.get_db()[cls.collection].find({"_id": {"$in": list(set(keys))}})
+        return {doc["_id"]: doc async for doc in cursor}
@@ -0,0 +1,160 @@
+from legally_bot.database.mongo_db import db
+from datetime import datetime
+from pymongo import UpdateOne, ReplaceOne
+import logging
+
+RATING_DIMENSIONS = ("question", "chunk", "article")
+
+class StatsRepository:
+    """
+    Materialized statistics, one document per scope, updated with $inc on
+    every feedback or rating event so profile and stats screens read a
+    single document by _id.
+    e.g. {"_id": "user:1", "scope": "user", "ref": 1, "solved": 3, "feedback": 4,
+          "feedback_score_sum": 31, "feedback_scored": 3, "errors": {"logic": 1},
+          "ratings": 2, "scores": {"question": 15, "chunk": 12, "article": 17}}
+         {"_id": "subject:Civil", "scope": "subject", "ref": "Civil", "ratings": 9, "scores": {...}}
+         {"_id": "article:<passage key>", "scope": "article", "ref": key, "source": ..., "article": "15", "ratings": 4, "scores": {"article": 30}}
+         {"_id": "global", "scope": "global", ...}
+    Averages are sum / count at read time (see average()).
+    """
+    collection = "stats"
+    SOLVED_THRESHOLD = 7  # Feedback ratings above this count as a solved case
+
+    @staticmethod
+    def _key(scope: str, ref=None) -> str:
+        return scope if ref is None else f"{scope}:{ref}"
+
+    @classmethod
+    def _upsert(cls, scope: str, ref, inc: dict, extra: dict = None) -> UpdateOne:
+        return UpdateOne(
+            {"_id": cls._key(scope, ref)},
+            {"$inc": inc, "$set": {"scope": scope, "ref": ref, **(extra or {}), "updated_at": datetime.utcnow()}},
+            upsert=True
+        )
+
+    @staticmethod
+    def _feedback_inc(rating: int, error_type: str) -> dict:
+        inc = {"feedback": 1}
+        if rating is not None:
+            inc.update({"feedback_scored": 1, "feedback_score_sum": rating})
+            if rating > StatsRepository.SOLVED_THRESHOLD:
+                inc["solved"] = 1
+        if error_type:
+            inc[f"errors.{error_type}"] = 1
+        return inc
+
+    @staticmethod
+    def _rating_inc(ratings: dict, dimensions=RATING_DIMENSIONS) -> dict:
+        inc = {"ratings": 1}
+        for dim in dimensions:
+            if ratings.get(dim) is not None:
+                inc[f"scores.{dim}"] = ratings[dim]
+        return inc
+
+    @staticmethod
+    def _article_ref(ref) -> tuple:
+        """(key, source, article number) of a stored article reference; legacy strings have no key."""
+        if not isinstance(ref, dict):
+            return None, None, None
+        return ref.get("key") or ref.get("id"), ref.get("source"), ref.get("article")
+
+    # --- Incremental updates ---
+    @classmethod
+    async def record_feedback(cls, student_id: int, rating: int = None, error_type: str = None):
+        inc = cls._feedback_inc(rating, error_type)
+        await db.get_db()[cls.collection].bulk_write([
+            cls._upsert("user", student_id, inc),
+            cls._upsert("global", None, inc),
+        ], ordered=False)
+
+    @classmethod
+    async def record_rating(cls, rater_id: int, ratings: dict, subject: str = None, articles: list = None):
+        """One rated case: rater, subject and every article reference of the case, in one bulk write."""
+        inc = cls._rating_inc(ratings)
+        requests = [
+            cls._upsert("user", rater_id, inc),
+            cls._upsert("subject", subject or "General", inc),
+            cls._upsert("global", None, inc),
+        ]
+        for ref in articles or []:
+            key, source, number = cls._article_ref(ref)
+            if key:
+                requests.append(cls._upsert("article", key, cls._rating_inc(ratings, ("article",)), {"source": source, "article": number}))
+        await db.get_db()[cls.collection].bulk_write(requests, ordered=False)
+
+    # --- Reads ---
+    @classmethod
+    async def get(cls, scope: str, ref=None) -> dict:
+        return await db.get_db()[cls.collection].find_one({"_id": cls._key(scope, ref)}) or {}
+
+    @classmethod
+    async def get_top(cls, scope: str, limit: int = 10) -> list:
+        """Most rated subjects/articles (scope_ratings index)."""
+        cursor = db.get_db()[cls.collection].find({"scope": scope}).sort("ratings", -1)
+        return await cursor.to_list(length=limit)
+
+    @staticmethod
+    def average(doc: dict, dimension: str = None):
+        """Average rating score for a dimension, or the feedback score average. None without data."""
+        if dimension is None:
+            count, total = doc.get("feedback_scored", 0), doc.get("feedback_score_sum", 0)
+        else:
+            count, total = doc.get("ratings", 0), doc.get("scores", {}).get(dimension, 0)
+        return round(total / count, 2) if count else None
+
+    # --- Rebuild ---
+    @classmethod
+    async def rebuild(cls) -> int:
+        """
+        Recomputes every stats document from feedback_logs and rated assignments,
+        replaces them, and deletes documents with no source data left.
+        Returns the number of documents written.
+        """
+        database = db.get_db()
+        docs = {}
+
+        def add(scope, ref, inc, extra=None):
+            if scope == "user" and ref is None:
+                return
+            key = cls._key(scope, ref)
+            doc = docs.setdefault(key, {"_id": key, "scope": scope, "ref": ref})
+            doc.update(extra or {})
+            for field, value in inc.items():
+                target = doc
+                *path, leaf = field.split(".")
+                for part in path:
+                    target = target.setdefault(part, {})
+                target[leaf] = target.get(leaf, 0) + value
+
+        async for fb in database.feedback_logs.find({}, {"student_id": 1, "rating_score": 1, "error_type": 1}):
+            inc = cls._feedback_inc(fb.get("rating_score"), fb.get("error_type"))
+            add("user", fb.get("student_id"), inc)
+            add("global", None, inc)
+
+        pipeline = [
+            {"$match": {"status": "rated"}},
+            {"$lookup": {"from": "cases", "localField": "case_id", "foreignField": "_id", "as": "case"}},
+            {"$unwind": {"path": "$case", "preserveNullAndEmptyArrays": True}},
+            {"$project": {"rated_by": 1, "ratings": 1, "subject": "$case.subject", "articles": "$case.articles"}}
+        ]
+        async for rated in database.assignments.aggregate(pipeline):
+            ratings = rated.get("ratings") or {}
+            inc = cls._rating_inc(ratings)
+            add("user", rated.get("rated_by"), inc)
+            add("subject", rated.get("subject") or "General", inc)
+            add("global", None, inc)
+            articles = rated.get("articles")
+            for ref in articles if isinstance(articles, list) else []:
+                key, source, number = cls._article_ref(ref)
+                if key:
+                    add("article", key, cls._rating_inc(ratings, ("article",)), {"source": source, "article": number})
+
+        now = datetime.utcnow()
+        requests = [ReplaceOne({"_id": key}, {**doc, "updated_at": now}, upsert=True) for key, doc in docs.items()]
+        collection = database[cls.collection]
+        for start in range(0, len(requests), 500):
+            await collection.bulk_write(requests[start:start + 500], ordered=False)
+        await collection.delete_many({"_id": {"$nin": list(docs)}})
+        logging.info(f"📊 Rebuilt {len(docs)} stats documents")
+        return len(docs)
@@ -0,0 +1,47 @@
+from legally_bot.database.mongo_db import db
+from datetime import datetime
+from pymongo import UpdateOne
+
+class UsageRepository:
+    """
+    Incremental LLM token counters, one document per (user, period, period key).
+    e.g. {"user_id": 1, "period": "day", "key": "2026-01-31", "tokens": 1234, ...}
+    """
+    collection = "token_usage"
+
+    @staticmethod
+    def _period_keys(now: datetime = None):
+        now = now or datetime.utcnow()
+        return now.strftime("%Y-%m-%d"), now.strftime("%Y-%m")
+
+    @classmethod
+    async def add_tokens(cls, user_id: int, role: str, provider: str, tokens: int):
+        day, month = cls._period_keys()
+        update = {
+            "$inc": {"tokens": tokens, "requests": 1, f"by_provider.{provider}": tokens},
+            "$set": {"role": role, "updated_at": datetime.utcnow()}
+        }
+        await db.get_db()[cls.collection].bulk_write([
+            UpdateOne({"user_id": user_id, "period": "day", "key": day}, update, upsert=True),
+            UpdateOne({"user_id": user_id, "period": "month", "key": month}, update, upsert=True),
+        ], ordered=False)
+
+    @classmethod
+    async def get_current_usage(cls, user_id: int) -> dict:
+        """Returns {"day": tokens, "month": tokens} for the current periods in one query."""
+        day, month = cls._period_keys()
+        cursor = db.get_db()[cls.collection].find(
+            {"user_id": user_id, "$or": [{"period": "day", "key": day}, {"period": "month", "key": month}]},
+            {"period": 1, "tokens": 1}
+        )
+        usage = {"day": 0, "month": 0}
+        async for doc in cursor:
+            usage[doc["period"]] = doc.get("tokens", 0)
+        return usage
+
+    @classmethod
+    async def get_top_users(cls, period: str = "day", limit: int = 10):
+        day, month = cls._period_keys()
+        key = day if period == "day" else month
+        cursor = db.get_db()[cls.collection].find({"period": period, "key": key}).sort("tokens", -1)
+        return await cursor.to_list(length=limit)
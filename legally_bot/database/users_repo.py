@@ -1,12 +1,43 @@
 from legally_bot.database.mongo_db import db
+from legally_bot.config import settings
+from legally_bot.services.ttl_cache import TTLCache, MISSING
+from legally_bot.services.metrics import metrics
+from legally_bot.database.pagination import keyset_query, keyset_page
+from contextvars import ContextVar
 from datetime import datetime
 
+# Recomputes the indexed 'role_request_pending' flag after a role change (pipeline update)
+_FLAG_ROLE_REQUEST = {"$set": {"role_request_pending": {"$ne": ["$requested_role", "$actual_role"]}}}
+
+# Per-update lookup counters, set by UserContextMiddleware: {"lookups": n, "reads": n}
+user_lookup_stats: ContextVar[dict] = ContextVar("user_lookup_stats", default=None)
+
 class UsersRepository:
     collection = "users"
+    # telegram_id -> user document (or None for unregistered users)
+    _cache = TTLCache(max_size=settings.USER_CACHE_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
 
     @classmethod
     async def get_user(cls, telegram_id: int):
-        return await db.get_db()[cls.collection].find_one({"telegram_id": telegram_id})
+        stats = user_lookup_stats.get()
+        if stats is not None:
+            stats["lookups"] += 1
+
+        user = cls._cache.get(telegram_id)
+        if user is not MISSING:
+            metrics.inc("user_cache.hits")
+            return dict(user) if user else None
+
+        metrics.inc("user_cache.misses")
+        if stats is not None:
+            stats["reads"] += 1
+        user = await db.get_db()[cls.collection].find_one({"telegram_id": telegram_id})
+        cls._cache.set(telegram_id, user)
+        return dict(user) if user else None
+
+    @classmethod
+    def invalidate(cls, telegram_id: int):
+        cls._cache.invalidate(telegram_id)
 
     @classmethod
     async def create_user(cls, telegram_id: int, full_name: str, email: str, role: str, language: str = "ru"):
@@ -16,11 +47,13 @@ class UsersRepository:
             "email": email,
             "requested_role": role,
             "actual_role": "guest",  # Default role
+            "role_request_pending": role != "guest",
             "language": language,
             "cases_solved_count": 0,
             "created_at": datetime.utcnow()
         }
         await db.get_db()[cls.collection].insert_one(user_data)
+        cls.invalidate(telegram_id)
         return user_data
 
     @classmethod
@@ -29,38 +62,51 @@ class UsersRepository:
             {"telegram_id": telegram_id},
             {"$set": {"language": language}}
         )
+        cls.invalidate(telegram_id)
 
     @classmethod
     async def update_role(cls, telegram_id: int, new_role: str):
         await db.get_db()[cls.collection].update_one(
             {"telegram_id": telegram_id},
-            {"$set": {"actual_role": new_role}}
+            [{"$set": {"actual_role": new_role}}, _FLAG_ROLE_REQUEST]
         )
+        cls.invalidate(telegram_id)
 
     @classmethod
-    async def get_users_by_role(cls, role: str):
-        cursor = db.get_db()[cls.collection].find({"role": role})
-        return await cursor.to_list(length=100)
+    async def get_users_page(cls, role: str, after=None, before=None, limit: int = settings.PAGE_SIZE) -> dict:
+        """One keyset page of users with this actual role (actual_role index). See database/pagination.py."""
+        query, sort = keyset_query({"actual_role": role}, after, before)
+        docs = await db.get_db()[cls.collection].find(query).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+        return keyset_page(docs, limit, after, before)
     
     @classmethod
-    async def get_pending_role_requests(cls):
-        # Users who have a requested_role different from their actual_role
-        # AND it's not "user" (default) or "none"
-        cursor = db.get_db()[cls.collection].find({
-            "$expr": {"$ne": ["$requested_role", "$actual_role"]}
-        })
-        return await cursor.to_list(length=100)
+    async def get_user_ids_by_role(cls, role: str) -> list:
+        """Telegram IDs of every user with this actual role (ids only, for cohort operations)."""
+        cursor = db.get_db()[cls.collection].find({"actual_role": role}, {"telegram_id": 1}).sort("_id", 1)
+        return [doc["telegram_id"] async for doc in cursor]
+    
+    @classmethod
+    async def get_role_requests_page(cls, after=None, before=None, limit: int = settings.PAGE_SIZE) -> dict:
+        """
+        One keyset page of users whose requested_role differs from their actual_role.
+        Reads the indexed role_request_pending flag instead of comparing fields per document.
+        """
+        query, sort = keyset_query({"role_request_pending": True}, after, before)
+        docs = await db.get_db()[cls.collection].find(query).sort(sort).limit(limit + 1).to_list(length=limit + 1)
+        return keyset_page(docs, limit, after, before)
 
     @classmethod
-    async def set_requested_role(cls, telegram_id: int, role: str):
-        await db.get_db()[cls.collection].update_one(
-            {"telegram_id": telegram_id},
-            {"$set": {"requested_role": role}}
+    async def backfill_role_request_flags(cls) -> int:
+        """Sets role_request_pending on users created before the flag existed. A no-op once done."""
+        result = await db.get_db()[cls.collection].update_many(
+            {"role_request_pending": {"$exists": False}}, [_FLAG_ROLE_REQUEST]
         )
+        return result.modified_count
 
     @classmethod
-    async def increment_cases_solved(cls, telegram_id: int):
+    async def set_requested_role(cls, telegram_id: int, role: str):
         await db.get_db()[cls.collection].update_one(
             {"telegram_id": telegram_id},
-            {"$inc": {"cases_solved": 1}}
+            [{"$set": {"requested_role": role}}, _FLAG_ROLE_REQUEST]
         )
+        cls.invalidate(telegram_id)
@@ -1,7 +1,11 @@
 from aiogram import Router, types, F, Bot
 from aiogram.filters import Command
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from legally_bot.services.access_control import AccessControl
 from legally_bot.database.users_repo import UsersRepository
+from legally_bot.database.usage_repo import UsageRepository
+from legally_bot.database.pagination import parse_cursor
+from legally_bot.keyboards.keyboards import add_page_buttons
 import logging
 
 from legally_bot.services.i18n import I18n
@@ -18,19 +22,61 @@ async def admin_panel(message: types.Message):
     if not await AccessControl.is_admin(message.from_user.id):
         return await message.answer(I18n.t("no_access", lang))
     
-    pending = await UsersRepository.get_pending_role_requests()
-    if not pending:
+    text, markup = await render_role_requests(lang)
+    await message.answer(text, parse_mode="Markdown", reply_markup=markup)
+
+async def render_role_requests(lang: str, **cursor):
+    """Text and ⬅️/➡️ keyboard for one page of pending role requests."""
+    page = await UsersRepository.get_role_requests_page(**cursor)
+    if not page["items"]:
         msg = "No pending role requests." if lang == "en" else "Нет ожидающих запросов ролей."
-        await message.answer(msg)
-        return
+        return msg, None
     
     text = "Pending Requests:\n\n" if lang == "en" else "Ожидающие запросы:\n\n"
-    for u in pending:
+    for u in page["items"]:
         text += f"ID: `{u['telegram_id']}` | Name: {u['full_name']} | Requested: {u['requested_role']}\n"
     
     hint = "\nTo approve, use: `/promote <id> <role>`" if lang == "en" else "\nДля одобрения используйте: `/promote <id> <role>`"
     text += hint
-    await message.answer(text, parse_mode="Markdown")
+    return text, add_page_buttons(InlineKeyboardBuilder(), "req", page).as_markup()
+
+async def render_users(role: str, **cursor):
+    page = await UsersRepository.get_users_page(role, **cursor)
+    if not page["items"]:
+        return f"No users with role {role}.", None
+    text = f"👥 Users with role {role}:\n\n"
+    for u in page["items"]:
+        text += f"ID: {u['telegram_id']} | Name: {u.get('full_name')} | Email: {u.get('email')}\n"
+    return text, add_page_buttons(InlineKeyboardBuilder(), "usr", page, arg=role).as_markup()
+
+@router.callback_query(F.data.startswith("page:req:") | F.data.startswith("page:usr:"))
+async def process_admin_page(callback: types.CallbackQuery):
+    if not await AccessControl.is_admin(callback.from_user.id):
+        return await callback.answer("Access denied.")
+
+    # page:<list>:<n|p>:<cursor>[:role]
+    parts = callback.data.split(":")
+    cursor = parse_cursor(parts[2], parts[3])
+    if parts[1] == "req":
+        user = await UsersRepository.get_user(callback.from_user.id)
+        text, markup = await render_role_requests(user.get("language", "ru") if user else "ru", **cursor)
+        await callback.message.edit_text(text, parse_mode="Markdown", reply_markup=markup)
+    else:
+        text, markup = await render_users(parts[4], **cursor)
+        await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
+
+@router.message(Command("users"))
+async def cmd_users(message: types.Message):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    args = message.text.split()
+    if len(args) != 2 or args[1] not in ["guest", "user", "student", "professor", "admin", "developer"]:
+        await message.answer("Usage: /users <guest|user|student|professor|admin|developer>")
+        return
+    text, markup = await render_users(args[1])
+    await message.answer(text, reply_markup=markup)
 
 @router.callback_query(F.data.startswith("adm_"))
 async def process_admin_role_callback(callback: types.CallbackQuery, bot: Bot):
@@ -89,3 +135,21 @@ async def promote_user(message: types.Message):
         # Ideally, notify the user too.
     except ValueError:
         await message.answer("Invalid ID format.")
+
+@router.message(Command("usage"))
+async def cmd_usage(message: types.Message):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    # /usage [day|month]
+    args = message.text.split()
+    period = args[1] if len(args) > 1 and args[1] in ["day", "month"] else "day"
+    top = await UsageRepository.get_top_users(period)
+    if not top:
+        await message.answer(f"No token usage recorded for this {period}.")
+        return
+
+    text = f"📊 Top LLM token users ({period}):\n\n"
+    for doc in top:
+        text += f"ID: {doc['user_id']} | Role: {doc.get('role')} | Tokens: {doc.get('tokens', 0)} | Requests: {doc.get('requests', 0)}\n"
+    await message.answer(text)
@@ -1,15 +1,26 @@
 
+import asyncio
 import logging
-from aiogram import Router, F, types
+import time
+from aiogram import Router, F, types, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from io import BytesIO
+from bson import ObjectId
 
 from legally_bot.database.mongo_db import MongoDB
 from legally_bot.database.users_repo import UsersRepository
-from legally_bot.database.case_repo import CaseRepository
+from legally_bot.database.case_repo import CaseRepository, AssignResult
+from legally_bot.database.batch_repo import BatchJobRepository
+from legally_bot.database.stats_repo import StatsRepository, RATING_DIMENSIONS
+from legally_bot.services.access_control import AccessControl
 from legally_bot.services.batch_service import BatchService
+from legally_bot.services.tabular_io import SUPPORTED_INPUTS, read_rows, read_chunks
+from legally_bot.services.assignment_planner import plan, STRATEGIES
 from legally_bot.states.states import AdminStates
+from legally_bot.database.pagination import parse_cursor
+from legally_bot.keyboards.keyboards import add_page_buttons
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 router = Router()
 batch_service = BatchService()
@@ -19,9 +30,67 @@ async def cmd_upload_cases(message: types.Message, state: FSMContext):
     # Check Admin Role (TODO: Middleware handles this usually, but simple check here)
     # For now assuming role check is done or we add it
     
-    await message.answer("📂 Please upload an Excel (.xlsx) or JSON file with questions.\nFormat: Must have a 'question' column.")
+    await message.answer("📂 Please upload an Excel (.xlsx), CSV, JSONL or JSON file with questions.\nFormat: Must have a 'question' column.")
     await state.set_state(AdminStates.waiting_for_case_file)
 
+def make_progress_callback(status_msg: types.Message):
+    """Edits the admin's status message every 10% of progress."""
+    last_percent = 0
+
+    async def progress_callback(processed, total):
+        nonlocal last_percent
+        if total == 0: return
+        percent = int((processed / total) * 100)
+        if percent - last_percent >= 10 or percent == 100:
+            try:
+                await status_msg.edit_text(f"⏳ Processing batch... {processed}/{total} ({percent}%)")
+                last_percent = percent
+            except Exception:
+                pass
+
+    return progress_callback
+
+def make_delivery(bot: Bot):
+    async def deliver_job(job: dict):
+        """Saves new successful rows to the Admin Library and sends the result file."""
+        try:
+            repo = CaseRepository(MongoDB.get_db())
+
+            async def save_cases(rows):
+                await repo.save_admin_cases(rows, saver_id=job["requested_by"])
+
+            # Rows stream into the result file and, in bulk chunks, into the Admin Library
+            result_content, result_name, saved = await batch_service.export(job, save_cases)
+
+            input_file = types.BufferedInputFile(result_content.read(), filename=result_name)
+            await bot.send_document(
+                job["chat_id"], input_file,
+                caption=f"✅ Job `{job['_id']}`: {job['done'] - job['failed']}/{job['total']} answered, "
+                        f"{job['failed']} failed. Saved {saved} cases to Library.",
+                parse_mode="Markdown"
+            )
+        except Exception as e:
+            logging.error(f"Failed to deliver batch job {job['_id']}: {e}")
+            await bot.send_message(job["chat_id"], f"❌ Error delivering batch job {job['_id']}: {e}")
+
+    return deliver_job
+
+async def resume_batch_jobs(bot: Bot):
+    """Restarts jobs that were still running when the bot stopped."""
+    try:
+        jobs = await BatchJobRepository.get_unfinished_jobs()
+    except Exception as e:
+        logging.error(f"Could not load unfinished batch jobs: {e}")
+        return
+    for job in jobs:
+        logging.info(f"🔁 Resuming batch job {job['_id']} ({job['done']}/{job['total']})")
+        try:
+            status_msg = await bot.send_message(job["chat_id"], f"🔁 Resuming batch job {job['_id']} at {job['done']}/{job['total']}...")
+            progress_callback = make_progress_callback(status_msg)
+        except Exception:
+            progress_callback = None
+        batch_service.launch(job["_id"], progress_callback, make_delivery(bot))
+
 @router.message(AdminStates.waiting_for_case_file, F.document)
 async def handle_case_file(message: types.Message, state: FSMContext):
     file_id = message.document.file_id
@@ -39,37 +108,18 @@ async def handle_case_file(message: types.Message, state: FSMContext):
         
         # Process Schema
         # Check simple validation
-        if not (file_name.endswith('.xlsx') or file_name.endswith('.json')):
-             await message.answer("❌ Invalid format. Please upload .xlsx or .json")
+        if not file_name.endswith(SUPPORTED_INPUTS):
+             await message.answer("❌ Invalid format. Please upload .xlsx, .csv, .jsonl or .json")
              return
 
-        # Run Batch Service
-        # This takes time, so we should spawn it or await it if it's not too huge.
-        # Since we use async semaphore, awaiting is fine for < 100 questions.
-        
-        result_content = await batch_service.process_file(file_content, file_name)
-        
-        # Save to DB (Admin Library)
-        # We need to re-read the result to save to DB?
-        # Ideally BatchService returns data AND file. 
-        # But BatchService returns file object.
-        # Let's assume BatchService internally could have saved or we parse the output df again.
-        # For this MVP, let's assume BatchService handles only processing.
-        # Wait, the plan said "Saves to 'cases' collection".
-        # We need to modify BatchService to save to DB or do it here. 
-        # Doing it here requires reading the result excel.
-        import pandas as pd
-        result_content.seek(0)
-        df = pd.read_excel(result_content)
-        cases_data = df.to_dict('records')
-        
-        repo = CaseRepository(MongoDB.get_db())
-        await repo.save_admin_cases(cases_data, saver_id=message.from_user.id)
-        
-        # Send Result File
-        result_content.seek(0)
-        input_file = types.BufferedInputFile(result_content.read(), filename=f"processed_{file_name}")
-        await message.answer_document(input_file, caption=f"✅ Processed {len(cases_data)} cases and saved to Library.")
+        # Persist the job, then run it in the background.
+        # Results are checkpointed per question, so a restart resumes where it stopped.
+        job_id = await batch_service.start_job(file_content, file_name, message.from_user.id, message.chat.id)
+        await status_msg.edit_text(
+            f"⏳ Batch job `{job_id}` started.\nUse `/batch_status {job_id}` or `/batch_cancel {job_id}`.",
+            parse_mode="Markdown"
+        )
+        batch_service.launch(job_id, make_progress_callback(status_msg), make_delivery(bot))
         
     except Exception as e:
         logging.error(f"Batch upload failed: {e}")
@@ -77,6 +127,65 @@ async def handle_case_file(message: types.Message, state: FSMContext):
     finally:
         await state.clear()
 
+def _parse_job_id(message: types.Message):
+    args = message.text.split()
+    if len(args) < 2:
+        return None
+    try:
+        return ObjectId(args[1])
+    except Exception:
+        return None
+
+@router.message(Command("batch_status"))
+async def cmd_batch_status(message: types.Message):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    # /batch_status [job_id]
+    job_id = _parse_job_id(message)
+    jobs = [await BatchJobRepository.get_job(job_id)] if job_id else await BatchJobRepository.get_recent_jobs()
+    jobs = [j for j in jobs if j]
+    if not jobs:
+        await message.answer("No batch jobs found.")
+        return
+
+    text = "📦 Batch jobs:\n\n"
+    for job in jobs:
+        running = " (active)" if batch_service.is_running(job["_id"]) else ""
+        text += (f"`{job['_id']}` | {job['filename']} | {job['status']}{running} | "
+                 f"{job['done']}/{job['total']} done, {job['failed']} failed\n")
+    await message.answer(text, parse_mode="Markdown")
+
+@router.message(Command("batch_cancel"))
+async def cmd_batch_cancel(message: types.Message):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    job_id = _parse_job_id(message)
+    if not job_id:
+        await message.answer("Usage: /batch_cancel <job_id>")
+        return
+    if await batch_service.cancel(job_id):
+        await message.answer(f"🛑 Batch job {job_id} cancelled. Finished rows are kept.")
+    else:
+        await message.answer(f"❌ Job {job_id} is not running.")
+
+@router.message(Command("batch_retry"))
+async def cmd_batch_retry(message: types.Message):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    job_id = _parse_job_id(message)
+    if not job_id:
+        await message.answer("Usage: /batch_retry <job_id>")
+        return
+    reset = await batch_service.retry_failed(job_id)
+    if not reset:
+        await message.answer(f"Nothing to re-run for job {job_id}.")
+        return
+    status_msg = await message.answer(f"🔁 Re-running {reset} failed rows of job {job_id}...")
+    batch_service.launch(job_id, make_progress_callback(status_msg), make_delivery(message.bot))
+
 @router.message(Command("assign_case"))
 async def cmd_assign_case(message: types.Message, state: FSMContext):
     # Flow: Ask for Case ID -> Ask for User ID (Student/Prof)
@@ -108,10 +217,227 @@ async def process_assignee(message: types.Message, state: FSMContext):
     
     # Try assign to student (default)
     # Ideally we check role, but sticking to command simplicity
-    success = await repo.assign_case_to_student(case_oid, assignee_id)
-    if success:
+    result = await repo.assign_case_to_student(case_oid, assignee_id)
+    if result == AssignResult.ASSIGNED:
         await message.answer(f"✅ Case {case_id} assigned to Student {assignee_id}")
+    elif result == AssignResult.ALREADY_ASSIGNED:
+        await message.answer(f"ℹ️ Case {case_id} is already assigned to {assignee_id}")
     else:
         await message.answer(f"❌ Failed to find case or assign.")
     
     await state.clear()
+
+# --- Bulk cohort assignment ---
+
+ASSIGNEE_ROLES = ("student", "professor")
+
+def _parse_bulk_args(args: list):
+    """<student|professor> [round_robin|least_loaded] [copies=N] [subject=X] -> dict or None."""
+    if not args or args[0] not in ASSIGNEE_ROLES:
+        return None
+    options = {"role": args[0], "strategy": "round_robin", "copies": 1, "subject": None}
+    for arg in args[1:]:
+        if arg in STRATEGIES:
+            options["strategy"] = arg
+        elif arg.startswith("copies=") and arg[7:].isdigit():
+            options["copies"] = max(1, int(arg[7:]))
+        elif arg.startswith("subject="):
+            options["subject"] = arg[8:]
+        else:
+            return None
+    return options
+
+async def run_bulk_assignment(message: types.Message, case_ids: list, options: dict, explicit_pairs: list = None):
+    """Balances case_ids over the role's cohort, adds explicit pairs, and writes everything in one bulk insert."""
+    repo = CaseRepository(MongoDB.get_db())
+    role = options["role"]
+    cohort = await UsersRepository.get_user_ids_by_role(role)
+    if case_ids and not cohort:
+        await message.answer(f"❌ No users with role {role}.")
+        return
+
+    loads = await repo.get_open_loads(cohort) if options["strategy"] == "least_loaded" else None
+    pairs = (explicit_pairs or []) + plan(options["strategy"], case_ids, cohort, options["copies"], loads)
+    if not pairs:
+        await message.answer("❌ Nothing to assign.")
+        return
+
+    started = time.perf_counter()
+    result = await repo.bulk_assign(pairs, role, assigned_by=message.from_user.id)
+    elapsed = time.perf_counter() - started
+    rate = len(pairs) / elapsed if elapsed > 0 else 0.0
+
+    await message.answer(
+        f"✅ Assigned {result['inserted']} of {len(pairs)} ({options['strategy']}, {role} cohort of {len(cohort)}).\n"
+        f"Skipped {result['duplicates']} duplicates, {result['errors']} errors.\n"
+        f"⏱️ {elapsed:.2f}s ({rate:.0f} assignments/s)"
+    )
+
+@router.message(Command("bulk_assign"))
+async def cmd_bulk_assign(message: types.Message):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    options = _parse_bulk_args(message.text.split()[1:])
+    if not options:
+        await message.answer(
+            "Usage: `/bulk_assign <student|professor> [round_robin|least_loaded] [copies=N] [subject=X]`\n"
+            "Distributes every library case (optionally of one subject) to N members of the cohort.",
+            parse_mode="Markdown"
+        )
+        return
+
+    repo = CaseRepository(MongoDB.get_db())
+    case_ids = await repo.get_case_ids(options["subject"])
+    if not case_ids:
+        await message.answer("❌ No cases in the library for this selection.")
+        return
+    await run_bulk_assignment(message, case_ids, options)
+
+@router.message(Command("bulk_assign_file"))
+async def cmd_bulk_assign_file(message: types.Message, state: FSMContext):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    options = _parse_bulk_args(message.text.split()[1:])
+    if not options:
+        await message.answer("Usage: `/bulk_assign_file <student|professor> [round_robin|least_loaded] [copies=N]`", parse_mode="Markdown")
+        return
+    await state.update_data(bulk_options=options)
+    await message.answer(
+        "📂 Upload an .xlsx, .csv or .jsonl file with a `case_id` column and an optional `assigned_to` column.\n"
+        "Rows without `assigned_to` are balanced over the cohort.",
+        parse_mode="Markdown"
+    )
+    await state.set_state(AdminStates.waiting_for_assignment_file)
+
+@router.message(AdminStates.waiting_for_assignment_file, F.document)
+async def handle_assignment_file(message: types.Message, state: FSMContext):
+    options = (await state.get_data()).get("bulk_options")
+    await state.clear()
+    file_name = message.document.file_name
+    if not options or not file_name.endswith(SUPPORTED_INPUTS):
+        await message.answer("❌ Invalid format. Please upload .xlsx, .csv, .jsonl or .json")
+        return
+
+    try:
+        file = await message.bot.get_file(message.document.file_id)
+        file_content = BytesIO()
+        await message.bot.download_file(file.file_path, file_content)
+        file_content.seek(0)
+        # Parsed on a worker thread, like batch uploads
+        _, rows = await asyncio.to_thread(read_rows, file_content, file_name, "case_id")
+
+        balanced, explicit, invalid = [], [], 0
+        async for chunk in read_chunks(rows, BatchJobRepository.CHUNK_SIZE):
+            for row in chunk:
+                try:
+                    case_id = ObjectId(str(row["case_id"]).strip())
+                    assignee = row.get("assigned_to")
+                    if assignee is None:
+                        balanced.append(case_id)
+                    else:
+                        explicit.append((case_id, int(assignee)))
+                except Exception:
+                    invalid += 1
+
+        # Unknown case ids are dropped before the write
+        repo = CaseRepository(MongoDB.get_db())
+        existing = await repo.get_existing_case_ids(list({c for c in balanced} | {c for c, _ in explicit}))
+        unknown = sum(1 for c in balanced if c not in existing) + sum(1 for c, _ in explicit if c not in existing)
+        balanced = [c for c in balanced if c in existing]
+        explicit = [(c, a) for c, a in explicit if c in existing]
+        if invalid or unknown:
+            await message.answer(f"⚠️ Skipped {invalid} malformed rows and {unknown} rows with unknown case ids.")
+
+        await run_bulk_assignment(message, balanced, options, explicit_pairs=explicit)
+    except Exception as e:
+        logging.error(f"Bulk assignment upload failed: {e}")
+        await message.answer(f"❌ Error processing file: {e}")
+
+# --- Rating statistics (materialized) ---
+
+def _format_scores(doc: dict, dimensions=RATING_DIMENSIONS) -> str:
+    parts = []
+    for dim in dimensions:
+        avg = StatsRepository.average(doc, dim)
+        parts.append(f"{dim} {avg if avg is not None else '—'}")
+    return ", ".join(parts)
+
+@router.message(Command("stats"))
+async def cmd_stats(message: types.Message):
+    if not (await AccessControl.is_admin(message.from_user.id) or await AccessControl.is_professor(message.from_user.id)):
+        return
+
+    args = message.text.split(maxsplit=2)[1:]
+    if len(args) == 2 and args[0] in ("subject", "article", "user"):
+        ref = int(args[1]) if args[0] == "user" and args[1].isdigit() else args[1]
+        doc = await StatsRepository.get(args[0], ref)
+        if not doc:
+            await message.answer("❌ No stats for this selection yet.")
+            return
+        avg = StatsRepository.average(doc)
+        await message.answer(
+            f"📊 {args[0]} {args[1]}\n"
+            f"Ratings: {doc.get('ratings', 0)} ({_format_scores(doc)})\n"
+            f"Feedback: {doc.get('feedback', 0)}, solved {doc.get('solved', 0)}, avg {avg if avg is not None else '—'}\n"
+            f"Errors: {doc.get('errors') or '—'}"
+        )
+        return
+
+    overall = await StatsRepository.get("global")
+    subjects = await StatsRepository.get_top("subject")
+    articles = await StatsRepository.get_top("article")
+
+    text = (
+        f"📊 Overall: {overall.get('ratings', 0)} ratings ({_format_scores(overall)}), "
+        f"{overall.get('feedback', 0)} feedback, {overall.get('solved', 0)} solved\n\n"
+        f"Top subjects:\n"
+    )
+    for doc in subjects:
+        text += f"• {doc['ref']}: {doc.get('ratings', 0)} ({_format_scores(doc)})\n"
+    text += "\nMost rated articles:\n"
+    for doc in articles:
+        label = doc.get("source") or doc["ref"]
+        if doc.get("article"):
+            label += f", Article {doc['article']}"
+        text += f"• {label}: {doc.get('ratings', 0)} (avg {StatsRepository.average(doc, 'article')})\n"
+    text += "\nDetails: /stats subject <name> | article <key> | user <id>"
+    await message.answer(text)
+
+# --- Case library browsing (keyset pages) ---
+
+async def render_library(subject: str = None, **cursor):
+    repo = CaseRepository(MongoDB.get_db())
+    page = await repo.get_cases_page(subject, **cursor)
+    if not page["items"]:
+        return "📭 No cases in the library" + (f" for {subject}." if subject else "."), None
+    text = f"📚 Case library{f' ({subject})' if subject else ''}, newest first:\n\n"
+    for case in page["items"]:
+        question = " ".join((case.get("question") or "").split())
+        text += f"{case['_id']} | {case.get('subject', 'General')} | {question[:60]}\n"
+    text += "\nAssign one with /assign_case."
+    return text, add_page_buttons(InlineKeyboardBuilder(), "lib", page).as_markup()
+
+@router.message(Command("library"))
+async def cmd_library(message: types.Message, state: FSMContext):
+    if not await AccessControl.is_admin(message.from_user.id):
+        return
+
+    # /library [subject]; the filter stays in FSM data so page buttons only carry the cursor
+    args = message.text.split(maxsplit=1)
+    subject = args[1].strip() if len(args) > 1 else None
+    await state.update_data(library_subject=subject)
+    text, markup = await render_library(subject)
+    await message.answer(text, reply_markup=markup)
+
+@router.callback_query(F.data.startswith("page:lib:"))
+async def cb_library_page(callback: types.CallbackQuery, state: FSMContext):
+    if not await AccessControl.is_admin(callback.from_user.id):
+        return await callback.answer()
+
+    _, _, direction, cursor = callback.data.split(":")
+    subject = (await state.get_data()).get("library_subject")
+    text, markup = await render_library(subject, **parse_cursor(direction, cursor))
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
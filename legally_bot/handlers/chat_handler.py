@@ -1,11 +1,18 @@
+import asyncio
 import logging
 from aiogram import Router, types, F
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from legally_bot.services.rag_engine import RAGEngine
+from legally_bot.services.scheduler import Workload
+from legally_bot.services.load_shedder import load_shedder
+from legally_bot.services.chat_tasks import chat_tasks
+from legally_bot.config import settings
 from legally_bot.services.access_control import AccessControl
-from legally_bot.database.users_repo import UsersRepository
 from legally_bot.database.feedback_repo import FeedbackRepository
+from legally_bot.database.case_repo import CaseRepository
+from legally_bot.database.mongo_db import MongoDB
+from legally_bot.services.passage_store import passage_store
 from legally_bot.keyboards.keyboards import rating_kb, get_main_menu
 from legally_bot.states.states import ChatState
 
@@ -16,18 +23,18 @@ rag_engine = RAGEngine()
 
 @router.message(F.text.in_(["💬 Chat with AI", "💬 Чат с ИИ", "💬 AI-мен сөйлесу"]))
 @router.message(Command("chat"))
-async def start_chat(message: types.Message, state: FSMContext):
-    user = await UsersRepository.get_user(message.from_user.id)
+async def start_chat(message: types.Message, state: FSMContext, user: dict = None):
     lang = user.get("language", "ru") if user else "ru"
     await state.set_state(ChatState.chatting)
     await message.answer(I18n.t("chat_mode", lang))
 
 @router.message(ChatState.chatting)
-async def handle_chat_message(message: types.Message, state: FSMContext):
-    user = await UsersRepository.get_user(message.from_user.id)
+async def handle_chat_message(message: types.Message, state: FSMContext, user: dict = None):
+    # `user` is loaded once per update by UserContextMiddleware
     lang = user.get("language", "ru") if user else "ru"
     
     if message.text.lower() in ["exit", "stop", "back", "выход", "стоп", "назад"]:
+        chat_tasks.cancel(message.chat.id)
         await state.clear()
         role = user.get("actual_role", user.get("role", "guest")) if user else "guest"
         return await message.answer(I18n.t("exit_chat", lang), reply_markup=get_main_menu(role, lang))
@@ -38,10 +45,13 @@ async def handle_chat_message(message: types.Message, state: FSMContext):
         await message.answer("⚠️ Unknown command or command not available in Chat Mode.\nType 'exit' to return to menu or just type your legal question.")
         return
 
-    # Determine user role and limits
-    user = await UsersRepository.get_user(message.from_user.id)
     role = user.get("actual_role", user.get("role", "guest")) if user else "guest"
-    
+
+    # Debounced and cancellable: a newer message supersedes (and is merged with) this one
+    chat_tasks.submit(message.chat.id, message.text, lambda query: answer_question(message, query, role, lang))
+
+async def answer_question(message: types.Message, query: str, role: str, lang: str):
+    # Determine user limits
     num_chunks = 0
     num_articles = 0
     
@@ -65,13 +75,69 @@ async def handle_chat_message(message: types.Message, state: FSMContext):
     search_limit_chunks = max(num_chunks, 3) # Minimum 3 for AI context
     search_limit_articles = max(num_articles, 3)
     
-    result = await rag_engine.search(message.text, num_chunks=search_limit_chunks, num_articles=search_limit_articles, lang=lang)
+    result = await rag_engine.search(
+        query,
+        num_chunks=search_limit_chunks,
+        num_articles=search_limit_articles,
+        lang=lang,
+        user_id=message.from_user.id,
+        role=role,
+        workload=Workload.INTERACTIVE
+    )
     
+    if result.get("profile") == "retrieval" and (result.get("chunks") or result.get("articles")):
+        # Overloaded: retrieval-only answer now, full answer once capacity returns
+        result = {**result, "followup": True}
+        task = asyncio.create_task(deliver_full_answer(
+            message, query, role, lang, num_chunks, num_articles, search_limit_chunks, search_limit_articles
+        ))
+        chat_tasks.track_background(message.chat.id, task)
+
+    await chat_tasks.deliver(message.chat.id, send_and_log(message, query, result, role, lang, num_chunks, num_articles))
+
+async def send_and_log(message: types.Message, query: str, result: dict, role: str, lang: str,
+                       num_chunks: int, num_articles: int, header_key: str = "ai_answer"):
+    await send_answer(message, result, role, lang, num_chunks, num_articles, header_key=header_key)
+    await log_interaction(message, query, result)
+
+async def log_interaction(message: types.Message, query: str, result: dict):
+    """Queues the interaction for the chat log; the write happens behind the response."""
+    chunks, articles = await passage_store.references(result.get("chunks"), result.get("articles"))
+    await CaseRepository(MongoDB.get_db()).log_chat_question(
+        message.from_user.id, query, result.get("answer"), chunks, articles
+    )
+
+async def deliver_full_answer(message: types.Message, query: str, role: str, lang: str, num_chunks: int, num_articles: int,
+                              search_limit_chunks: int, search_limit_articles: int):
+    """Waits for LLM capacity, then sends the full answer to a question that was shed."""
+    if not await load_shedder.wait_for_capacity(rag_engine.configured_providers(), settings.FOLLOWUP_MAX_WAIT_SECONDS):
+        logging.info(f"Follow-up for user {message.from_user.id} dropped: capacity did not return in time")
+        return
+    result = await rag_engine.search(
+        query,
+        num_chunks=search_limit_chunks,
+        num_articles=search_limit_articles,
+        lang=lang,
+        user_id=message.from_user.id,
+        role=role,
+        workload=Workload.INTERACTIVE,
+        allow_shed=False
+    )
+    await chat_tasks.deliver(
+        message.chat.id, send_and_log(message, query, result, role, lang, num_chunks, num_articles, "followup_answer")
+    )
+
+async def send_answer(message: types.Message, result: dict, role: str, lang: str, num_chunks: int, num_articles: int,
+                      header_key: str = "ai_answer"):
     answer = result.get("answer", "I'm sorry, I couldn't find an answer.")
     chunks = result.get("chunks", [])[:num_chunks]
     articles = result.get("articles", [])[:num_articles]
 
-    response_text = f"{I18n.t('ai_answer', lang)}\n{answer}\n\n"
+    response_text = f"{I18n.t(header_key, lang)}\n{answer}\n\n"
+    if result.get("profile") == "lite":
+        response_text += f"{I18n.t('quota_degraded', lang)}\n\n"
+    elif result.get("followup"):
+        response_text += f"{I18n.t('overload_followup', lang)}\n\n"
     
     if chunks:
         response_text += f"{I18n.t('top_chunks', lang)}\n"
@@ -137,7 +203,7 @@ async def process_rating(callback: types.CallbackQuery, state: FSMContext):
     await callback.answer()
 
 @router.message(ChatState.waiting_for_comment)
-async def process_comment(message: types.Message, state: FSMContext):
+async def process_comment(message: types.Message, state: FSMContext, user: dict = None):
     data = await state.get_data()
     score = data.get("rating_score")
     msg_id = data.get("chat_msg_id")
@@ -150,7 +216,6 @@ async def process_comment(message: types.Message, state: FSMContext):
         comment=comment
     )
     
-    user = await UsersRepository.get_user(message.from_user.id)
     lang = user.get("language", "ru") if user else "ru"
     await message.answer(I18n.t("thank_feedback", lang))
     await state.set_state(ChatState.chatting)
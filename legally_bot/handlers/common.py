@@ -2,8 +2,10 @@ from aiogram import Router, types, F, Bot
 from aiogram.filters import Command
 from aiogram.fsm.context import FSMContext
 from legally_bot.database.users_repo import UsersRepository
+from legally_bot.database.stats_repo import StatsRepository
 from legally_bot.keyboards.keyboards import get_main_menu
 from legally_bot.services.access_control import AccessControl
+from legally_bot.services.chat_tasks import chat_tasks
 import logging
 
 from legally_bot.services.i18n import I18n
@@ -58,6 +60,7 @@ async def process_role_request(callback: types.CallbackQuery, bot: Bot):
 
 @router.message(Command("start"))
 async def cmd_start(message: types.Message, state: FSMContext):
+    chat_tasks.cancel(message.chat.id)
     await state.clear()
     logging.info(f"User {message.from_user.id} called /start")
     user = await UsersRepository.get_user(message.from_user.id)
@@ -110,13 +113,17 @@ async def cmd_profile(message: types.Message):
     if req_role != role:
         status_text += f" (Requested: {req_role})"
 
+    stats = await StatsRepository.get("user", message.from_user.id)
+    avg = StatsRepository.average(stats)
+
     profile_text = (
         f"👤 **{I18n.t('profile', lang)}**\n"
         f"━━━━━━━━━━━━━━\n"
         f"📛 Name: {user['full_name']}\n"
         f"📧 Email: {user['email']}\n"
         f"🎭 Role: {status_text}\n"
-        f"📊 Solved: {user.get('cases_solved_count', 0)}\n"
+        f"📊 Solved: {stats.get('solved', 0)}\n"
+        f"⭐ Average score: {avg if avg is not None else '—'}\n"
     )
     await message.answer(profile_text, parse_mode="Markdown")
 
@@ -332,18 +339,23 @@ async def show_profile(message: types.Message):
         ability_text = abilities.get(lang, abilities["ru"]).get(role, "No specific info available.")
         
         labels = {
-            "ru": {"name": "Имя", "role": "Роль", "requested": "Запрошена", "solved": "Решено кейсов", "abilities": "✨ **Ваши возможности:**"},
-            "en": {"name": "Name", "role": "Role", "requested": "Requested", "solved": "Cases Solved", "abilities": "✨ **Your Abilities:**"}
+            "ru": {"name": "Имя", "role": "Роль", "requested": "Запрошена", "solved": "Решено кейсов", "avg": "Средняя оценка", "abilities": "✨ **Ваши возможности:**"},
+            "en": {"name": "Name", "role": "Role", "requested": "Requested", "solved": "Cases Solved", "avg": "Average Score", "abilities": "✨ **Your Abilities:**"}
         }
         l = labels.get(lang, labels["ru"])
 
+        # Materialized stats: one read by _id
+        stats = await StatsRepository.get("user", message.from_user.id)
+        avg = StatsRepository.average(stats)
+
         text = (
             f"👤 **{I18n.t('profile', lang)}**\n"
             f"━━━━━━━━━━━━━━━━━━\n"
             f"{l['name']}: {user.get('full_name')}\n"
             f"{l['role']}: `{role}`\n"
             f"{l['requested']}: `{user.get('requested_role')}`\n"
-            f"{l['solved']}: {user.get('cases_solved_count', user.get('cases_solved', 0))}\n\n"
+            f"{l['solved']}: {stats.get('solved', 0)}\n"
+            f"{l['avg']}: {avg if avg is not None else '—'}\n\n"
             f"{l['abilities']}\n"
             f"{ability_text}"
         )
@@ -10,6 +10,12 @@ import logging
 
 from legally_bot.database.users_repo import UsersRepository
 from legally_bot.services.i18n import I18n
+from legally_bot.services.metrics import metrics
+from legally_bot.database.mongo_db import MongoDB
+from legally_bot.database.indexes import verify_indexes
+from legally_bot.database.case_repo import CaseRepository
+from legally_bot.database.stats_repo import StatsRepository
+from legally_bot.services.passage_store import passage_store, COMPACT_COLLECTIONS
 
 router = Router()
 ingest_service = IngestionService()
@@ -185,3 +191,59 @@ async def handle_link(message: types.Message, state: FSMContext):
         msg = f"✅ Успешно проиндексировано {count} фрагментов из {url}."
     await message.answer(msg)
     await state.clear()
+
+@router.message(Command("metrics"))
+async def cmd_metrics(message: types.Message):
+    if not await AccessControl.is_developer(message.from_user.id):
+        return
+
+    logging.info(f"Developer {message.from_user.id} requested runtime metrics")
+    await message.answer(f"📈 Runtime Metrics:\n{metrics.format_text()}")
+
+@router.message(Command("explain_indexes"))
+async def cmd_explain_indexes(message: types.Message):
+    if not await AccessControl.is_developer(message.from_user.id):
+        return
+
+    logging.info(f"Developer {message.from_user.id} requested index verification")
+    report = await verify_indexes(MongoDB.get_db())
+    scans = [r for r in report if r["collscan"]]
+
+    text = f"🗂️ Index check: {len(report) - len(scans)}/{len(report)} queries use an index\n\n"
+    for r in report:
+        mark = "⚠️ COLLSCAN" if r["collscan"] else "✅"
+        text += f"{mark} {r['collection']} {list(r['filter'].keys())}: {' > '.join(r['stages'])}\n"
+    await message.answer(text)
+
+@router.message(Command("migrate_assignments"))
+async def cmd_migrate_assignments(message: types.Message):
+    if not await AccessControl.is_developer(message.from_user.id):
+        return
+
+    logging.info(f"Developer {message.from_user.id} started assignment migration")
+    repo = CaseRepository(MongoDB.get_db())
+    migrated = await repo.migrate_legacy_assignments()
+    await message.answer(f"✅ Migrated {migrated} legacy student/professor case copies to assignment references.")
+
+@router.message(Command("compact_passages"))
+async def cmd_compact_passages(message: types.Message):
+    if not await AccessControl.is_developer(message.from_user.id):
+        return
+
+    logging.info(f"Developer {message.from_user.id} started passage compaction")
+    await message.answer("🗜️ Moving embedded passage texts into the passage store...")
+    lines = []
+    for collection in COMPACT_COLLECTIONS:
+        stats = await passage_store.compact(collection)
+        lines.append(f"{collection}: {stats['documents']} documents, {stats['references']} references")
+    await message.answer("✅ Compaction finished.\n" + "\n".join(lines))
+
+@router.message(Command("rebuild_stats"))
+async def cmd_rebuild_stats(message: types.Message):
+    if not await AccessControl.is_developer(message.from_user.id):
+        return
+
+    logging.info(f"Developer {message.from_user.id} started a stats rebuild")
+    await message.answer("📊 Recomputing stats from feedback and rated assignments...")
+    count = await StatsRepository.rebuild()
+    await message.answer(f"✅ Rebuilt {count} stats documents.")
@@ -7,6 +7,10 @@ from aiogram.utils.keyboard import InlineKeyboardBuilder
 
 from legally_bot.database.mongo_db import MongoDB
 from legally_bot.database.case_repo import CaseRepository
+from legally_bot.database.pagination import parse_cursor
+from legally_bot.keyboards.keyboards import add_page_buttons
+from legally_bot.services.references import format_references
+from legally_bot.services.passage_store import passage_store
 from legally_bot.states.states import StudentModeState # Reuse or create new
 
 router = Router()
@@ -20,37 +24,42 @@ class RatingState(StatesGroup):
     rating_article = State()
     commenting = State()
 
+async def build_my_cases_kb(user_id: int, **cursor):
+    """Assignment buttons for one page plus ⬅️/➡️; None when the page is empty."""
+    repo = CaseRepository(MongoDB.get_db())
+    page = await repo.get_open_assignments_page(user_id, **cursor)
+    if not page["items"]:
+        return None
+
+    builder = InlineKeyboardBuilder()
+    for case in page["items"]:
+        # Button: "Case ID ... (Subject)"; the id is the assignment's
+        case_id = str(case["_id"])
+        # Use first 20 chars of question
+        label = f"{case.get('subject', 'General')}: {case.get('question', '')[:20]}..."
+        builder.button(text=label, callback_data=f"open_case:{case_id}")
+    builder.adjust(1)
+    return add_page_buttons(builder, "asg", page).as_markup()
+
 @router.message(Command("my_cases"))
 async def cmd_my_cases(message: types.Message):
     """
-    Lists cases assigned to the user.
+    Lists cases assigned to the user, one page at a time.
     """
-    user_id = message.from_user.id
-    db = MongoDB.get_db()
-    
-    # Check both collections? Or just assume one based on role?
-    # For now, let's search both locally for simplicity or assume User Role defines it.
-    # Let's search student_cases first.
-    
-    student_cases = await db.student_cases.find({"assigned_to": user_id, "status": "assigned"}).to_list(length=10)
-    prof_cases = await db.professor_cases.find({"assigned_to": user_id, "status": "assigned"}).to_list(length=10)
-    
-    all_cases = student_cases + prof_cases
-    
-    if not all_cases:
+    markup = await build_my_cases_kb(message.from_user.id)
+    if not markup:
         await message.answer("📭 You have no pending cases.")
         return
         
-    builder = InlineKeyboardBuilder()
-    for case in all_cases:
-        # Button: "Case ID ... (Subject)"
-        case_id = str(case["_id"])
-        # Use first 20 chars of question
-        label = f"{case.get('subject', 'General')}: {case.get('question', '')[:20]}..."
-        builder.button(text=label, callback_data=f"open_case:{case_id}")
-    
-    builder.adjust(1)
-    await message.answer("📋 **Your Assigned Cases**:", reply_markup=builder.as_markup(), parse_mode="Markdown")
+    await message.answer("📋 **Your Assigned Cases**:", reply_markup=markup, parse_mode="Markdown")
+
+@router.callback_query(F.data.startswith("page:asg:"))
+async def cb_my_cases_page(callback: types.CallbackQuery):
+    _, _, direction, cursor = callback.data.split(":")
+    markup = await build_my_cases_kb(callback.from_user.id, **parse_cursor(direction, cursor))
+    if markup:
+        await callback.message.edit_reply_markup(reply_markup=markup)
+    await callback.answer()
 
 @router.callback_query(F.data.startswith("open_case:"))
 async def cb_open_case(callback: types.CallbackQuery, state: FSMContext):
@@ -60,31 +69,34 @@ async def cb_open_case(callback: types.CallbackQuery, state: FSMContext):
     from bson import ObjectId
     try:
         oid = ObjectId(case_id)
-        db = MongoDB.get_db()
-        # Try finding in both
-        case = await db.student_cases.find_one({"_id": oid})
-        collection_type = "student_cases"
-        if not case:
-            case = await db.professor_cases.find_one({"_id": oid})
-            collection_type = "professor_cases"
+        repo = CaseRepository(MongoDB.get_db())
+        # Assignment + referenced case in one aggregation
+        case = await repo.get_assignment_with_case(oid)
             
         if not case:
             await callback.answer("Case not found.")
             return
             
-        # Display Case
+        # Display Case (references are rendered as numbered source lines; texts are loaded only here)
+        chunks, articles = await passage_store.hydrate(case.get('chunks'), case.get('articles'))
         text = f"**Question:** {case.get('question')}\n\n"
         text += f"**AI Answer:** {case.get('answer')}\n\n"
-        text += f"**Chunks:** {case.get('chunks')}\n\n"
-        text += f"**Articles:** {case.get('articles')}\n"
+        text += f"**Chunks:**\n{format_references(chunks)}\n\n"
+        text += f"**Articles:**\n{format_references(articles)}\n"
+        if len(text) > 4090:
+            text = text[:4087] + "..."
         
-        await state.update_data(case_id=case_id, collection_type=collection_type)
+        await state.update_data(case_id=case_id)
         
         # Rating Button
         kb = InlineKeyboardBuilder()
         kb.button(text="⭐ Rate This Case", callback_data="start_rating")
         
-        await callback.message.answer(text, reply_markup=kb.as_markup(), parse_mode="Markdown")
+        try:
+            await callback.message.answer(text, reply_markup=kb.as_markup(), parse_mode="Markdown")
+        except Exception as e:
+            logging.warning(f"Markdown parsing failed, sending case as plain text: {e}")
+            await callback.message.answer(text.replace("**", ""), reply_markup=kb.as_markup())
         await callback.answer()
         
     except Exception as e:
@@ -140,13 +152,15 @@ async def process_comment(message: types.Message, state: FSMContext):
         "article": data['rate_a']
     }
     
-    await repo.submit_rating(
-        collection_name=data['collection_type'],
-        case_id=case_oid,
+    rated = await repo.submit_rating(
+        assignment_id=case_oid,
         ratings=ratings,
         comment=comment,
         rater_id=message.from_user.id
     )
     
-    await message.answer("✅ **Rating Submitted!** Case moved to Rated Questions.")
+    if not rated:
+        await message.answer("⚠️ This case has already been rated.")
+    else:
+        await message.answer("✅ **Rating Submitted!** Case moved to Rated Questions.")
     await state.clear()
@@ -1,7 +1,12 @@
 from aiogram import Router, types, F
+from aiogram.filters import Command
+from aiogram.utils.keyboard import InlineKeyboardBuilder
 from legally_bot.services.access_control import AccessControl
 from legally_bot.services.workflow import WorkflowService
-from legally_bot.keyboards.keyboards import professor_review_kb
+from legally_bot.services.metrics import metrics
+from legally_bot.keyboards.keyboards import professor_review_kb, add_page_buttons
+from legally_bot.database.feedback_repo import FeedbackRepository
+from legally_bot.database.pagination import parse_cursor
 import logging
 
 from legally_bot.database.users_repo import UsersRepository
@@ -9,6 +14,25 @@ from legally_bot.services.i18n import I18n
 
 router = Router()
 
+def format_review_item(item: dict) -> str:
+    return (
+        f"📝 **Review Correction**\n"
+        f"Student ID: `{item['student_id']}`\n"
+        f"Error Type: {item['error_type']}\n"
+        f"Comment: {item['student_comment']}\n"
+        f"Status: {item['professor_validation_status']}"
+    )
+
+async def send_next_review(message: types.Message, professor_id: int, lang: str, skip_id: str = None):
+    """Claims the next correction for this professor and shows it, or reports an empty queue."""
+    item = await WorkflowService.claim_review(professor_id, skip_id=skip_id)
+    if not item:
+        msg = "No pending corrections to review." if lang == "en" else "Нет ожидающих исправлений для проверки."
+        return await message.answer(msg)
+
+    metrics.inc("review.claims")
+    await message.answer(format_review_item(item), parse_mode="Markdown", reply_markup=professor_review_kb(str(item['_id'])))
+
 @router.message(F.text.in_(["📝 Review Corrections", "📝 Проверить исправления"]))
 async def review_corrections(message: types.Message):
     logging.info(f"Professor {message.from_user.id} requested review queue")
@@ -18,23 +42,8 @@ async def review_corrections(message: types.Message):
     if not await AccessControl.is_professor(message.from_user.id):
         return await message.answer(I18n.t("no_access", lang))
     
-    queue = await WorkflowService.get_professor_queue()
-    if not queue:
-        msg = "No pending corrections to review." if lang == "en" else "Нет ожидающих исправлений для проверки."
-        return await message.answer(msg)
-    
-    # Just show the first one for now
-    item = queue[0]
-    
-    text = (
-        f"📝 **Review Correction**\n"
-        f"Student ID: `{item['student_id']}`\n"
-        f"Error Type: {item['error_type']}\n"
-        f"Comment: {item['student_comment']}\n"
-        f"Status: {item['professor_validation_status']}"
-    )
-    
-    await message.answer(text, parse_mode="Markdown", reply_markup=professor_review_kb(str(item['_id'])))
+    # Each professor gets their own leased item; an unfinished lease is handed back to its holder
+    await send_next_review(message, message.from_user.id, lang)
 
 @router.callback_query(F.data.startswith("rev_"))
 async def process_review(callback: types.CallbackQuery):
@@ -46,15 +55,59 @@ async def process_review(callback: types.CallbackQuery):
 
     action, feedback_id = callback.data.split("_")[1], callback.data.split("_")[2]
     logging.info(f"Professor {callback.from_user.id} {action}ed correction {feedback_id}")
-    
+
+    if action == "skip":
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer()
+        return await send_next_review(callback.message, callback.from_user.id, lang, skip_id=feedback_id)
+
     if action == "approve":
-        await WorkflowService.approve_correction(feedback_id, callback.from_user.id)
+        ok = await WorkflowService.approve_correction(feedback_id, callback.from_user.id)
         label = "✅ **APPROVED**" if lang == "en" else "✅ **ОДОБРЕНО**"
-        await callback.message.edit_text(callback.message.md_text + f"\n\n{label}")
     elif action == "reject":
-        await WorkflowService.reject_correction(feedback_id, callback.from_user.id)
+        ok = await WorkflowService.reject_correction(feedback_id, callback.from_user.id)
         label = "❌ **REJECTED**" if lang == "en" else "❌ **ОТКЛОНЕНО**"
-        await callback.message.edit_text(callback.message.md_text + f"\n\n{label}")
+    else:
+        return await callback.answer()
+
+    if not ok:
+        # The lease expired and another professor claimed (or resolved) this item
+        metrics.inc("review.lease_lost")
+        msg = "This correction was taken by another reviewer." if lang == "en" else "Это исправление уже взял другой проверяющий."
+        await callback.message.edit_reply_markup(reply_markup=None)
+        await callback.answer(msg, show_alert=True)
+        return await send_next_review(callback.message, callback.from_user.id, lang)
+
+    await callback.message.edit_text(callback.message.md_text + f"\n\n{label}")
     
     msg = f"Correction {action}d" if lang == "en" else f"Исправление {action == 'approve' and 'одобрено' or 'отклонено'}"
     await callback.answer(msg)
+    await send_next_review(callback.message, callback.from_user.id, lang)
+
+async def render_pending_corrections(**cursor):
+    """One page of the pending queue (read-only); leased items show their reviewer."""
+    page = await FeedbackRepository.get_pending_page(**cursor)
+    if not page["items"]:
+        return "No pending corrections to review.", None
+    text = "📝 Pending corrections, oldest first:\n\n"
+    for item in page["items"]:
+        comment = " ".join((item.get("student_comment") or "").split())
+        lease = f" | 🔒 {item['lease_owner']}" if item.get("lease_owner") else ""
+        text += f"{item['created_at']:%Y-%m-%d} | {item.get('error_type')} | {comment[:60]}{lease}\n"
+    return text, add_page_buttons(InlineKeyboardBuilder(), "fbq", page).as_markup()
+
+@router.message(Command("pending_corrections"))
+async def cmd_pending_corrections(message: types.Message):
+    if not await AccessControl.is_professor(message.from_user.id):
+        return
+    text, markup = await render_pending_corrections()
+    await message.answer(text, reply_markup=markup)
+
+@router.callback_query(F.data.startswith("page:fbq:"))
+async def cb_pending_corrections_page(callback: types.CallbackQuery):
+    if not await AccessControl.is_professor(callback.from_user.id):
+        return await callback.answer()
+    _, _, direction, cursor = callback.data.split(":")
+    text, markup = await render_pending_corrections(**parse_cursor(direction, cursor))
+    await callback.message.edit_text(text, reply_markup=markup)
+    await callback.answer()
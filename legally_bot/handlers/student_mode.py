@@ -3,6 +3,8 @@ from aiogram.fsm.context import FSMContext
 from legally_bot.services.access_control import AccessControl
 from legally_bot.services.workflow import WorkflowService
 from legally_bot.database.feedback_repo import FeedbackRepository
+from legally_bot.database.answer_pool_repo import AnswerPoolRepository
+from legally_bot.services.references import make_references
 from legally_bot.keyboards.keyboards import feedback_kb
 from legally_bot.states.states import StudentModeState
 import logging
@@ -13,36 +15,48 @@ from legally_bot.services.i18n import I18n
 router = Router()
 
 @router.message(F.text.in_(["🎓 Get Case", "🎓 Получить кейс"]))
-async def get_case(message: types.Message):
+async def get_case(message: types.Message, user: dict = None):
     logging.info(f"Student {message.from_user.id} requested a case")
-    user = await UsersRepository.get_user(message.from_user.id)
     lang = user.get("language", "ru") if user else "ru"
 
     if not await AccessControl.is_student(message.from_user.id):
         return await message.answer(I18n.t("no_access", lang))
 
-    # 1. Fetch Random Case
-    case = await FeedbackRepository.get_random_case()
-    if not case:
-        # If no cases in DB, generate a mock one for testing
-        case = {"_id": "mock_id_123", "text": "A mock case about Contract Law...", "domain": "Civil"}
-    
-    # 2. Get RAG Answer
-    rag_response = await WorkflowService.process_student_question(message.from_user.id, case['text'], lang=lang)
-    
     answer_label = "🤖 **Ответ ИИ:**" if lang == "ru" else "🤖 **AI Answer:**"
     sources_label = "📚 **Источники:**" if lang == "ru" else "📚 **Sources:**"
 
+    # 1. Precomputed case + answer (one indexed read)
+    pooled = await AnswerPoolRepository.get_random(lang)
+    if pooled:
+        case_id = str(pooled["case_id"])
+        case_text, domain, answer = pooled["case_text"], pooled.get("domain"), pooled["answer"]
+        sources = pooled.get("articles", []) + pooled.get("chunks", [])
+    else:
+        # Pool not built yet: pick a case and answer it live
+        case = await FeedbackRepository.get_random_case()
+        if not case:
+            # If no cases in DB, generate a mock one for testing
+            case = {"_id": "mock_id_123", "text": "A mock case about Contract Law...", "domain": "Civil"}
+        case_id = str(case["_id"])
+        case_text = case.get("text") or case.get("question")
+        domain = case.get("domain") or case.get("subject")
+
+        # 2. Get RAG Answer
+        role = user.get("actual_role", "student") if user else "student"
+        rag_response = await WorkflowService.process_student_question(message.from_user.id, case_text, lang=lang, role=role)
+        answer = rag_response["answer"]
+        sources = make_references(rag_response.get("articles", []) + rag_response.get("chunks", []))
+
     text = (
-        f"**Case (Domain: {case.get('domain')}):**\n`{case['text']}`\n\n"
-        f"{answer_label}\n{rag_response['answer']}\n\n"
+        f"**Case (Domain: {domain}):**\n`{case_text}`\n\n"
+        f"{answer_label}\n{answer}\n\n"
         f"{sources_label}\n"
     )
-    for doc in rag_response.get('source_documents', []):
-        text += f"- {doc['title']} (Confidence: {doc['score']})\n"
+    for ref in sources:
+        text += f"- {ref.get('source')} (Confidence: {ref.get('score')})\n"
         
     await message.answer(text, parse_mode="Markdown", 
-                         reply_markup=feedback_kb(str(case['_id']), "ai_resp_123", lang=lang))
+                         reply_markup=feedback_kb(case_id, "ai_resp_123", lang=lang))
 
 # --- Feedback Callback Handlers ---
 
@@ -67,7 +67,8 @@ def professor_review_kb(feedback_id: str):
     builder = InlineKeyboardBuilder()
     builder.button(text="✅ Approve", callback_data=f"rev_approve_{feedback_id}")
     builder.button(text="❌ Reject", callback_data=f"rev_reject_{feedback_id}")
-    builder.adjust(2)
+    builder.button(text="⏭ Skip", callback_data=f"rev_skip_{feedback_id}")
+    builder.adjust(2, 1)
     return builder.as_markup()
 
 def developer_kb():
@@ -84,3 +85,15 @@ def rating_kb(chat_id: str):
         builder.button(text=str(i), callback_data=f"rate_{i}_{chat_id}")
     builder.adjust(5, 5, 1)
     return builder.as_markup()
+
+def add_page_buttons(builder: InlineKeyboardBuilder, list_name: str, page: dict, arg: str = ""):
+    """Appends ⬅️/➡️ buttons (callback 'page:<list>:<p|n>:<cursor id>[:arg]') for a keyset page."""
+    suffix = f":{arg}" if arg else ""
+    buttons = []
+    if page["has_prev"]:
+        buttons.append(InlineKeyboardButton(text="⬅️", callback_data=f"page:{list_name}:p:{page['first']}{suffix}"))
+    if page["has_next"]:
+        buttons.append(InlineKeyboardButton(text="➡️", callback_data=f"page:{list_name}:n:{page['last']}{suffix}"))
+    if buttons:
+        builder.row(*buttons)
+    return builder
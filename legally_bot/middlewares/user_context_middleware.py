@@ -0,0 +1,44 @@
+from aiogram import BaseMiddleware
+from aiogram.types import TelegramObject, Update
+from typing import Callable, Dict, Any, Awaitable
+from legally_bot.database.users_repo import UsersRepository, user_lookup_stats
+from legally_bot.services.metrics import metrics
+
+class UserContextMiddleware(BaseMiddleware):
+    """
+    Loads the sender's user document once per update and injects it into
+    handler data as `user` (None if unregistered), `lang` and `role`.
+    Any further UsersRepository.get_user calls in the same update are served
+    by the TTL cache; the Mongo reads saved are counted in metrics.
+    """
+    async def __call__(
+        self,
+        handler: Callable[[TelegramObject, Dict[str, Any]], Awaitable[Any]],
+        event: TelegramObject,
+        data: Dict[str, Any]
+    ) -> Any:
+        from_user = None
+        if isinstance(event, Update):
+            if event.message:
+                from_user = event.message.from_user
+            elif event.callback_query:
+                from_user = event.callback_query.from_user
+
+        if from_user is None:
+            return await handler(event, data)
+
+        stats = {"lookups": 0, "reads": 0}
+        token = user_lookup_stats.set(stats)
+        try:
+            user = await UsersRepository.get_user(from_user.id)
+            data["user"] = user
+            data["lang"] = user.get("language", "ru") if user else "ru"
+            data["role"] = user.get("actual_role", "guest") if user else "guest"
+            return await handler(event, data)
+        finally:
+            user_lookup_stats.reset(token)
+            metrics.inc("user_ctx.updates")
+            metrics.inc("user_ctx.lookups", stats["lookups"])
+            metrics.inc("user_ctx.mongo_reads", stats["reads"])
+            metrics.inc("user_ctx.reads_saved", stats["lookups"] - stats["reads"])
+            metrics.observe("user_ctx.lookups_per_update", stats["lookups"])
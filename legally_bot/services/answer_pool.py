@@ -0,0 +1,132 @@
+import asyncio
+import logging
+from legally_bot.config import settings
+from legally_bot.database.mongo_db import db
+from legally_bot.database.answer_pool_repo import AnswerPoolRepository
+from legally_bot.database.index_state_repo import IndexStateRepository
+from legally_bot.services.metrics import metrics
+from legally_bot.services.references import passage_key
+from legally_bot.services.answer_status import is_failure
+
+class AnswerPoolWorker:
+    """
+    Background precompute of answers for every practice case, per language.
+    Answers are tagged with the index version. After an ingestion bumps the
+    version, each case is re-retrieved (no LLM); only answers whose passages
+    changed, and cases that are new or edited, are regenerated. Stale answers
+    are served meanwhile. Answers of deleted cases are pruned.
+    All generation runs as settings.ANSWER_POOL_REQUESTER_ID, so it is subject
+    to the scheduler's per-user batch cap and metered like any batch job.
+    """
+    CHUNK_SIZE = 200  # Cases loaded and generated per round
+
+    def __init__(self):
+        self._wake = asyncio.Event()
+
+    def wake(self):
+        """Starts a refresh now instead of at the next interval (e.g. after ingestion)."""
+        self._wake.set()
+
+    async def refresh(self, batch_service) -> int:
+        version = await IndexStateRepository.get_version()
+        generated = 0
+        for lang in settings.ANSWER_POOL_LANGS:
+            async for chunk in self._case_chunks():
+                generated += await self._refresh_chunk(batch_service, chunk, lang, version)
+        pruned = await AnswerPoolRepository.prune_orphans()
+        if generated or pruned:
+            logging.info(f"🧺 Answer pool: generated {generated} answers for index version {version}, pruned {pruned}")
+        return generated
+
+    async def _case_chunks(self):
+        """
+        Cases with a text, CHUNK_SIZE at a time (async for). Each chunk is a
+        short query continuing after the last _id, so no cursor stays open
+        while a chunk is being generated.
+        """
+        last = None
+        while True:
+            query = {"_id": {"$gt": last}} if last is not None else {}
+            page = await db.get_db()["cases"].find(
+                query, {"text": 1, "question": 1, "domain": 1, "subject": 1}
+            ).sort("_id", 1).to_list(length=self.CHUNK_SIZE)
+            if not page:
+                return
+            last = page[-1]["_id"]
+            chunk = [case for case in page if case.get("text") or case.get("question")]
+            if chunk:
+                yield chunk
+            if len(page) < self.CHUNK_SIZE:
+                return
+
+    async def _refresh_chunk(self, batch_service, cases: list, lang: str, version: int) -> int:
+        answers = await AnswerPoolRepository.get_answers(lang, [c["_id"] for c in cases])
+        todo, outdated = [], []
+        for case in cases:
+            answer = answers.get(case["_id"])
+            if answer is None or answer.get("case_text") != (case.get("text") or case.get("question")):
+                todo.append(case)
+            elif answer.get("index_version") != version:
+                outdated.append((case, answer))
+
+        if outdated:
+            retrieved = await batch_service.rag.retrieve_batch([c.get("text") or c.get("question") for c, _ in outdated])
+            unchanged = []
+            for (case, answer), retrieval in zip(outdated, retrieved):
+                if self._same_passages(answer, retrieval):
+                    unchanged.append(case["_id"])
+                else:
+                    todo.append(case)
+            await AnswerPoolRepository.mark_current(lang, unchanged, version)
+            metrics.inc("answer_pool.carried_over", len(unchanged))
+        return await self._generate(batch_service, todo, lang, version) if todo else 0
+
+    @staticmethod
+    def _same_passages(answer: dict, retrieval: dict) -> bool:
+        """True if retrieval on the current index still returns the passages the stored answer cites, in order."""
+        if retrieval is None:
+            return False
+        cited = False
+        for field in ("chunks", "articles"):
+            stored = [ref.get("key") for ref in answer.get(field) or []]
+            if stored != [passage_key(doc) for doc in retrieval[field][:len(stored)]]:
+                return False
+            cited = cited or bool(stored)
+        return cited
+
+    async def _generate(self, batch_service, cases: list, lang: str, version: int) -> int:
+        saved = 0
+
+        async def on_result(i, result):
+            nonlocal saved
+            # Failed rows (incl. placeholder answers) are left for the next round
+            if result["status"] != "success" or is_failure(result["answer"]):
+                return
+            await AnswerPoolRepository.save_answer(
+                cases[i], lang, version, result["answer"], result["chunks"], result["articles"]
+            )
+            saved += 1
+            metrics.inc("answer_pool.generated")
+
+        questions = [c.get("text") or c.get("question") for c in cases]
+        await batch_service.run_batch(
+            questions, requested_by=settings.ANSWER_POOL_REQUESTER_ID, lang=lang, on_result=on_result
+        )
+        return saved
+
+    async def run_forever(self, batch_service):
+        """Refreshes the pool at startup, every ANSWER_POOL_INTERVAL_SECONDS and when woken."""
+        while True:
+            self._wake.clear()
+            try:
+                await self.refresh(batch_service)
+            except asyncio.CancelledError:
+                raise
+            except Exception as e:
+                logging.error(f"Answer pool refresh failed: {e}", exc_info=True)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout=settings.ANSWER_POOL_INTERVAL_SECONDS)
+            except asyncio.TimeoutError:
+                pass
+
+answer_pool = AnswerPoolWorker()
@@ -0,0 +1,19 @@
+# Placeholder answers RAGEngine returns instead of raising, so chat can show
+# them as-is. Batch work must not store them as answers (see require_answer).
+SEARCH_UNAVAILABLE = "Search currently unavailable."
+SEARCH_ERROR = "Error during search."
+SERVICE_UNAVAILABLE = "⚠️ AI service unavailable."
+
+FAILURE_ANSWERS = {SEARCH_UNAVAILABLE, SEARCH_ERROR, SERVICE_UNAVAILABLE}
+
+class AnswerFailed(Exception):
+    """Raised when a pipeline run produced a placeholder instead of an answer."""
+
+def is_failure(answer) -> bool:
+    return not isinstance(answer, str) or not answer.strip() or answer.strip() in FAILURE_ANSWERS
+
+def require_answer(answer) -> str:
+    """Returns the answer, or raises AnswerFailed for an empty or placeholder answer."""
+    if is_failure(answer):
+        raise AnswerFailed(answer.strip() if isinstance(answer, str) and answer.strip() else "empty answer")
+    return answer
@@ -0,0 +1,50 @@
+import heapq
+from itertools import cycle
+
+STRATEGIES = ("round_robin", "least_loaded")
+
+def plan_round_robin(case_ids: list, assignees: list, copies: int = 1) -> list:
+    """
+    Deals every case `copies` times to the cohort in turn.
+    A case never goes twice to the same assignee. Returns [(case_id, assignee_id)].
+    """
+    pairs = []
+    if not assignees:
+        return pairs
+    turn = cycle(range(len(assignees)))
+    for case_id in case_ids:
+        taken = set()
+        for _ in range(min(copies, len(assignees))):
+            # Next assignee in turn that does not have this case yet
+            for _ in range(len(assignees)):
+                assignee = assignees[next(turn)]
+                if assignee not in taken:
+                    break
+            taken.add(assignee)
+            pairs.append((case_id, assignee))
+    return pairs
+
+def plan_least_loaded(case_ids: list, assignees: list, copies: int = 1, loads: dict = None) -> list:
+    """
+    Gives each case copy to the assignee with the fewest open assignments
+    (current load from `loads` plus what this plan already handed out).
+    """
+    pairs = []
+    loads = loads or {}
+    # (load, order, assignee); order keeps ties in cohort order
+    heap = [(loads.get(a, 0), i, a) for i, a in enumerate(assignees)]
+    heapq.heapify(heap)
+    for case_id in case_ids:
+        popped = []
+        for _ in range(min(copies, len(assignees))):
+            load, order, assignee = heapq.heappop(heap)
+            pairs.append((case_id, assignee))
+            popped.append((load + 1, order, assignee))
+        for entry in popped:
+            heapq.heappush(heap, entry)
+    return pairs
+
+def plan(strategy: str, case_ids: list, assignees: list, copies: int = 1, loads: dict = None) -> list:
+    if strategy == "least_loaded":
+        return plan_least_loaded(case_ids, assignees, copies, loads)
+    return plan_round_robin(case_ids, assignees, copies)
@@ -1,103 +1,278 @@
 
 import logging
 import asyncio
+import time
 import uuid
-import pandas as pd
-import json
 from io import BytesIO
+from bson import ObjectId
 from legally_bot.services.rag_engine import RAGEngine
 from legally_bot.services.resilience import with_retry
+from legally_bot.services.scheduler import Workload
+from legally_bot.services.metrics import metrics
+from legally_bot.services.tabular_io import read_rows, read_chunks, output_format_for, ResultWriter
+from legally_bot.services.passage_store import passage_store
+from legally_bot.services.answer_status import require_answer
+from legally_bot.database.batch_repo import BatchJobRepository
+from legally_bot.config import settings
+
+# Appended to the uploaded columns in the result file
+RESULT_COLUMNS = ["ai_answer", "chunks", "articles", "status", "elapsed_s"]
 
 class BatchService:
     def __init__(self):
         self.rag = RAGEngine()
-        # Semaphore to limit concurrent RAG requests (prevent hitting rate limits)
-        self.semaphore = asyncio.Semaphore(5) 
+        # Worker pool size; the RAG scheduler and LLM rate governor enforce the global limits
+        self.concurrency = settings.RAG_BATCH_CONCURRENCY
+        self._running = {}  # job_id -> asyncio.Task
+
+    async def start_job(self, file_content: BytesIO, filename: str, requested_by: int, chat_id: int) -> ObjectId:
+        """Streams the uploaded rows into a persisted batch job. Run it with launch()."""
+        logging.info(f"📦 Starting batch processing for {filename}")
+        # Opening the file and reading the header happen off the event loop too
+        columns, rows = await asyncio.to_thread(read_rows, file_content, filename)
+        return await BatchJobRepository.create_job(
+            filename, requested_by, chat_id, columns,
+            read_chunks(rows, BatchJobRepository.CHUNK_SIZE), output_format_for(filename)
+        )
 
-    async def process_file(self, file_content: BytesIO, filename: str) -> BytesIO:
+    def launch(self, job_id: ObjectId, progress_callback=None, on_finish=None) -> asyncio.Task:
         """
-        Processes an Excel or JSON file containing questions.
-        Returns an Excel file with answers.
+        Runs a job in the background. on_finish(job) is awaited when the job
+        completes (not when it is cancelled).
         """
-        logging.info(f"📦 Starting batch processing for {filename}")
-        
-        # 1. Parse File
+        async def runner():
+            job = await self.run_job(job_id, progress_callback)
+            if on_finish and job and job["status"] == "completed":
+                await on_finish(job)
+
+        task = asyncio.create_task(runner())
+        self._running[job_id] = task
+        task.add_done_callback(lambda t: self._running.pop(job_id, None))
+        return task
+
+    def is_running(self, job_id: ObjectId) -> bool:
+        return job_id in self._running
+
+    async def cancel(self, job_id: ObjectId) -> bool:
+        job = await BatchJobRepository.get_job(job_id)
+        if not job or job["status"] != "running":
+            return False
+        await BatchJobRepository.set_status(job_id, "cancelled")
+        task = self._running.get(job_id)
+        if task:
+            task.cancel()
+        logging.info(f"🛑 Batch job {job_id} cancelled")
+        return True
+
+    async def run_job(self, job_id: ObjectId, progress_callback=None):
+        """
+        Processes the pending items of a job, checkpointing each result.
+        Safe to call again after a restart: finished items are not re-run.
+        """
+        job = await BatchJobRepository.get_job(job_id)
+        if not job or job["status"] != "running":
+            return job
+
+        remaining = await BatchJobRepository.count_pending(job_id)
+        already_done = job["total"] - remaining
+        if already_done:
+            logging.info(f"🔁 Resuming batch job {job_id} at {already_done}/{job['total']}")
+
+        async def on_result(index, result):
+            await BatchJobRepository.save_item_result(job_id, index, result)
+
+        async def on_progress(done, total):
+            if progress_callback:
+                await progress_callback(already_done + done, job["total"])
+
         try:
-            if filename.endswith('.xlsx'):
-                df = pd.read_excel(file_content)
-            elif filename.endswith('.json'):
-                data = json.load(file_content)
-                df = pd.DataFrame(data)
-            else:
-                raise ValueError("Unsupported file format. Use .xlsx or .json")
-            
-            # Ensure 'question' column exists
-            if 'question' not in df.columns:
-                 # Try to find a column that looks like a question
-                 potential = [c for c in df.columns if 'vopros' in c.lower() or 'quest' in c.lower()]
-                 if potential:
-                     df.rename(columns={potential[0]: 'question'}, inplace=True)
-                 else:
-                     raise ValueError("File must contain a 'question' column.")
-                     
+            pending = ((item["index"], item["question"]) async for item in BatchJobRepository.iter_pending_items(job_id))
+            await self.run_batch(pending, job["requested_by"], on_progress, on_result, total=remaining)
+        except asyncio.CancelledError:
+            logging.info(f"Batch job {job_id} stopped at a checkpoint")
+            raise
         except Exception as e:
-            logging.error(f"Failed to parse batch file: {e}")
-            raise e
-
-        questions = df['question'].tolist()
-        results = []
-        
-        # 2. Process Async
-        tasks = [self._process_single_question(q) for q in questions]
-        
-        # Run with progress tracking
-        processed_count = 0
-        total = len(tasks)
-        
-        for task in asyncio.as_completed(tasks):
-            result = await task
-            results.append(result)
-            processed_count += 1
-            if processed_count % 5 == 0:
-                logging.info(f"   Batch Progress: {processed_count}/{total}")
-
-        # 3. Create Result DataFrame
-        # Sort back to original order? asyncio.as_completed yields out of order.
-        # Better to wait all
-        # Let's re-run with gather to keep order
-        results = await asyncio.gather(*tasks) # This keeps order matching 'questions'
-        
-        result_df = df.copy()
-        result_df['ai_answer'] = [r['answer'] for r in results]
-        result_df['chunks'] = [str(r['chunks']) for r in results]
-        result_df['articles'] = [str(r['articles']) for r in results]
-        result_df['status'] = [r.get('status', 'success') for r in results]
-        
-        # 4. Export
-        output = BytesIO()
-        result_df.to_excel(output, index=False)
-        output.seek(0)
-        
-        logging.info(f"✅ Batch processing complete for {filename}")
-        return output
+            logging.error(f"Batch job {job_id} failed: {e}")
+            await BatchJobRepository.set_status(job_id, "failed")
+            raise
+
+        job = await BatchJobRepository.get_job(job_id)
+        if job["status"] == "running":
+            job = await BatchJobRepository.set_status(job_id, "completed")
+        logging.info(f"✅ Batch job {job_id} finished: {job['done'] - job['failed']} ok, {job['failed']} failed")
+        return job
+
+    async def retry_failed(self, job_id: ObjectId) -> int:
+        """Re-queues only the failed rows of a job. Returns how many were reset."""
+        if self.is_running(job_id):
+            return 0
+        return await BatchJobRepository.reset_failed(job_id)
+
+    async def export(self, job: dict, save_cases=None):
+        """
+        Streams a job's items, in input order, into a result file with the
+        original columns plus answer, status and timing columns. References
+        are hydrated with passage snippets for the file only.
+        save_cases(rows) is awaited for every chunk of successful rows not yet
+        saved to the library. Returns (file, result filename, rows saved).
+        """
+        columns = list(job.get("columns") or ["question"])
+        columns += [c for c in RESULT_COLUMNS if c not in columns]
+        writer = ResultWriter(job.get("output_format", "xlsx"), columns)
+
+        pending_rows, pending_cases, pending_indexes = [], [], []
+        saved = 0
+
+        async def flush():
+            nonlocal saved, pending_rows, pending_cases, pending_indexes
+            # The file shows passage snippets: one passage lookup per chunk of rows
+            lists = await passage_store.hydrate(*[row[c] for row in pending_rows for c in ("chunks", "articles")]) if pending_rows else []
+            for i, row in enumerate(pending_rows):
+                writer.append({**row, "chunks": lists[2 * i], "articles": lists[2 * i + 1]})
+            if save_cases and pending_cases:
+                await save_cases(pending_cases)
+                await BatchJobRepository.mark_saved(job["_id"], pending_indexes)
+                saved += len(pending_cases)
+            pending_rows, pending_cases, pending_indexes = [], [], []
+
+        async for item in BatchJobRepository.iter_items(job["_id"]):
+            row = {
+                **item["row"],
+                "ai_answer": item.get("answer", ""),
+                "chunks": item.get("chunks", []),
+                "articles": item.get("articles", []),
+                "status": item["status"] if item["status"] != "failed" else item.get("error") or "failed",
+                "elapsed_s": item.get("elapsed_s")
+            }
+            pending_rows.append(row)
+            if item["status"] == "success" and not item.get("saved"):
+                # The library keeps references only
+                pending_cases.append(row)
+                pending_indexes.append(item["index"])
+            if len(pending_rows) >= BatchJobRepository.CHUNK_SIZE:
+                await flush()
+        await flush()
+
+        base = job["filename"].rsplit(".", 1)[0]
+        return writer.close(), f"processed_{base}{writer.extension}", saved
+
+    @staticmethod
+    async def _numbered(questions: list):
+        for i, question in enumerate(questions):
+            yield i, question
+
+    async def run_batch(self, questions, requested_by: int = None, progress_callback=None, on_result=None,
+                        lang: str = "ru", total: int = None) -> list:
+        """
+        Runs every question once. questions is a list, or an async iterable of
+        (key, question) pairs read as the batch advances (pass total with it).
+        Retrieval is done in bulk blocks (RAGEngine.retrieve_batch) by a producer
+        that stays at most one block ahead; a fixed pool of workers then
+        generates the answers. on_result(key, result) and
+        progress_callback(done, total) are awaited after each item; list keys
+        are input positions.
+        Results are only kept in memory without on_result: then the list of
+        results in input order is returned, otherwise None.
+        """
+        if isinstance(questions, list):
+            total = len(questions)
+            questions = self._numbered(questions)
+        results = [None] * total if on_result is None else None
+        block_size = settings.BATCH_RETRIEVAL_SIZE
+        num_workers = min(self.concurrency, total)
+        queue = asyncio.Queue(maxsize=block_size)
+
+        done = 0
+        started = time.perf_counter()
+
+        async def put_block(block):
+            retrieved = await self.rag.retrieve_batch([question for _, question in block])
+            for (key, question), retrieval in zip(block, retrieved):
+                await queue.put((key, question, retrieval))
+
+        async def producer():
+            block = []
+            async for pair in questions:
+                block.append(pair)
+                if len(block) >= block_size:
+                    await put_block(block)
+                    block = []
+            if block:
+                await put_block(block)
+            for _ in range(num_workers):
+                await queue.put(None)
+
+        async def worker():
+            nonlocal done
+            while True:
+                item = await queue.get()
+                if item is None:
+                    return
+                key, question, retrieval = item
+                result = await self._process_single_question(question, requested_by, retrieval, lang)
+                if on_result:
+                    await on_result(key, result)
+                else:
+                    results[key] = result
+                done += 1
+                if done % 5 == 0 or done == total:
+                    logging.info(f"   Batch Progress: {done}/{total}")
+                if progress_callback:
+                    try:
+                        await progress_callback(done, total)
+                    except Exception as e:
+                        logging.warning(f"Failed to update batch progress: {e}")
+
+        if not total:
+            return results
+        tasks = [asyncio.create_task(producer())] + [asyncio.create_task(worker()) for _ in range(num_workers)]
+        try:
+            await asyncio.gather(*tasks)
+        except BaseException:
+            for t in tasks:
+                t.cancel()
+            raise
+
+        elapsed = time.perf_counter() - started
+        metrics.observe("batch.item_s", elapsed / total)
+        logging.info(f"📦 Batch of {total} finished in {elapsed:.1f}s ({total / elapsed:.2f} q/s)")
+        return results
 
     @with_retry(attempts=3)
-    async def _process_single_question(self, question: str):
-        async with self.semaphore:
-            try:
-                # Use RAG to answer
-                response = await self.rag.search(question)
-                return {
-                    "answer": response['answer'],
-                    "chunks": response['chunks'],
-                    "articles": response['articles'],
-                    "status": "success"
-                }
-            except Exception as e:
-                logging.error(f"Error processing question '{question[:20]}...': {e}")
-                return {
-                    "answer": "Error",
-                    "chunks": [],
-                    "articles": [],
-                    "status": f"failed: {str(e)}"
-                }
+    async def _answer_question(self, question: str, requested_by: int, retrieval: dict, lang: str):
+        """One attempt at a question; raises (also on a placeholder answer) so with_retry can try again."""
+        # Use RAG to answer (queued behind interactive work by the scheduler).
+        # Questions retrieved in bulk only need generation.
+        if retrieval is not None:
+            response = await self.rag.answer_from_retrieval(question, retrieval, lang=lang, user_id=requested_by, role="admin", workload=Workload.BATCH)
+        else:
+            response = await self.rag.search(question, lang=lang, user_id=requested_by, role="admin", workload=Workload.BATCH)
+        answer = require_answer(response['answer'])
+        # Passage texts are stored once; results keep references (key, source, article, score)
+        chunks, articles = await passage_store.references(response['chunks'], response['articles'])
+        return answer, chunks, articles
+
+    async def _process_single_question(self, question: str, requested_by: int = None, retrieval: dict = None, lang: str = "ru"):
+        """Result row for one question; a question that still fails after the retries becomes a failed row."""
+        if not isinstance(question, str) or not question.strip():
+            return {"answer": "", "chunks": [], "articles": [], "status": "skipped: empty question", "elapsed_s": 0.0}
+
+        started = time.perf_counter()
+        try:
+            answer, chunks, articles = await self._answer_question(question, requested_by, retrieval, lang)
+            return {
+                "answer": answer,
+                "chunks": chunks,
+                "articles": articles,
+                "status": "success",
+                "elapsed_s": round(time.perf_counter() - started, 2)
+            }
+        except Exception as e:
+            logging.error(f"Error processing question '{question[:20]}...': {e}")
+            return {
+                "answer": "Error",
+                "chunks": [],
+                "articles": [],
+                "status": f"failed: {str(e)}",
+                "elapsed_s": round(time.perf_counter() - started, 2)
+            }
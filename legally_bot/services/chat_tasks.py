@@ -0,0 +1,109 @@
+import asyncio
+import logging
+from collections import defaultdict
+from typing import Awaitable, Callable
+from legally_bot.config import settings
+from legally_bot.services.metrics import metrics
+
+class ChatTaskRegistry:
+    """
+    Tracks the in-flight RAG task of every chat.
+    - A new message cancels the running task and is merged with the
+      messages it superseded (rapid-fire messages become one query).
+    - Each task first waits out a debounce window so bursts coalesce
+      before any retrieval or LLM work starts.
+    - cancel() drops everything for a chat (exit, /start).
+    - Once an answer starts going out (deliver()), it is sent to the end even
+      if the task is superseded, and its messages are not merged again.
+    """
+    def __init__(self, debounce: float, max_merged: int = 5):
+        self.debounce = debounce
+        self.max_merged = max_merged
+        self._tasks = {}
+        self._pending = defaultdict(list)
+        self._background = defaultdict(set)
+        self._delivering = set()  # Shielded deliveries, kept referenced until done
+        self._answered = set()    # Chat tasks whose answer has started going out
+
+    def submit(self, chat_id: int, text: str, runner: Callable[[str], Awaitable[None]]):
+        previous = self._tasks.get(chat_id)
+        if previous and not previous.done():
+            previous.cancel()
+            metrics.inc("chat.superseded")
+            logging.info(f"✂️ Chat {chat_id}: superseding in-flight request")
+
+        self._pending[chat_id].append(text)
+        self._pending[chat_id] = self._pending[chat_id][-self.max_merged:]
+
+        task = asyncio.create_task(self._run(chat_id, runner))
+        self._tasks[chat_id] = task
+        task.add_done_callback(lambda t: self._finish(chat_id, t))
+
+    async def _run(self, chat_id: int, runner: Callable[[str], Awaitable[None]]):
+        await asyncio.sleep(self.debounce)
+        texts = list(self._pending[chat_id])
+        if len(texts) > 1:
+            logging.info(f"Chat {chat_id}: coalesced {len(texts)} messages into one query")
+            metrics.inc("chat.coalesced", len(texts) - 1)
+        task = asyncio.current_task()
+        try:
+            await runner("\n".join(texts))
+        except asyncio.CancelledError:
+            if task in self._answered:
+                self._consume(chat_id, texts)
+            raise
+        except Exception as e:
+            logging.error(f"Chat {chat_id} request failed: {e}", exc_info=True)
+        finally:
+            self._answered.discard(task)
+        self._consume(chat_id, texts)
+
+    def _consume(self, chat_id: int, texts: list):
+        """Answered: these messages must not be merged into the next query."""
+        pending = self._pending.get(chat_id)
+        if pending is None or pending[:len(texts)] != texts:
+            return
+        if pending[len(texts):]:
+            self._pending[chat_id] = pending[len(texts):]
+        else:
+            del self._pending[chat_id]
+
+    async def deliver(self, chat_id: int, coro: Awaitable[None]):
+        """
+        Sends an answer (and logs it) to completion. Cancelling the caller after
+        this point (superseded, /start, exit) no longer cuts a reply in half.
+        """
+        current = asyncio.current_task()
+        if self._tasks.get(chat_id) is current:
+            self._answered.add(current)
+        task = asyncio.ensure_future(coro)
+        self._delivering.add(task)
+        task.add_done_callback(self._delivering.discard)
+        await asyncio.shield(task)
+
+    def _finish(self, chat_id: int, task: asyncio.Task):
+        if self._tasks.get(chat_id) is task:
+            del self._tasks[chat_id]
+
+    def track_background(self, chat_id: int, task: asyncio.Task):
+        """Registers follow-up work (e.g. deferred full answers) so cancel() reaches it too."""
+        self._background[chat_id].add(task)
+        task.add_done_callback(self._background[chat_id].discard)
+
+    def cancel(self, chat_id: int) -> bool:
+        cancelled = False
+        task = self._tasks.pop(chat_id, None)
+        if task and not task.done():
+            task.cancel()
+            cancelled = True
+        for bg in list(self._background.pop(chat_id, set())):
+            if not bg.done():
+                bg.cancel()
+                cancelled = True
+        self._pending.pop(chat_id, None)
+        if cancelled:
+            metrics.inc("chat.cancelled")
+            logging.info(f"🛑 Chat {chat_id}: cancelled in-flight work")
+        return cancelled
+
+chat_tasks = ChatTaskRegistry(debounce=settings.CHAT_DEBOUNCE_SECONDS)
@@ -38,6 +38,13 @@ class I18n:
             "enter_code": "🔑 Пожалуйста, введите 6-значный код из письма:",
             "wrong_code": "❌ Неверный код. Попробуйте еще раз или введите /start для перезапуска.",
             "resend_code": "Код отправлен повторно.",
+            "greeting_reply": "Здравствуйте! Я Legally — ИИ-помощник по законодательству Казахстана. Задайте свой правовой вопрос.",
+            "article_not_found": "Статья {article} не найдена в базе знаний.",
+            "quota_degraded": "ℹ️ Лимит запросов исчерпан — ответ подготовлен в упрощенном режиме.",
+            "overload_busy": "⏳ Сервис ИИ сейчас перегружен. Пожалуйста, повторите запрос чуть позже.",
+            "overload_summary": "⏳ Сервис ИИ перегружен, поэтому ниже — найденные нормы закона без анализа ИИ:",
+            "overload_followup": "📨 Полный ответ будет отправлен, как только освободятся мощности.",
+            "followup_answer": "📨 **Полный ответ на ваш вопрос:**",
         },
         "en": {
             "welcome": "Welcome to Legally — your AI Lex Expert!\nLet's get started. Please enter your **Full Name**:",
@@ -76,6 +83,13 @@ class I18n:
             "enter_code": "🔑 Please enter the 6-digit code from the email:",
             "wrong_code": "❌ Incorrect code. Try again or type /start to restart.",
             "resend_code": "Code resent.",
+            "greeting_reply": "Hello! I am Legally, an AI assistant for Kazakhstan law. Ask me your legal question.",
+            "article_not_found": "Article {article} was not found in the knowledge base.",
+            "quota_degraded": "ℹ️ Usage limit reached — this answer was prepared in simplified mode.",
+            "overload_busy": "⏳ The AI service is overloaded right now. Please try again shortly.",
+            "overload_summary": "⏳ The AI service is overloaded, so here are the relevant legal provisions without AI analysis:",
+            "overload_followup": "📨 A full answer will be sent as soon as capacity is available.",
+            "followup_answer": "📨 **Full answer to your question:**",
         },
         "kk": {
             "welcome": "Legally-ға қош келдіңіз — сіздің жасанды интеллект заңгер сарапшыңыз!\nБастайық. **Толық аты-жөніңізді** енгізіңіз:",
@@ -114,6 +128,13 @@ class I18n:
             "enter_code": "🔑 Хаттағы 6 таңбалы кодты енгізіңіз:",
             "wrong_code": "❌ Қате код. Қайталап көріңіз немесе қайта бастау үшін /start теріңіз.",
             "resend_code": "Код қайта жіберілді.",
+            "greeting_reply": "Сәлеметсіз бе! Мен Legally — Қазақстан заңнамасы бойынша ЖИ көмекшісімін. Құқықтық сұрағыңызды қойыңыз.",
+            "article_not_found": "{article}-бап білім базасында табылмады.",
+            "quota_degraded": "ℹ️ Сұраныс лимиті таусылды — жауап жеңілдетілген режимде дайындалды.",
+            "overload_busy": "⏳ ЖИ қызметі қазір шамадан тыс жүктелген. Сәл кейінірек қайталаңыз.",
+            "overload_summary": "⏳ ЖИ қызметі жүктелген, сондықтан төменде ЖИ талдауынсыз тиісті заң нормалары берілген:",
+            "overload_followup": "📨 Толық жауап мүмкіндік болған кезде жіберіледі.",
+            "followup_answer": "📨 **Сұрағыңызға толық жауап:**",
         }
     }
 
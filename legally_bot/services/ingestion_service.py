@@ -7,6 +7,8 @@ import trafilatura
 from pinecone import Pinecone
 from sentence_transformers import SentenceTransformer
 from legally_bot.config import settings
+from legally_bot.database.index_state_repo import IndexStateRepository
+from legally_bot.services.answer_pool import answer_pool
 
 class IngestionService:
     def __init__(self):
@@ -269,3 +271,10 @@ class IngestionService:
                 except Exception as e:
                     logging.warning(f"Failed to update progress: {e}")
 
+        # New index contents: precomputed case answers are now stale
+        try:
+            version = await IndexStateRepository.bump(reason=f"ingested {len(vectors)} vectors")
+            logging.info(f"🔢 Index version is now {version}")
+            answer_pool.wake()
+        except Exception as e:
+            logging.error(f"Failed to bump index version: {e}")
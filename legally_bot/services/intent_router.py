@@ -0,0 +1,113 @@
+import re
+from dataclasses import dataclass
+from typing import Optional
+
+class Intent:
+    GREETING = "greeting"
+    OFF_TOPIC = "off_topic"
+    ARTICLE_LOOKUP = "article_lookup"
+    LEGAL_QUESTION = "legal_question"
+
+@dataclass
+class RouteDecision:
+    intent: str
+    reason: str
+    article: Optional[str] = None
+    code: Optional[str] = None  # Legal code named next to the article, e.g. "civil" for "ст. 15 ГК"
+
+class IntentRouter:
+    """
+    Cheap keyword automaton that classifies a query before any retrieval runs.
+    Order matters: greeting -> article lookup -> legal vocabulary -> off-topic.
+    """
+    GREETINGS = {
+        "hello", "hi", "hey", "start", "good morning", "good evening", "thanks", "thank you",
+        "привет", "здравствуйте", "здравствуй", "добрый день", "добрый вечер", "доброе утро", "спасибо",
+        "салем", "сәлем", "сәлеметсіз бе", "рахмет",
+        "how are you", "как дела", "who are you", "кто ты", "ты кто",
+    }
+
+    # Word stems that mark a query as legal even when it is short
+    LEGAL_STEMS = (
+        "law", "legal", "court", "contract", "right", "claim", "penalt", "crime", "criminal", "code", "tax",
+        "закон", "прав", "суд", "договор", "иск", "штраф", "наказ", "преступ", "кодекс", "налог", "ответствен",
+        "трудов", "наслед", "брак", "алимент", "увольн", "собственн", "арест", "адвокат", "юрист", "жалоб",
+        "заң", "құқ", "сот", "шарт", "айыппұл",
+    )
+
+    OFF_TOPIC_STEMS = (
+        "weather", "joke", "recipe", "movie", "song", "football", "game",
+        "погод", "анекдот", "шутк", "рецепт", "фильм", "песн", "футбол", "игр",
+        "ауа райы", "әзіл",
+    )
+
+    ARTICLE_PATTERN = re.compile(
+        r"^(?:article|art\.?|ст\.?|статья|статью|статьи|бап|бабы)\s*(\d+(?:-\d+)?)\b(.*)$",
+        re.IGNORECASE,
+    )
+    # Legal codes by abbreviation or title stem (ru/en/kk). Matched against both the
+    # query and the indexed source titles; procedure codes go first so
+    # "гражданский процессуальный кодекс" is not taken for the civil code.
+    LEGAL_CODES = (
+        ("civil_procedure", re.compile(r"\bгпк\b|гражданск\w*\s+процесс|civil\s+procedure|азаматтық\s+процест")),
+        ("criminal_procedure", re.compile(r"\bупк\b|уголовн\w*[\s-]+процесс|criminal\s+procedure|қылмыстық[\s-]+процест")),
+        ("civil", re.compile(r"\bгк\b|гражданск|\bcivil\b|азаматтық")),
+        ("criminal", re.compile(r"\bук\b|уголовн|\bcriminal\b|қылмыстық")),
+        ("labor", re.compile(r"\bтк\b|трудов|\blabou?r\b|еңбек")),
+        ("tax", re.compile(r"\bнк\b|налогов|\btax\b|салық")),
+        ("administrative", re.compile(r"\bкоап\b|административн|\badministrative\b|әкімшілік")),
+        ("family", re.compile(r"\bкобс\b|о браке|\bmarriage\b|\bfamily\b|неке")),
+        ("entrepreneurial", re.compile(r"\bпк\b|предпринимательск|entrepreneur|кәсіпкерлік")),
+    )
+    ARTICLE_LOOKUP_MAX_WORDS = 5
+    # Same citation shape the ingestion service stores as graph edges
+    CITATION_PATTERN = re.compile(r"(?:article|art\.|ст\.|стать[а-я]*|бап)\s*(\d+(?:-\d+)?)", re.IGNORECASE)
+
+    @staticmethod
+    def _normalize(query: str) -> str:
+        q = query.lower().strip().replace("ё", "е")
+        q = re.sub(r"[?!.,;:]+$", "", q)
+        return " ".join(q.split())
+
+    def code_of(self, text: str) -> Optional[str]:
+        """Legal code named in a query or source title, e.g. "ГК РК" -> "civil". None if unrecognized."""
+        text = (text or "").lower().replace("ё", "е")
+        for code, pattern in self.LEGAL_CODES:
+            if pattern.search(text):
+                return code
+        return None
+
+    def cited_articles(self, query: str) -> list:
+        """Article numbers the query cites explicitly, e.g. "по статье 15" -> ["15"]."""
+        return sorted(set(self.CITATION_PATTERN.findall(query)))
+
+    def classify(self, query: str) -> RouteDecision:
+        q = self._normalize(query)
+        words = q.split()
+
+        if not q:
+            return RouteDecision(Intent.OFF_TOPIC, "empty query")
+
+        if q in self.GREETINGS:
+            return RouteDecision(Intent.GREETING, "greeting phrase")
+
+        article_match = self.ARTICLE_PATTERN.match(q)
+        if article_match and len(words) <= self.ARTICLE_LOOKUP_MAX_WORDS:
+            return RouteDecision(
+                Intent.ARTICLE_LOOKUP, "explicit article reference",
+                article=article_match.group(1), code=self.code_of(article_match.group(2))
+            )
+
+        if any(stem in q for stem in self.LEGAL_STEMS):
+            return RouteDecision(Intent.LEGAL_QUESTION, "legal vocabulary")
+
+        if any(stem in q for stem in self.OFF_TOPIC_STEMS):
+            return RouteDecision(Intent.OFF_TOPIC, "off-topic vocabulary")
+
+        # Very short queries are rarely complex legal questions
+        if len(words) < 2:
+            return RouteDecision(Intent.OFF_TOPIC, "single word without legal terms")
+
+        return RouteDecision(Intent.LEGAL_QUESTION, "default")
+
+intent_router = IntentRouter()
@@ -0,0 +1,115 @@
+import asyncio
+import logging
+import time
+from collections import defaultdict
+from legally_bot.config import settings
+from legally_bot.services.metrics import metrics
+from legally_bot.services.rate_governor import rate_governor
+from legally_bot.services.scheduler import rag_scheduler, Workload
+
+class ProviderHealth:
+    """
+    Tracks consecutive failures and latency (EWMA) per LLM provider.
+    A provider is unhealthy after N consecutive failures, or once its average
+    latency goes above the slow threshold, until a cooldown passes. After the
+    cooldown admit() lets one probe request through; a fast probe reply
+    clears the slow verdict, a slow one starts another cooldown.
+    """
+    def __init__(self, failure_threshold: int, cooldown: float, slow_seconds: float):
+        self.failure_threshold = failure_threshold
+        self.cooldown = cooldown
+        self.slow_seconds = slow_seconds
+        self._failures = defaultdict(int)
+        self._last_failure = defaultdict(float)
+        self._latency = {}
+        self._slow_since = {}  # provider -> when it was last found slow
+        self._probing = {}     # provider -> when the current probe was let through
+
+    def record_success(self, provider: str, latency: float):
+        self._failures[provider] = 0
+        self._probing.pop(provider, None)
+        prev = self._latency.get(provider, latency)
+        self._latency[provider] = 0.7 * prev + 0.3 * latency
+        if provider in self._slow_since and latency < self.slow_seconds:
+            # Probe came back fast: forget the slow history
+            del self._slow_since[provider]
+            self._latency[provider] = latency
+            logging.info(f"✅ {provider} is responsive again ({latency:.1f}s)")
+        elif self._latency[provider] >= self.slow_seconds:
+            self._slow_since[provider] = time.monotonic()
+        metrics.set_gauge(f"provider.{provider}.latency_ewma_s", self._latency[provider])
+
+    def record_failure(self, provider: str):
+        self._failures[provider] += 1
+        self._last_failure[provider] = time.monotonic()
+        self._probing.pop(provider, None)
+        if provider in self._slow_since:
+            self._slow_since[provider] = time.monotonic()
+        metrics.inc(f"provider.{provider}.failures")
+
+    def is_healthy(self, provider: str) -> bool:
+        if self._failures[provider] >= self.failure_threshold:
+            if time.monotonic() - self._last_failure[provider] < self.cooldown:
+                return False
+            self._failures[provider] = 0  # Cooldown over: allow a probe
+        slow_since = self._slow_since.get(provider)
+        return slow_since is None or time.monotonic() - slow_since >= self.cooldown
+
+    def admit(self, provider: str) -> bool:
+        """is_healthy(), except that a slow provider past its cooldown takes one probe at a time."""
+        if not self.is_healthy(provider):
+            return False
+        if provider not in self._slow_since:
+            return True
+        started = self._probing.get(provider)
+        if started is not None and time.monotonic() - started < self.cooldown:
+            return False
+        self._probing[provider] = time.monotonic()
+        return True
+
+provider_health = ProviderHealth(
+    failure_threshold=settings.PROVIDER_FAILURE_THRESHOLD,
+    cooldown=settings.PROVIDER_COOLDOWN_SECONDS,
+    slow_seconds=settings.PROVIDER_SLOW_SECONDS,
+)
+
+class LoadShedder:
+    """
+    Decides when to answer with retrieval only (no LLM generation):
+    the scheduler queue is too deep, or no configured provider is healthy
+    and able to grant a permit in time.
+    """
+    SHEDDABLE = {Workload.INTERACTIVE, Workload.CASE}
+
+    def overload_reason(self, providers: list) -> str:
+        depth = rag_scheduler.queue_depth()
+        if depth >= settings.OVERLOAD_QUEUE_DEPTH:
+            return f"queue depth {depth}"
+        est_tokens = rate_governor.estimate_tokens("")
+        available = [
+            p for p in providers
+            if provider_health.is_healthy(p) and rate_governor.wait_time(p, est_tokens) < rate_governor.max_wait
+        ]
+        if not available:
+            return "no healthy LLM provider"
+        return None
+
+    def should_shed(self, workload: str, providers: list) -> bool:
+        if workload not in self.SHEDDABLE:
+            return False  # Batch work waits for capacity instead
+        reason = self.overload_reason(providers)
+        if reason:
+            logging.warning(f"🛑 Overload ({reason}): answering with retrieval only")
+            metrics.inc("overload.shed")
+            return True
+        return False
+
+    async def wait_for_capacity(self, providers: list, timeout: float, poll: float = 5.0) -> bool:
+        deadline = time.monotonic() + timeout
+        while time.monotonic() < deadline:
+            if not self.overload_reason(providers):
+                return True
+            await asyncio.sleep(poll)
+        return False
+
+load_shedder = LoadShedder()
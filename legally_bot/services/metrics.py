@@ -0,0 +1,60 @@
+import threading
+from collections import defaultdict
+
+class Metrics:
+    """
+    Process-wide counters, gauges and timings.
+    Kept in memory and exposed to developers via /metrics.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.counters = defaultdict(float)
+        self.gauges = {}
+        self.timings = {}
+
+    def inc(self, name: str, value: float = 1):
+        with self._lock:
+            self.counters[name] += value
+
+    def set_gauge(self, name: str, value: float):
+        with self._lock:
+            self.gauges[name] = value
+
+    def observe(self, name: str, value: float):
+        """Records a duration/size sample (count, sum, max)."""
+        with self._lock:
+            t = self.timings.setdefault(name, {"count": 0, "sum": 0.0, "max": 0.0})
+            t["count"] += 1
+            t["sum"] += value
+            t["max"] = max(t["max"], value)
+
+    def ratio(self, hits_name: str, misses_name: str) -> float:
+        with self._lock:
+            hits = self.counters.get(hits_name, 0)
+            total = hits + self.counters.get(misses_name, 0)
+        return hits / total if total else 0.0
+
+    def snapshot(self) -> dict:
+        with self._lock:
+            timings = {
+                name: {**t, "avg": t["sum"] / t["count"] if t["count"] else 0.0}
+                for name, t in self.timings.items()
+            }
+            return {
+                "counters": dict(self.counters),
+                "gauges": dict(self.gauges),
+                "timings": timings,
+            }
+
+    def format_text(self) -> str:
+        snap = self.snapshot()
+        lines = []
+        for name, value in sorted(snap["counters"].items()):
+            lines.append(f"{name}: {value:g}")
+        for name, value in sorted(snap["gauges"].items()):
+            lines.append(f"{name}: {value:.3f}" if isinstance(value, float) else f"{name}: {value}")
+        for name, t in sorted(snap["timings"].items()):
+            lines.append(f"{name}: n={t['count']} avg={t['avg']:.3f} max={t['max']:.3f}")
+        return "\n".join(lines) if lines else "No metrics recorded yet."
+
+metrics = Metrics()
@@ -0,0 +1,114 @@
+import logging
+from pymongo import UpdateOne
+from legally_bot.config import settings
+from legally_bot.database.mongo_db import db
+from legally_bot.database.passage_repo import PassageRepository
+from legally_bot.services.references import make_passage, make_reference, SNIPPET_CHARS
+from legally_bot.services.ttl_cache import TTLCache
+from legally_bot.services.metrics import metrics
+
+# Collections whose chunks/articles lists may still embed passage texts
+COMPACT_COLLECTIONS = ("cases", "case_answers", "chat_questions", "batch_items", "rated_questions")
+REFERENCE_FIELDS = ("chunks", "articles")
+
+def _embeds_text(item) -> bool:
+    return isinstance(item, dict) and ("content" in item or "snippet" in item)
+
+class PassageStore:
+    """
+    Content-addressed storage for retrieved passages. Writers turn RAG docs
+    into references with references(); readers call hydrate() only when the
+    text is actually shown.
+    """
+    CHUNK_SIZE = 500  # Documents per compaction bulk write
+
+    def __init__(self):
+        # key -> stored length; hot passages are not re-sent to Mongo
+        self._stored = TTLCache(settings.PASSAGE_CACHE_SIZE, settings.PASSAGE_CACHE_TTL_SECONDS)
+
+    async def _store(self, passages: list):
+        new = {}
+        for p in passages:
+            if p["length"] and self._stored.get(p["_id"], -1) < p["length"]:
+                if p["_id"] not in new or new[p["_id"]]["length"] < p["length"]:
+                    new[p["_id"]] = p
+        metrics.inc("passages.deduplicated", len(passages) - len(new))
+        if not new:
+            return
+        try:
+            await PassageRepository.store_many(list(new.values()))
+        except Exception as e:
+            # References are still written; those passages just cannot be rehydrated
+            logging.error(f"❌ Failed to store {len(new)} passages: {e}")
+            return
+        for p in new.values():
+            self._stored.set(p["_id"], p["length"])
+
+    async def references(self, *doc_lists) -> list:
+        """
+        Stores the passages of each list of RAG docs and returns the lists as
+        references, e.g. chunks, articles = await passage_store.references(chunks, articles).
+        """
+        docs = [d for docs in doc_lists for d in docs or []]
+        await self._store([make_passage(d) for d in docs if d.get("content")])
+        refs = [[make_reference(d) for d in docs or []] for docs in doc_lists]
+        return refs[0] if len(refs) == 1 else refs
+
+    async def hydrate(self, *ref_lists) -> list:
+        """
+        Adds 'snippet' and 'url' to each reference from the stored passage, with
+        one query for all lists. Legacy values (strings, embedded snippets) pass through.
+        """
+        keys = [
+            r["key"] for refs in ref_lists if isinstance(refs, list)
+            for r in refs if isinstance(r, dict) and r.get("key") and not r.get("snippet")
+        ]
+        found = await PassageRepository.get_many(keys)
+
+        def fill(ref):
+            passage = found.get(ref.get("key")) if isinstance(ref, dict) else None
+            if not passage:
+                return ref
+            return {**ref, "snippet": passage["content"][:SNIPPET_CHARS], "url": passage.get("url")}
+
+        hydrated = [[fill(r) for r in refs] if isinstance(refs, list) else refs for refs in ref_lists]
+        return hydrated[0] if len(hydrated) == 1 else hydrated
+
+    async def compact(self, collection: str) -> dict:
+        """
+        Migration: moves passage texts embedded in a collection's chunks/articles
+        into 'passages' and leaves references behind. Passages are written
+        before the documents that point to them. Safe to re-run.
+        """
+        col = db.get_db()[collection]
+        query = {"$or": [{f"{f}.{k}": {"$exists": True}} for f in REFERENCE_FIELDS for k in ("content", "snippet")]}
+        stats = {"documents": 0, "references": 0}
+        passages, updates = [], []
+
+        async def flush():
+            nonlocal passages, updates
+            await self._store(passages)
+            if updates:
+                await col.bulk_write(updates, ordered=False)
+            passages, updates = [], []
+
+        async for doc in col.find(query, {f: 1 for f in REFERENCE_FIELDS}):
+            changes = {}
+            for field in REFERENCE_FIELDS:
+                items = doc.get(field)
+                if not isinstance(items, list) or not any(_embeds_text(i) for i in items):
+                    continue
+                passages += [make_passage(i) for i in items if _embeds_text(i)]
+                changes[field] = [make_reference(i) if _embeds_text(i) else i for i in items]
+                stats["references"] += sum(1 for i in items if _embeds_text(i))
+            if changes:
+                updates.append(UpdateOne({"_id": doc["_id"]}, {"$set": changes}))
+                stats["documents"] += 1
+            if len(updates) >= self.CHUNK_SIZE:
+                await flush()
+        await flush()
+
+        logging.info(f"🗜️ Compacted {collection}: {stats}")
+        return stats
+
+passage_store = PassageStore()
@@ -1,13 +1,55 @@
+import asyncio
 import logging
-import json
-import requests
+import time
+import aiohttp
 import google.generativeai as genai
-from groq import Groq
+from groq import AsyncGroq, RateLimitError
 from sentence_transformers import SentenceTransformer
 from pinecone import Pinecone
 from legally_bot.config import settings
+from legally_bot.services.score_cache import RerankScoreCache
+from legally_bot.services.intent_router import intent_router, Intent
+from legally_bot.services.metrics import metrics
+from legally_bot.services.stage_graph import StageGraph
+from legally_bot.services.single_flight import SingleFlight
+from legally_bot.services.scheduler import rag_scheduler, Workload
+from legally_bot.services.rate_governor import rate_governor, ProviderRateLimited
+from legally_bot.services.usage_meter import usage_meter, current_requester, flight_usage
+from legally_bot.services.load_shedder import load_shedder, provider_health
+from legally_bot.services.i18n import I18n
+from legally_bot.services.answer_status import SEARCH_UNAVAILABLE, SEARCH_ERROR, SERVICE_UNAVAILABLE
+
+# Shared by every RAGEngine instance (chat, workflow, batch)
+rerank_cache = RerankScoreCache(max_size=settings.RERANK_CACHE_SIZE)
+search_flight = SingleFlight("search_flight")
+# Pooled HTTP session for OpenRouter, created lazily inside the event loop; closed by close_http()
+_http: aiohttp.ClientSession = None
+
+def get_http() -> aiohttp.ClientSession:
+    global _http
+    if _http is None or _http.closed:
+        _http = aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=30))
+    return _http
+
+async def close_http():
+    """Closes the shared HTTP session (bot shutdown)."""
+    if _http is not None and not _http.closed:
+        await _http.close()
+
+# Maximum retrieval depth per profile; the context is built at the caller's requested depth up to this cap
+PIPELINE_PROFILES = {
+    "full": {"num_chunks": 5, "num_articles": 5, "generate": True, "refine": True},         # Draft -> Refine -> Extract
+    "lite": {"num_chunks": 3, "num_articles": 3, "generate": True, "refine": False},        # Single draft (quota exhausted)
+    "retrieval": {"num_chunks": 3, "num_articles": 3, "generate": False, "refine": False},  # No LLM (overload)
+}
+
+# Fallback order of LLM providers
+PROVIDERS = ("deepseek", "gemini", "groq")
 
 class RAGEngine:
+    # Matches fetched per article lookup: one per code that has the article number
+    ARTICLE_LOOKUP_TOP_K = 10
+
     def __init__(self):
         try:
             self.api_key = settings.PINECONE_API_KEY
@@ -26,7 +68,7 @@ class RAGEngine:
             self.groq_client = None
             if settings.GROQ_API_KEY:
                 try:
-                    self.groq_client = Groq(api_key=settings.GROQ_API_KEY)
+                    self.groq_client = AsyncGroq(api_key=settings.GROQ_API_KEY)
                 except Exception as ge:
                     logging.error(f"Failed to init Groq client: {ge}")
             
@@ -35,31 +77,46 @@ class RAGEngine:
             logging.error(f"❌ Failed to init RAG Engine: {e}")
             self.index = None
 
+    def configured_providers(self) -> list:
+        return [p for p in PROVIDERS if self._provider_configured(p)]
+
+    def _provider_configured(self, provider: str) -> bool:
+        if provider == "deepseek":
+            return bool(settings.OPENROUTER_API_KEY)
+        if provider == "groq":
+            return self.groq_client is not None
+        return True
+
     async def _try_deepseek(self, prompt: str):
+        """Returns (text, total_tokens)."""
         if not settings.OPENROUTER_API_KEY:
             raise ValueError("OpenRouter API key not configured")
         
         logging.info("Attempting DeepSeek via OpenRouter...")
-        response = requests.post(
+        async with get_http().post(
             url="https://openrouter.ai/api/v1/chat/completions",
             headers={
                 "Authorization": f"Bearer {settings.OPENROUTER_API_KEY}",
                 "Content-Type": "application/json",
             },
-            data=json.dumps({
+            json={
                 "model": "deepseek/deepseek-r1",
                 "messages": [{"role": "user", "content": prompt}]
-            }),
-            timeout=30
-        )
-        response.raise_for_status()
-        data = response.json()
+            }
+        ) as response:
+            rate_governor.update_from_headers("deepseek", response.headers)
+            if response.status == 429:
+                raise ProviderRateLimited("deepseek")
+            response.raise_for_status()
+            data = await response.json()
         if 'choices' not in data:
             logging.error(f"OpenRouter Error Response: {data}")
             raise ValueError(f"OpenRouter response missing 'choices': {data.get('error', 'Unknown error')}")
-        return data['choices'][0]['message']['content']
+        usage = data.get('usage') or {}
+        return data['choices'][0]['message']['content'], usage.get('total_tokens')
 
     async def _try_gemini(self, prompt: str):
+        """Returns (text, total_tokens)."""
         logging.info("Attempting Gemini...")
         # Try a few variants to ensure success
         model_names = ['gemini-2.0-flash-exp', 'gemini-1.5-flash', 'gemini-3-flash-preview']
@@ -68,147 +125,173 @@ class RAGEngine:
             try:
                 logging.info(f"Trying Gemini model: {name}")
                 model = genai.GenerativeModel(name)
-                response = model.generate_content(prompt)
-                return response.text
+                response = await model.generate_content_async(prompt)
+                usage = getattr(response, "usage_metadata", None)
+                return response.text, getattr(usage, "total_token_count", None)
             except Exception as e:
+                if type(e).__name__ == "ResourceExhausted":
+                    raise ProviderRateLimited("gemini") from e
                 last_err = e
                 logging.warning(f"Gemini {name} failed: {e}")
                 continue
         raise last_err
 
     async def _try_groq(self, prompt: str):
+        """Returns (text, total_tokens)."""
         if not self.groq_client:
             raise ValueError("Groq API key not configured")
         
         logging.info("Attempting Llama 3.3 via Groq...")
-        completion = self.groq_client.chat.completions.create(
-            model="llama-3.3-70b-versatile",
-            messages=[{"role": "user", "content": prompt}],
-            temperature=1,
-            max_completion_tokens=1024,
-            top_p=1,
-            stream=False # Not using stream for easier fallback logic
+        try:
+            raw = await self.groq_client.chat.completions.with_raw_response.create(
+                model="llama-3.3-70b-versatile",
+                messages=[{"role": "user", "content": prompt}],
+                temperature=1,
+                max_completion_tokens=1024,
+                top_p=1,
+                stream=False # Not using stream for easier fallback logic
+            )
+        except RateLimitError as e:
+            rate_governor.update_from_headers("groq", e.response.headers)
+            raise ProviderRateLimited("groq") from e
+        rate_governor.update_from_headers("groq", raw.headers)
+        completion = raw.parse()
+        usage = getattr(completion, "usage", None)
+        return completion.choices[0].message.content, getattr(usage, "total_tokens", None)
+
+    def _lang_instruction(self, lang: str) -> str:
+        if lang == "en":
+            return "Respond in English."
+        if lang == "kk":
+            return "Respond in Kazakh. Use formal Kazakh legal terminology."
+        return "Respond in Russian."
+
+    async def search(self, query: str, num_chunks: int = 3, num_articles: int = 3, lang: str = "ru", profile: str = "full",
+                     user_id: int = None, role: str = "guest", workload: str = Workload.INTERACTIVE, allow_shed: bool = True):
+        """
+        Answers a question. Identical concurrent questions (same normalized text,
+        language, profile, workload and depth) share one pipeline run.
+        LLM work is admitted through the fair-queuing scheduler as (user, role, workload).
+        Under overload, interactive work is answered with retrieval only (profile 'retrieval').
+        Every caller, including those who joined a shared run, is admitted against
+        and charged for the run's token usage.
+        """
+        current_requester.set((user_id, role))
+        profile = await usage_meter.admit(user_id, role, profile)
+        if allow_shed and profile != "retrieval" and load_shedder.should_shed(workload, self.configured_providers()):
+            profile = "retrieval"
+        num_chunks = min(num_chunks, PIPELINE_PROFILES[profile]["num_chunks"])
+        num_articles = min(num_articles, PIPELINE_PROFILES[profile]["num_articles"])
+
+        key = (RerankScoreCache.normalize_query(query), lang, profile, workload, num_chunks, num_articles)
+        result = await search_flight.do(
+            key, lambda: self._run_pipeline(query, lang, profile, user_id, role, workload, num_chunks, num_articles)
         )
-        return completion.choices[0].message.content
+        usage_meter.charge(user_id, role, result.get("usage") or {})
+        return {
+            **{k: v for k, v in result.items() if k != "usage"},
+            "profile": profile,
+        }
+
+    async def _run_pipeline(self, query: str, lang: str, profile: str, user_id: int, role: str, workload: str,
+                            num_chunks: int, num_articles: int):
+        # Tokens spent by this run are collected here and charged to every caller in search()
+        usage = {}
+        flight_usage.set(usage)
+        result = await self._route(query, lang, profile, user_id, role, workload, num_chunks, num_articles)
+        return {**result, "usage": usage}
+
+    async def _route(self, query: str, lang: str, profile: str, user_id: int, role: str, workload: str,
+                     num_chunks: int, num_articles: int):
+        # 0. Intent routing (before any retrieval)
+        decision = intent_router.classify(query)
+        logging.info(f"🧭 Intent: {decision.intent} ({decision.reason}) for query: {query[:80]}")
+        metrics.inc(f"intent.{decision.intent}")
+
+        if decision.intent == Intent.GREETING:
+            return {"answer": I18n.t("greeting_reply", lang), "chunks": [], "articles": []}
+
+        if not PIPELINE_PROFILES[profile]["generate"]:
+            # Retrieval-only answers skip the LLM queue entirely
+            return await self._answer(query, decision, lang, profile, num_chunks, num_articles)
+
+        async with rag_scheduler.slot(user_id, role, workload):
+            return await self._answer(query, decision, lang, profile, num_chunks, num_articles)
+
+    async def _answer(self, query: str, decision, lang: str, profile: str, num_chunks: int, num_articles: int):
+        use_refine = PIPELINE_PROFILES[profile]["refine"]
+        generate = PIPELINE_PROFILES[profile]["generate"]
+
+        if decision.intent == Intent.OFF_TOPIC and not generate:
+            return {"answer": I18n.t("overload_busy", lang), "chunks": [], "articles": []}
+
+        if decision.intent == Intent.OFF_TOPIC:
+            simple_prompt = f"User says: {query}\n\nReply helpfully and politely in 1-3 sentences. {self._lang_instruction(lang)} If they ask for legal advice, mention you can help with Kazakhstan law."
+            simple_answer = await self._generate_with_fallback(simple_prompt)
+            return {"answer": simple_answer, "chunks": [], "articles": []}
 
-    async def search(self, query: str, num_chunks: int = 3, num_articles: int = 3, lang: str = "ru"):
         if not self.index:
             logging.warning("RAG Index not available.")
-            return {"answer": "Search currently unavailable.", "chunks": [], "articles": []}
+            return {"answer": SEARCH_UNAVAILABLE, "chunks": [], "articles": []}
+
+        if decision.intent == Intent.ARTICLE_LOOKUP:
+            result = await self._article_lookup(query, decision, num_articles, lang, generate)
+            if result is not None:
+                return result
+            # Same article number in several codes and none named: let retrieval pick by meaning
+            metrics.inc("intent.article_lookup_ambiguous")
 
         try:
-            logging.info(f"🔎 Searching for: {query}")
-            
-            vector = self.encoder.encode(query).tolist()
-            
-            # RAG 4.0: Retrieve & Re-rank
-            # 1. Retrieve more candidates (Top-20)
-            initial_k = 20
-            results = self.index.query(vector=vector, top_k=initial_k, include_metadata=True)
-            
-            matches = results.get('matches', [])
-            
-            # 2. Re-rank with Cross-Encoder
-            if matches and self.cross_encoder:
-                # Prepare pairs: (Query, Document Text)
-                pairs = [[query, m['metadata'].get('text', '')] for m in matches]
-                scores = self.cross_encoder.predict(pairs)
-                
-                # Attach new scores
-                for match, score in zip(matches, scores):
-                    match['score'] = float(score) # Update score
-                    
-                # Sort by new score descending
-                matches.sort(key=lambda x: x['score'], reverse=True)
-                
-                # Log re-ranking effect
-                logging.info(f"Re-ranked top result: {matches[0]['metadata'].get('title')} (Score: {matches[0]['score']:.4f})")
-            
-            chunks = []
-            articles = []
-            
-            for match in matches:
-                metadata = match.get('metadata', {})
-                text = metadata.get('text', 'No text')
-                title = metadata.get('title', 'Unknown Source')
-                score = match.get('score', 0.0)
-                doc_type = metadata.get('type', 'chunk')
-                references = metadata.get('references', [])
-
-                doc_info = {
-                    "title": title, 
-                    "content": text, 
-                    "score": score, 
-                    "type": doc_type,
-                    "article": metadata.get('article'),
-                    "url": metadata.get('url'),
-                    "references": references
-                }
-                
-                if doc_type == 'article' and len(articles) < num_articles:
-                    articles.append(doc_info)
-                elif doc_type != 'article' and len(chunks) < num_chunks:
-                    chunks.append(doc_info)
-            
-            # Fill with any matches if we didn't get enough specific types
-            if len(chunks) < num_chunks or len(articles) < num_articles:
-                for match in matches:
-                    metadata = match.get('metadata', {})
-                    doc_info = {
-                        "title": metadata.get('title', 'Unknown Source'),
-                        "content": metadata.get('text', 'No text'),
-                        "score": match.get('score', 0.0),
-                        "type": metadata.get('type', 'chunk')
-                    }
-                    if doc_info in chunks or doc_info in articles:
-                        continue
-                        
-                    if len(chunks) < num_chunks:
-                        chunks.append(doc_info)
-                    elif len(articles) < num_articles:
-                        articles.append(doc_info)
-
-            # Graph Expansion (Dijkstra-ish)
-            expanded_results = await self._expand_context(chunks, articles)
-            chunks = expanded_results['chunks']
-            articles = expanded_results['articles']
-
-            # Determine language instruction
-            lang_instruction = "Respond in Russian."
-            if lang == "en":
-                lang_instruction = "Respond in English."
-            elif lang == "kk":
-                lang_instruction = "Respond in Kazakh. Use formal Kazakh legal terminology."
-
-            logging.info(f"Target Language: {lang}")
-
-            # 0. Chit-chat check
-            # We do a quick check if the query is just "Hello", "How are you", etc.
-            # To save tokens, we can use a small heuristic or just ask LLM with a tiny prompt.
-            # But robust way is:
-            if self._is_general_chat(query):
-                logging.info("💬 General chat detected. Bypassing RAG.")
-                simple_prompt = f"User says: {query}\n\nReply helpfully and politely. {lang_instruction} If they ask for legal advice, mention you can help with Kazakhstan law."
-                simple_answer = await self._generate_with_fallback(simple_prompt)
-                return {
-                    "answer": simple_answer,
-                    "chunks": [],
-                    "articles": []
-                }
-
-            # 1. Extraction (Retrieval)
-            # Already done above (Vector Search + Re-ranking + Expansion)
-            # chunks and articles are ready.
-
-            context_text = ""
-            for d in chunks + articles:
-                context_text += f"---\nSource: {d.get('title', 'Unknown')}\n"
-                context_text += f"Article: {d.get('article', 'N/A')}\n"
-                context_text += f"URL: {d.get('url', 'N/A')}\n"
-                context_text += f"Content: {d['content']}\n"
-            
-            # 2. Generation 1 (Draft / Reasoning)
-            draft_prompt = f"""
+            logging.info(f"🔎 Searching for: {query} (Target Language: {lang})")
+
+            async def assemble_context(r):
+                chunks, articles = r["expand"]
+                # The prompt sees exactly the passages returned with the answer
+                chunks = chunks[:num_chunks]
+                articles = self._merge_cited(articles, r["article_lookup"])[:num_articles]
+                return chunks, articles, self._build_context(chunks + articles)
+
+            # Retrieval branches (dense search vs. articles cited in the query) run concurrently;
+            # generation is the Draft -> Refine -> Extract chain on top of the assembled context.
+            graph = StageGraph("search")
+            graph.add("encode", lambda r: asyncio.to_thread(self._encode, query))
+            graph.add("dense_query", lambda r: asyncio.to_thread(self._dense_query, r["encode"]), deps=["encode"])
+            graph.add("article_lookup", lambda r: asyncio.to_thread(self._lookup_cited_articles, query))
+            graph.add("rerank", lambda r: asyncio.to_thread(self._rerank_and_select, query, r["dense_query"], num_chunks, num_articles), deps=["dense_query"])
+            graph.add("expand", lambda r: asyncio.to_thread(self._expand_context, *r["rerank"]), deps=["rerank"])
+            graph.add("context", assemble_context, deps=["expand", "article_lookup"])
+            if generate:
+                graph.add("draft", lambda r: self._draft(query, r["context"][2], lang, use_refine), deps=["context"])
+            if use_refine:
+                graph.add("refine", lambda r: self._refine(query, r["context"][2], r["draft"], lang), deps=["context", "draft"])
+                graph.add("extract", lambda r: self._extract(r["refine"], lang), deps=["refine"])
+
+            try:
+                results = await graph.run()
+            finally:
+                graph.record_metrics()
+
+            chunks, articles, _ = results["context"]
+            if use_refine:
+                answer = results["extract"]
+            elif generate:
+                answer = results["draft"]
+            else:
+                answer = self._format_retrieval_answer(chunks, articles, lang)
+            return {
+                "answer": answer,
+                "chunks": chunks,
+                "articles": articles
+            }
+
+        except Exception as e:
+            logging.error(f"Search overall failed: {e}", exc_info=True)
+            return {"answer": SEARCH_ERROR, "chunks": [], "articles": []}
+
+    async def _draft(self, query: str, context_text: str, lang: str, use_refine: bool):
+        lang_instruction = self._lang_instruction(lang)
+        sources_instruction = '\n            - End with a clear list of "Used Sources".'
+        draft_prompt = f"""
             Role: Expert Legal Analyst for Kazakhstan Law.
             Task: Analyze the context and draft a comprehensive answer to the question.
             
@@ -221,14 +304,14 @@ class RAGEngine:
             - Think step-by-step.
             - Identify relevant articles from context.
             - specific legal norms.
-            - {lang_instruction}
+            - {lang_instruction}{"" if use_refine else sources_instruction}
             
             Draft Answer:
             """
-            draft_answer = await self._generate_with_fallback(draft_prompt)
-            
-            # 3. Generation 2 (Refinement / Critique)
-            refine_prompt = f"""
+        return await self._generate_with_fallback(draft_prompt)
+
+    async def _refine(self, query: str, context_text: str, draft: str, lang: str):
+        refine_prompt = f"""
             Role: Senior Chief Editor.
             Task: Critique and refine the Draft Answer.
             
@@ -236,7 +319,7 @@ class RAGEngine:
             {context_text}
             
             Draft Answer:
-            {draft_answer}
+            {draft}
             
             User Question: {query}
             
@@ -245,120 +328,312 @@ class RAGEngine:
             - Remove hallucinations.
             - Improve clarity and flow.
             - Ensure tone is professional and empathetic.
-            - {lang_instruction}
+            - {self._lang_instruction(lang)}
             
             Refined Answer:
             """
-            refined_answer = await self._generate_with_fallback(refine_prompt)
+        return await self._generate_with_fallback(refine_prompt)
 
-            # 4. Extraction (Final Formatting / Citations)
-            # Extract key references into a structured list to ensure user sees them clearly
-            extract_prompt = f"""
+    async def _extract(self, refined: str, lang: str):
+        # Extract key references into a structured list to ensure user sees them clearly
+        extract_prompt = f"""
             Task: Extract metadata and formatting from the Refined Answer.
             
             Refined Answer:
-            {refined_answer}
+            {refined}
             
             Instructions:
             - Return the Refined Answer exactly as is, but ensure that at the bottom, there is a clear list of "Used Sources" if applicable.
             - If sources are already listed, just return the text.
-            - {lang_instruction}
+            - {self._lang_instruction(lang)}
             
             Final Output:
             """
-            final_answer = await self._generate_with_fallback(extract_prompt)
-            
-            return {
-                "answer": final_answer,
-                "chunks": chunks[:num_chunks],
-                "articles": articles[:num_articles]
+        return await self._generate_with_fallback(extract_prompt)
+
+    async def retrieve_batch(self, queries: list, num_chunks: int = 5, num_articles: int = 5) -> list:
+        """
+        Bulk retrieval for batch jobs: one batched encode, concurrent vector
+        queries and one cross-encoder pass over every (question, passage) pair.
+        Returns one {"chunks", "articles", "context"} per query, or None where
+        the query should go through search() instead (non-legal intents, errors).
+        """
+        results = [None] * len(queries)
+        if not self.index:
+            return results
+        positions = [i for i, q in enumerate(queries)
+                     if isinstance(q, str) and q.strip() and intent_router.classify(q).intent == Intent.LEGAL_QUESTION]
+        if not positions:
+            return results
+        texts = [queries[i] for i in positions]
+        limiter = asyncio.Semaphore(settings.BATCH_QUERY_CONCURRENCY)
+
+        async def limited(func, *args):
+            async with limiter:
+                return await asyncio.to_thread(func, *args)
+
+        started = time.perf_counter()
+        try:
+            vectors = await asyncio.to_thread(self._encode_many, texts)
+            all_matches = await asyncio.gather(*(limited(self._dense_query, v) for v in vectors))
+            all_scores = await asyncio.to_thread(
+                rerank_cache.score_many,
+                self.cross_encoder,
+                texts,
+                [[m['metadata'].get('text', '') for m in matches] for matches in all_matches],
+                settings.RERANK_BATCH_SIZE
+            )
+            selected = []
+            for matches, scores in zip(all_matches, all_scores):
+                self._apply_scores(matches, scores)
+                selected.append(self._select(matches, num_chunks, num_articles))
+            expanded = await asyncio.gather(*(limited(self._expand_context, *sel) for sel in selected))
+            cited = await asyncio.gather(*(limited(self._lookup_cited_articles, q) for q in texts))
+        except Exception as e:
+            logging.error(f"Batched retrieval failed: {e}", exc_info=True)
+            return results
+
+        for pos, (chunks, articles), cited_articles in zip(positions, expanded, cited):
+            articles = self._merge_cited(articles, cited_articles)
+            results[pos] = {
+                "chunks": chunks,
+                "articles": articles,
+                "context": self._build_context(chunks + articles)
             }
 
+        elapsed = time.perf_counter() - started
+        qps = len(texts) / elapsed if elapsed > 0 else 0.0
+        metrics.set_gauge("batch.retrieval_qps", qps)
+        metrics.inc("batch.retrieved", len(texts))
+        logging.info(f"📚 Batched retrieval: {len(texts)} questions in {elapsed:.1f}s ({qps:.2f} q/s)")
+        return results
+
+    async def answer_from_retrieval(self, query: str, retrieval: dict, lang: str = "ru", profile: str = "full",
+                                    user_id: int = None, role: str = "guest", workload: str = Workload.BATCH):
+        """Generation half of search() for context that retrieve_batch() already built."""
+        current_requester.set((user_id, role))
+        profile = await usage_meter.admit(user_id, role, profile)
+        num_chunks = PIPELINE_PROFILES[profile]["num_chunks"]
+        num_articles = PIPELINE_PROFILES[profile]["num_articles"]
+        chunks = retrieval["chunks"][:num_chunks]
+        articles = retrieval["articles"][:num_articles]
+        # Prompt only with the passages the answer is returned with
+        context_text = self._build_context(chunks + articles)
+
+        if not PIPELINE_PROFILES[profile]["generate"]:
+            answer = self._format_retrieval_answer(chunks, articles, lang)
+        else:
+            async with rag_scheduler.slot(user_id, role, workload):
+                answer = await self._draft(query, context_text, lang, PIPELINE_PROFILES[profile]["refine"])
+                if PIPELINE_PROFILES[profile]["refine"]:
+                    refined = await self._refine(query, context_text, answer, lang)
+                    answer = await self._extract(refined, lang)
+        return {"answer": answer, "profile": profile, "chunks": chunks, "articles": articles}
+
+    def _encode(self, query: str) -> list:
+        return self.encoder.encode(query).tolist()
+
+    def _encode_many(self, queries: list) -> list:
+        return self.encoder.encode(queries, batch_size=settings.ENCODE_BATCH_SIZE).tolist()
+
+    def _dense_query(self, vector: list) -> list:
+        # RAG 4.0: Retrieve more candidates (Top-20), re-ranked afterwards
+        initial_k = 20
+        results = self.index.query(vector=vector, top_k=initial_k, include_metadata=True)
+        return results.get('matches', [])
+
+    def _lookup_cited_articles(self, query: str) -> list:
+        """Fetches articles the query cites explicitly ("по статье 15 ..."), in parallel with dense retrieval."""
+        cited = intent_router.cited_articles(query)
+        if not cited:
+            return []
+        try:
+            return self._fetch_articles(cited)
         except Exception as e:
-            logging.error(f"Search overall failed: {e}", exc_info=True)
-            return {"answer": "Error during search.", "chunks": [], "articles": []}
+            logging.error(f"Cited article lookup failed: {e}")
+            return []
+
+    def _doc_from_match(self, match: dict) -> dict:
+        metadata = match.get('metadata', {})
+        return {
+            "id": match.get('id'),
+            "title": metadata.get('source') or metadata.get('title', 'Unknown Source'),
+            "content": metadata.get('text', 'No text'),
+            "score": match.get('score', 0.0),
+            "type": metadata.get('type', 'chunk'),
+            "article": metadata.get('article'),
+            "url": metadata.get('url'),
+            "references": metadata.get('references', [])
+        }
+
+    def _rerank_and_select(self, query: str, matches: list, num_chunks: int, num_articles: int):
+        # RAG 4.0: Re-rank with Cross-Encoder
+        if matches and self.cross_encoder:
+            # Score (Query, Document Text) pairs, reusing cached scores
+            passages = [m['metadata'].get('text', '') for m in matches]
+            self._apply_scores(matches, rerank_cache.score(self.cross_encoder, query, passages))
+        return self._select(matches, num_chunks, num_articles)
+
+    def _apply_scores(self, matches: list, scores: list):
+        for match, score in zip(matches, scores):
+            match['score'] = float(score)
+
+        if matches:
+            matches.sort(key=lambda x: x['score'], reverse=True)
+            logging.info(f"Re-ranked top result: {matches[0]['metadata'].get('source') or matches[0]['metadata'].get('title')} (Score: {matches[0]['score']:.4f})")
+
+    def _select(self, matches: list, num_chunks: int, num_articles: int):
+        # Single pass: fill each type first, keep the rest as overflow
+        chunks, articles, overflow = [], [], []
+        for match in matches:
+            doc_info = self._doc_from_match(match)
+            if doc_info['type'] == 'article' and len(articles) < num_articles:
+                articles.append(doc_info)
+            elif doc_info['type'] != 'article' and len(chunks) < num_chunks:
+                chunks.append(doc_info)
+            else:
+                overflow.append(doc_info)
+
+        # Fill with any matches if we didn't get enough specific types
+        for doc_info in overflow:
+            if len(chunks) < num_chunks:
+                chunks.append(doc_info)
+            elif len(articles) < num_articles:
+                articles.append(doc_info)
+            else:
+                break
+
+        return chunks, articles
 
-    def _is_general_chat(self, query: str) -> bool:
+    async def _article_lookup(self, query: str, decision, num_articles: int, lang: str, generate: bool = True):
         """
-        Simple heuristic to detect non-legal, general chit-chat.
+        Fast path for "Статья 15"-style queries: fetch the article by metadata
+        filter (no embedding, no re-ranking) and explain it in a single generation.
+        Only articles of the named code are kept ("ст. 15 ГК"). Returns None when
+        no code is named and the number exists in more than one source.
         """
-        greetings = [
-            "hello", "hi", "hey", "start", "привет", "здравствуйте", "салем", "сәлем", 
-            "how are you", "как дела", "who are you", "кто ты", "ты кто"
-        ]
-        
-        # Check for short, common greetings
-        q_lower = query.lower().strip().replace("?", "").replace("!", "")
-        if q_lower in greetings:
-            return True
-        
-        # Check length - very short queries are rarely complex legal questions
-        if len(query.split()) < 2 and q_lower not in ["law", "закон", "заң"]:
-            return True
-            
-        return False
+        article, code = decision.article, decision.code
+        try:
+            articles = await asyncio.to_thread(self._fetch_articles, [article], self.ARTICLE_LOOKUP_TOP_K)
+        except Exception as e:
+            logging.error(f"Article lookup failed: {e}", exc_info=True)
+            return {"answer": SEARCH_ERROR, "chunks": [], "articles": []}
+
+        if code:
+            articles = [d for d in articles if intent_router.code_of(d["title"]) == code]
+        elif len({d["title"] for d in articles}) > 1:
+            logging.info(f"Article {article} found in several sources, falling back to full search.")
+            return None
+        articles = articles[:num_articles]
+
+        if not articles:
+            logging.info(f"Article {article} not found in index.")
+            return {"answer": I18n.t("article_not_found", lang, article=article), "chunks": [], "articles": []}
+
+        if not generate:
+            return {"answer": self._format_retrieval_answer([], articles, lang), "chunks": [], "articles": articles}
+
+        context_text = self._build_context(articles)
+        prompt = f"""
+            Role: Expert Legal Analyst for Kazakhstan Law.
+            Task: Quote and briefly explain the requested article using only the context.
+
+            Context:
+            {context_text}
+
+            Request: {query}
+
+            Instructions:
+            - Cite the source and article number.
+            - {self._lang_instruction(lang)}
+
+            Answer:
+            """
+        answer = await self._generate_with_fallback(prompt)
+        return {"answer": answer, "chunks": [], "articles": articles}
+
+    def _format_retrieval_answer(self, chunks: list, articles: list, lang: str) -> str:
+        """Templated answer built from retrieved passages only (no LLM)."""
+        docs = articles + chunks
+        if not docs:
+            return I18n.t("overload_busy", lang)
+        text = I18n.t("overload_summary", lang) + "\n\n"
+        for i, d in enumerate(docs, 1):
+            article = d.get('article')
+            label = f"{d.get('title', 'Unknown Source')}" + (f", Article {article}" if article else "")
+            snippet = " ".join(d.get('content', '').split())[:300]
+            text += f"{i}. {label}\n{snippet}...\n\n"
+        return text.strip()
 
-    async def _expand_context(self, chunks: list, articles: list):
+    def _merge_cited(self, articles: list, cited: list) -> list:
+        """Articles cited directly in the query go first."""
+        for doc in reversed(cited):
+            if not any(d['content'] == doc['content'] for d in articles):
+                articles.insert(0, doc)
+        return articles
+
+    def _build_context(self, docs: list) -> str:
+        context_text = ""
+        for d in docs:
+            context_text += f"---\nSource: {d.get('title', 'Unknown')}\n"
+            context_text += f"Article: {d.get('article', 'N/A')}\n"
+            context_text += f"URL: {d.get('url', 'N/A')}\n"
+            context_text += f"Content: {d['content']}\n"
+        return context_text
+
+    def _fetch_articles(self, article_numbers: list, top_k: int = None) -> list:
+        """
+        Fetches articles by number via metadata filter.
+        Semantic search is irrelevant here, so a dummy (all-zeros) vector is used.
+        Pass a larger top_k to get the same number from every source that has it.
+        """
+        filter_query = {
+            "article": {"$in": article_numbers},
+            "type": "article"
+        }
+        dummy_vector = [0.0] * 1024 # BGE-Large dimension is 1024
+
+        results = self.index.query(
+            vector=dummy_vector,
+            filter=filter_query,
+            top_k=top_k or len(article_numbers),
+            include_metadata=True
+        )
+
+        articles = []
+        for match in results.get('matches', []):
+            metadata = match.get('metadata', {})
+            articles.append({
+                "id": match.get('id'),
+                "title": metadata.get('source', 'Unknown Source'),
+                "content": metadata.get('text', 'No text'),
+                "score": 1.0, # High confidence for explicit citations
+                "type": "article",
+                "article": metadata.get('article'),
+                "url": metadata.get('url'),
+                "references": metadata.get("references", [])
+            })
+        return articles
+
+    def _expand_context(self, chunks: list, articles: list):
         """
         Graph Traversal: Analyzes 'references' metadata in retrieved chunks 
         and fetches the cited articles to expand context.
         """
         referenced_articles = []
         for doc in chunks + articles:
-            # Check if this document has references
-            # In search(), we need to make sure we extracted 'references' from metadata
             refs = doc.get("references", [])
             referenced_articles.extend(refs) # Add IDs
             
         referenced_articles = list(set(referenced_articles)) # Unique
         
         if not referenced_articles:
-            return {"chunks": chunks, "articles": articles}
+            return chunks, articles
             
         logging.info(f"🔗 Graph Traversal: Found references to articles {referenced_articles}")
         
-        # Traverse Graph: Fetch these specific articles
-        # This requires a new search or fetch operation.
-        # Since we stored 'article' in metadata, we can filter for it.
-        
         try:
-            # We can't do a massive OR filter in one go specific to `article` IN list easily with vector search metadata filter 
-            # if the list is huge, but for a few it's fine.
-            # $in is supported.
-            
-            filter_query = {
-                "article": {"$in": referenced_articles},
-                "type": "article"
-            }
-            
-            # Semantic search is less relevant here, we want exact matches.
-            # But Pinecone query usually requires a vector.
-            # We can use a dummy vector (all zeros) or just query with a generic law vector.
-            # OR fetch by ID if we knew the vector IDs. We don't.
-            # We will use a dummy query with filter.
-            
-            dummy_vector = [0.0] * 1024 # BGE-Large dimension is 1024
-            
-            results = self.index.query(
-                vector=dummy_vector,
-                filter=filter_query,
-                top_k=len(referenced_articles),
-                include_metadata=True
-            )
-            
-            matches = results.get('matches', [])
-            for match in matches:
-                metadata = match.get('metadata', {})
-                doc_info = {
-                    "title": metadata.get('source', 'Unknown Source'),
-                    "content": metadata.get('text', 'No text'),
-                    "score": 1.0, # High confidence for explicit citations
-                    "type": "article",
-                    "article": metadata.get('article'),
-                    "url": metadata.get('url'),
-                    "references": metadata.get("references", [])
-                }
-                
+            for doc_info in self._fetch_articles(referenced_articles):
                 # Add if not already present
                 is_present = any(d['content'] == doc_info['content'] for d in articles)
                 if not is_present:
@@ -368,25 +643,44 @@ class RAGEngine:
         except Exception as e:
             logging.error(f"Graph traversal failed: {e}")
             
-        return {"chunks": chunks, "articles": articles}
+        return chunks, articles
 
     async def _generate_with_fallback(self, prompt: str):
-        # 1. DeepSeek
-        try:
-            return await self._try_deepseek(prompt)
-        except Exception:
-            pass
-        
-        # 2. Gemini
-        try:
-            return await self._try_gemini(prompt)
-        except Exception:
-            pass
-            
-        # 3. Groq
-        try:
-            return await self._try_groq(prompt)
-        except Exception:
-            pass
-            
-        return "⚠️ AI service unavailable."
+        """
+        DeepSeek -> Gemini -> Groq. Every call first awaits a permit from the
+        shared rate governor; a rate-limited provider is retried once after its
+        reported reset instead of immediately falling through.
+        """
+        est_tokens = rate_governor.estimate_tokens(prompt)
+        calls = {
+            "deepseek": self._try_deepseek,
+            "gemini": self._try_gemini,
+            "groq": self._try_groq,
+        }
+        for provider in self.configured_providers():
+            if not provider_health.admit(provider):
+                logging.info(f"Skipping unhealthy provider {provider}")
+                continue
+            for attempt in range(2):
+                if not await rate_governor.acquire(provider, est_tokens):
+                    break
+                started = time.perf_counter()
+                try:
+                    text, used_tokens = await calls[provider](prompt)
+                    provider_health.record_success(provider, time.perf_counter() - started)
+                    rate_governor.commit(provider, est_tokens, used_tokens)
+                    usage_meter.record(provider, used_tokens or est_tokens)
+                    return text
+                except ProviderRateLimited:
+                    logging.warning(f"{provider} rate-limited (attempt {attempt + 1}), waiting for a new permit")
+                    metrics.inc(f"governor.{provider}.rate_limited")
+                    provider_health.record_failure(provider)
+                    continue
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    logging.warning(f"{provider} failed: {e}")
+                    provider_health.record_failure(provider)
+                    break
+            
+        return SERVICE_UNAVAILABLE
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import re
+import time
+from legally_bot.config import settings
+from legally_bot.services.metrics import metrics
+
+class ProviderRateLimited(Exception):
+    """Raised by a provider call that got HTTP 429 / quota exhaustion."""
+
+class TokenBucket:
+    def __init__(self, capacity: float, per_minute: float):
+        self.capacity = capacity
+        self.rate = per_minute / 60.0
+        self.level = capacity
+        self.blocked_until = 0.0
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self.level = min(self.capacity, self.level + (now - self._updated) * self.rate)
+        self._updated = now
+
+    def wait_time(self, amount: float) -> float:
+        self._refill()
+        now = time.monotonic()
+        if now < self.blocked_until:
+            return self.blocked_until - now
+        # Requests bigger than the bucket only need a full bucket
+        amount = min(amount, self.capacity)
+        if self.level >= amount:
+            return 0.0
+        return (amount - self.level) / self.rate if self.rate else float("inf")
+
+    def take(self, amount: float):
+        self._refill()
+        self.level -= min(amount, self.capacity)
+
+    def adjust(self, delta: float):
+        """Gives back (positive) or charges extra (negative) tokens once the real usage is known."""
+        self._refill()
+        self.level = min(self.capacity, self.level + delta)
+
+    def clamp(self, remaining: float, reset_in: float = None):
+        """Aligns the local estimate with what the provider reports."""
+        self._refill()
+        self.level = min(self.level, remaining)
+        if remaining <= 0 and reset_in:
+            self.blocked_until = max(self.blocked_until, time.monotonic() + reset_in)
+
+    def saturation(self) -> float:
+        self._refill()
+        return 1.0 - max(self.level, 0.0) / self.capacity if self.capacity else 0.0
+
+class ProviderLimiter:
+    """Requests-per-minute and tokens-per-minute buckets for one LLM provider."""
+    def __init__(self, name: str, rpm: int, tpm: int):
+        self.name = name
+        self.requests = TokenBucket(rpm, rpm)
+        self.tokens = TokenBucket(tpm, tpm)
+        self._lock = asyncio.Lock()  # FIFO among waiters
+
+    def _publish(self):
+        metrics.set_gauge(f"governor.{self.name}.rpm_saturation", self.requests.saturation())
+        metrics.set_gauge(f"governor.{self.name}.tpm_saturation", self.tokens.saturation())
+
+    def wait_time(self, est_tokens: int) -> float:
+        return max(self.requests.wait_time(1), self.tokens.wait_time(est_tokens))
+
+    async def acquire(self, est_tokens: int, max_wait: float) -> bool:
+        start = time.monotonic()
+        async with self._lock:
+            while True:
+                wait = self.wait_time(est_tokens)
+                if wait <= 0:
+                    self.requests.take(1)
+                    self.tokens.take(est_tokens)
+                    waited = time.monotonic() - start
+                    metrics.observe(f"governor.{self.name}.wait_s", waited)
+                    if waited > 0.01:
+                        metrics.inc(f"governor.{self.name}.throttled")
+                    self._publish()
+                    return True
+                if time.monotonic() - start + wait > max_wait:
+                    metrics.inc(f"governor.{self.name}.saturated")
+                    self._publish()
+                    return False
+                await asyncio.sleep(min(wait, 1.0))
+
+class RateGovernor:
+    """
+    Process-wide rate governor shared by every LLM caller (chat, cases, batch).
+    Callers await a permit for a provider; if the provider's buckets cannot
+    grant one within max_wait the caller moves on to the next provider.
+    """
+    # Providers whose x-ratelimit-*-requests headers count a per-day window (Groq: RPD).
+    # Those only matter to the per-minute bucket once the day's quota is used up.
+    DAILY_REQUEST_WINDOW = {"groq"}
+
+    def __init__(self, limits: dict, max_wait: float):
+        self.providers = {name: ProviderLimiter(name, rpm, tpm) for name, (rpm, tpm) in limits.items()}
+        self.max_wait = max_wait
+
+    @staticmethod
+    def estimate_tokens(prompt: str, max_output: int = 1024) -> int:
+        # ~4 characters per token for mixed Cyrillic/Latin text
+        return len(prompt) // 4 + max_output
+
+    async def acquire(self, provider: str, est_tokens: int) -> bool:
+        limiter = self.providers.get(provider)
+        if not limiter:
+            return True
+        granted = await limiter.acquire(est_tokens, self.max_wait)
+        if not granted:
+            logging.warning(f"🚦 Governor: no {provider} permit within {self.max_wait}s")
+        return granted
+
+    def wait_time(self, provider: str, est_tokens: int) -> float:
+        limiter = self.providers.get(provider)
+        return limiter.wait_time(est_tokens) if limiter else 0.0
+
+    def commit(self, provider: str, estimated: int, actual: int = None):
+        """Reconciles the estimate with the provider-reported token usage."""
+        limiter = self.providers.get(provider)
+        if limiter and actual is not None:
+            limiter.tokens.adjust(estimated - actual)
+
+    @staticmethod
+    def _parse_duration(value: str) -> float:
+        """Parses '1m30.5s', '7.66s', '120ms', plain seconds or an epoch-milliseconds timestamp."""
+        if value is None:
+            return None
+        value = str(value).strip()
+        try:
+            number = float(value)
+            if number > 1e12:  # epoch ms (OpenRouter)
+                return max(0.0, number / 1000 - time.time())
+            return number
+        except ValueError:
+            pass
+        total = 0.0
+        for amount, unit in re.findall(r"([\d.]+)(ms|h|m|s)", value):
+            total += float(amount) * {"ms": 0.001, "s": 1, "m": 60, "h": 3600}[unit]
+        return total
+
+    def update_from_headers(self, provider: str, headers):
+        """Reads x-ratelimit-* / retry-after headers back into the provider's buckets."""
+        limiter = self.providers.get(provider)
+        if not limiter or not headers:
+            return
+        h = {k.lower(): v for k, v in dict(headers).items()}
+        try:
+            remaining_req = h.get("x-ratelimit-remaining-requests", h.get("x-ratelimit-remaining"))
+            if remaining_req is not None:
+                reset = self._parse_duration(h.get("x-ratelimit-reset-requests", h.get("x-ratelimit-reset")))
+                if provider not in self.DAILY_REQUEST_WINDOW:
+                    limiter.requests.clamp(float(remaining_req), reset)
+                elif float(remaining_req) <= 0:
+                    # Daily quota used up: no requests until it resets
+                    limiter.requests.clamp(0, reset)
+            remaining_tok = h.get("x-ratelimit-remaining-tokens")
+            if remaining_tok is not None:
+                limiter.tokens.clamp(float(remaining_tok), self._parse_duration(h.get("x-ratelimit-reset-tokens")))
+            retry_after = self._parse_duration(h.get("retry-after"))
+            if retry_after:
+                limiter.requests.clamp(0, retry_after)
+        except (TypeError, ValueError) as e:
+            logging.warning(f"Could not parse {provider} rate-limit headers: {e}")
+        limiter._publish()
+
+rate_governor = RateGovernor(
+    limits={
+        "deepseek": (settings.DEEPSEEK_RPM, settings.DEEPSEEK_TPM),
+        "gemini": (settings.GEMINI_RPM, settings.GEMINI_TPM),
+        "groq": (settings.GROQ_RPM, settings.GROQ_TPM),
+    },
+    max_wait=settings.LLM_PERMIT_MAX_WAIT,
+)
@@ -0,0 +1,66 @@
+import hashlib
+
+# Structured pointers to retrieved passages, stored instead of passage texts.
+# {"key": vector id or "sha256:<hex>", "type": "chunk" | "article",
+#  "source": title, "article": "15", "score": 0.87}
+# The text itself lives once in the 'passages' collection (database/passage_repo.py)
+# and is rehydrated only for display (services/passage_store.py).
+
+SNIPPET_CHARS = 300
+
+def _normalize(text: str) -> str:
+    return " ".join((text or "").split())
+
+def passage_key(doc: dict) -> str:
+    """Vector id when known, otherwise a hash of the normalized text."""
+    if doc.get("id"):
+        return str(doc["id"])
+    content = _normalize(doc.get("content") or doc.get("snippet"))
+    return "sha256:" + hashlib.sha256(content.encode("utf-8")).hexdigest()
+
+def make_passage(doc: dict) -> dict:
+    """The stored form of a retrieved doc (or of a legacy reference with a snippet)."""
+    content = _normalize(doc.get("content") or doc.get("snippet"))
+    return {
+        "_id": passage_key(doc),
+        "type": doc.get("type", "chunk"),
+        "source": doc.get("title") or doc.get("source") or "Unknown Source",
+        "article": doc.get("article"),
+        "url": doc.get("url"),
+        "content": content,
+        "length": len(content)
+    }
+
+def make_reference(doc: dict) -> dict:
+    """Converts a retrieved doc (RAGEngine result) into a compact reference."""
+    score = doc.get("score")
+    return {
+        "key": passage_key(doc),
+        "type": doc.get("type", "chunk"),
+        "source": doc.get("title") or doc.get("source") or "Unknown Source",
+        "article": doc.get("article"),
+        "score": round(float(score), 4) if score is not None else None
+    }
+
+def make_references(docs: list) -> list:
+    return [make_reference(d) for d in docs or []]
+
+def format_reference(ref, i: int) -> str:
+    """One numbered line (plus snippet, if hydrated) for Telegram; tolerates legacy string values."""
+    if not isinstance(ref, dict):
+        return f"{i}. {str(ref)[:SNIPPET_CHARS]}"
+    label = ref.get("source") or "Unknown Source"
+    if ref.get("article"):
+        label += f", Article {ref['article']}"
+    if ref.get("score") is not None:
+        label += f" ({ref['score']:.2f})"
+    snippet = ref.get("snippet")
+    return f"{i}. {label}" + (f"\n   {snippet}..." if snippet else "")
+
+def format_references(refs) -> str:
+    if not refs:
+        return "—"
+    if isinstance(refs, str):
+        # Legacy cases stored the Python repr of the whole list
+        return refs[:SNIPPET_CHARS] + ("..." if len(refs) > SNIPPET_CHARS else "")
+    return "\n".join(format_reference(ref, i) for i, ref in enumerate(refs, 1))
@@ -0,0 +1,161 @@
+import asyncio
+import itertools
+import logging
+import time
+from collections import defaultdict
+from contextlib import asynccontextmanager
+from dataclasses import dataclass, field
+from legally_bot.config import settings
+from legally_bot.services.metrics import metrics
+
+class Workload:
+    INTERACTIVE = "interactive"  # Chat
+    CASE = "case"                # Student case practice
+    BATCH = "batch"              # /upload_cases jobs
+
+WORKLOAD_WEIGHTS = {
+    Workload.INTERACTIVE: 8,
+    Workload.CASE: 4,
+    Workload.BATCH: 1,
+}
+
+ROLE_WEIGHTS = {
+    "admin": 4,
+    "developer": 4,
+    "professor": 4,
+    "student": 2,
+    "user": 1,
+    "guest": 1,
+}
+
+@dataclass
+class Ticket:
+    user_id: int
+    role: str
+    workload: str
+    finish_tag: float
+    seq: int
+    enqueued_at: float = field(default_factory=time.perf_counter)
+    future: asyncio.Future = None
+
+class RAGScheduler:
+    """
+    Weighted fair queuing for RAG work.
+    Each (workload, role) pair is a flow; a request's virtual finish tag grows by
+    1/weight per request in its flow, and the free slot goes to the lowest tag
+    whose user is still under their concurrency cap.
+    """
+    def __init__(self, slots: int, user_limit: int, batch_user_limit: int):
+        self.slots = slots
+        self.user_limits = {Workload.BATCH: batch_user_limit}
+        self.default_user_limit = user_limit
+        self.active = 0
+        self._queue: list = []
+        self._virtual_time = 0.0
+        self._last_finish = defaultdict(float)
+        self._user_active = defaultdict(int)
+        self._seq = itertools.count()
+
+    def _weight(self, role: str, workload: str) -> float:
+        return WORKLOAD_WEIGHTS.get(workload, 1) * ROLE_WEIGHTS.get(role, 1)
+
+    def _user_key(self, ticket: Ticket):
+        return (ticket.user_id, ticket.workload)
+
+    def _under_cap(self, ticket: Ticket) -> bool:
+        if ticket.user_id is None:
+            return True
+        limit = self.user_limits.get(ticket.workload, self.default_user_limit)
+        return self._user_active[self._user_key(ticket)] < limit
+
+    def _update_gauges(self):
+        metrics.set_gauge("scheduler.active", self.active)
+        metrics.set_gauge("scheduler.queue_depth", len(self._queue))
+        depth = defaultdict(int)
+        for t in self._queue:
+            depth[t.workload] += 1
+        for workload in WORKLOAD_WEIGHTS:
+            metrics.set_gauge(f"scheduler.queue_depth.{workload}", depth[workload])
+
+    def queue_depth(self) -> int:
+        return len(self._queue)
+
+    def _grant(self, ticket: Ticket):
+        self.active += 1
+        if ticket.user_id is not None:
+            self._user_active[self._user_key(ticket)] += 1
+        self._virtual_time = max(self._virtual_time, ticket.finish_tag - 1 / self._weight(ticket.role, ticket.workload))
+        wait = time.perf_counter() - ticket.enqueued_at
+        metrics.observe(f"scheduler.wait_s.{ticket.workload}", wait)
+        metrics.observe(f"scheduler.wait_s.role.{ticket.role}", wait)
+
+    def _dispatch(self):
+        while self.active < self.slots and self._queue:
+            # Lowest finish tag among users still under their cap
+            eligible = [t for t in self._queue if self._under_cap(t)]
+            if not eligible:
+                break
+            ticket = min(eligible, key=lambda t: (t.finish_tag, t.seq))
+            self._queue.remove(ticket)
+            self._grant(ticket)
+            ticket.future.set_result(True)
+        self._update_gauges()
+
+    def _release(self, ticket: Ticket):
+        self.active -= 1
+        if ticket.user_id is not None:
+            key = self._user_key(ticket)
+            self._user_active[key] -= 1
+            if self._user_active[key] <= 0:
+                del self._user_active[key]
+        self._dispatch()
+
+    async def acquire(self, user_id: int, role: str, workload: str) -> Ticket:
+        flow = (workload, role)
+        start_tag = max(self._virtual_time, self._last_finish[flow])
+        ticket = Ticket(
+            user_id=user_id,
+            role=role,
+            workload=workload,
+            finish_tag=start_tag + 1 / self._weight(role, workload),
+            seq=next(self._seq),
+        )
+        self._last_finish[flow] = ticket.finish_tag
+
+        if not self._queue and self.active < self.slots and self._under_cap(ticket):
+            self._grant(ticket)
+            self._update_gauges()
+            return ticket
+
+        ticket.future = asyncio.get_running_loop().create_future()
+        self._queue.append(ticket)
+        # Queued tickets may all be blocked by their user's cap while a slot is free
+        self._dispatch()
+        if ticket.future.done():
+            return ticket
+        logging.info(f"⏳ Scheduler: queued {workload}/{role} request of user {user_id} (depth {len(self._queue)})")
+        try:
+            await ticket.future
+        except asyncio.CancelledError:
+            if ticket in self._queue:
+                self._queue.remove(ticket)
+                self._update_gauges()
+            elif ticket.future.done() and not ticket.future.cancelled():
+                # Slot was granted just as we were cancelled: hand it on
+                self._release(ticket)
+            raise
+        return ticket
+
+    @asynccontextmanager
+    async def slot(self, user_id: int = None, role: str = "guest", workload: str = Workload.INTERACTIVE):
+        ticket = await self.acquire(user_id, role, workload)
+        try:
+            yield ticket
+        finally:
+            self._release(ticket)
+
+rag_scheduler = RAGScheduler(
+    slots=settings.RAG_MAX_CONCURRENCY,
+    user_limit=settings.RAG_USER_CONCURRENCY,
+    batch_user_limit=settings.RAG_BATCH_CONCURRENCY,
+)
@@ -0,0 +1,82 @@
+import hashlib
+import logging
+import re
+import threading
+from collections import OrderedDict
+from legally_bot.services.metrics import metrics
+
+class RerankScoreCache:
+    """
+    Bounded LRU of cross-encoder scores.
+    Key: (hash of normalized query, hash of passage text).
+    """
+    def __init__(self, max_size: int = 5000):
+        self.max_size = max_size
+        self._scores = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Lowercases, drops punctuation and collapses whitespace so near-duplicates share a key."""
+        q = query.lower().replace("ё", "е")
+        q = re.sub(r"[^\w\s]", " ", q)
+        return " ".join(q.split())
+
+    @staticmethod
+    def _hash(text: str) -> str:
+        return hashlib.sha1(text.encode("utf-8")).hexdigest()
+
+    def score(self, cross_encoder, query: str, passages: list) -> list:
+        """
+        Returns one score per passage. Cached pairs are served from the LRU,
+        the missing ones are scored by the cross-encoder in a single batch.
+        """
+        return self.score_many(cross_encoder, [query], [passages])[0]
+
+    def score_many(self, cross_encoder, queries: list, passages_per_query: list, batch_size: int = 32) -> list:
+        """
+        Same as score() for many queries at once: every missing (query, passage)
+        pair across all queries goes to the cross-encoder in one predict call.
+        Returns one list of scores per query.
+        """
+        keys = []
+        for query, passages in zip(queries, passages_per_query):
+            q_key = self._hash(self.normalize_query(query))
+            keys.append([(q_key, self._hash(p)) for p in passages])
+        scores = [[None] * len(passages) for passages in passages_per_query]
+        missing = {}  # key -> (query index, first passage index)
+
+        with self._lock:
+            for qi, query_keys in enumerate(keys):
+                for i, key in enumerate(query_keys):
+                    if key in self._scores:
+                        self._scores.move_to_end(key)
+                        scores[qi][i] = self._scores[key]
+                    elif key not in missing:
+                        missing[key] = (qi, i)
+
+        total = sum(len(p) for p in passages_per_query)
+        hits = sum(1 for query_scores in scores for s in query_scores if s is not None)
+        metrics.inc("rerank_cache.hits", hits)
+        metrics.inc("rerank_cache.misses", total - hits)
+
+        if missing:
+            pairs = [[queries[qi], passages_per_query[qi][i]] for qi, i in missing.values()]
+            predicted = cross_encoder.predict(pairs, batch_size=batch_size)
+            fresh = {key: float(value) for key, value in zip(missing.keys(), predicted)}
+            for qi, query_keys in enumerate(keys):
+                for i, key in enumerate(query_keys):
+                    if scores[qi][i] is None:
+                        scores[qi][i] = fresh[key]
+            with self._lock:
+                for key, value in fresh.items():
+                    self._scores[key] = value
+                    self._scores.move_to_end(key)
+                while len(self._scores) > self.max_size:
+                    self._scores.popitem(last=False)
+            metrics.inc("rerank_cache.scored_pairs", len(pairs))
+
+        metrics.set_gauge("rerank_cache.size", len(self._scores))
+        metrics.set_gauge("rerank_cache.hit_ratio", metrics.ratio("rerank_cache.hits", "rerank_cache.misses"))
+        logging.info(f"Re-rank cache: {hits}/{total} hits, scored {len(missing)} new pairs")
+        return scores
@@ -0,0 +1,53 @@
+import asyncio
+import logging
+from dataclasses import dataclass
+from typing import Any, Awaitable, Callable, Dict, Hashable
+from legally_bot.services.metrics import metrics
+
+@dataclass
+class _Flight:
+    task: asyncio.Task
+    waiters: int = 0
+
+class SingleFlight:
+    """
+    Deduplicates identical concurrent calls.
+    The first caller for a key starts the computation; everyone who arrives
+    while it is running awaits the same task instead of starting their own.
+    The shared task is cancelled only when every waiter has been cancelled;
+    callers that arrive after that start a new run.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._inflight: Dict[Hashable, _Flight] = {}
+
+    def _forget(self, key: Hashable, task: asyncio.Task):
+        flight = self._inflight.get(key)
+        if flight and flight.task is task:
+            del self._inflight[key]
+
+    async def do(self, key: Hashable, factory: Callable[[], Awaitable[Any]]) -> Any:
+        flight = self._inflight.get(key)
+        if flight is None:
+            flight = _Flight(task=asyncio.create_task(factory()))
+            self._inflight[key] = flight
+            flight.task.add_done_callback(lambda t: self._forget(key, t))
+            metrics.inc(f"{self.name}.leaders")
+        else:
+            logging.info(f"🔁 {self.name}: joining in-flight computation ({flight.waiters} waiting)")
+            metrics.inc(f"{self.name}.shared")
+        metrics.set_gauge(f"{self.name}.inflight", len(self._inflight))
+
+        flight.waiters += 1
+        try:
+            # Shielded so one impatient caller cannot cancel the work for everyone else
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Every caller gave up: stop the shared work too. It is unlisted first, so a
+                # caller arriving before the cancellation lands starts a fresh run instead of
+                # joining this one and receiving its CancelledError.
+                self._forget(key, flight.task)
+                flight.task.cancel()
+                metrics.inc(f"{self.name}.abandoned")
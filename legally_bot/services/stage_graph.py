@@ -0,0 +1,83 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable, Dict, Iterable
+from legally_bot.services.metrics import metrics
+
+StageFunc = Callable[[Dict[str, Any]], Awaitable[Any]]
+
+class StageGraph:
+    """
+    Small async DAG runner.
+    Every stage starts as soon as all of its dependencies have finished,
+    so independent branches overlap. Per-stage timings and the critical path
+    are recorded for each run.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self._stages: Dict[str, tuple] = {}
+        self.timings: Dict[str, tuple] = {}  # stage -> (start, end) offsets in seconds
+        self.total = 0.0
+
+    def add(self, name: str, func: StageFunc, deps: Iterable[str] = ()):
+        deps = tuple(deps)
+        for dep in deps:
+            if dep not in self._stages:
+                raise ValueError(f"Stage '{name}' depends on unknown stage '{dep}'")
+        self._stages[name] = (func, deps)
+        return self
+
+    async def run(self) -> Dict[str, Any]:
+        t0 = time.perf_counter()
+        tasks: Dict[str, asyncio.Task] = {}
+
+        async def run_stage(name: str):
+            func, deps = self._stages[name]
+            inputs = {dep: await tasks[dep] for dep in deps}
+            start = time.perf_counter()
+            try:
+                return await func(inputs)
+            finally:
+                self.timings[name] = (start - t0, time.perf_counter() - t0)
+
+        # Stages are registered after their dependencies, so insertion order is a topological order
+        for name in self._stages:
+            tasks[name] = asyncio.create_task(run_stage(name), name=f"{self.name}:{name}")
+
+        try:
+            await asyncio.gather(*tasks.values())
+        except BaseException:
+            for task in tasks.values():
+                task.cancel()
+            await asyncio.gather(*tasks.values(), return_exceptions=True)
+            raise
+        finally:
+            self.total = time.perf_counter() - t0
+
+        return {name: task.result() for name, task in tasks.items()}
+
+    def critical_path(self) -> list:
+        """Walks back from the last stage to finish, always following the latest-finishing dependency."""
+        if not self.timings:
+            return []
+        current = max(self.timings, key=lambda n: self.timings[n][1])
+        path = [current]
+        while True:
+            deps = [d for d in self._stages[current][1] if d in self.timings]
+            if not deps:
+                break
+            current = max(deps, key=lambda n: self.timings[n][1])
+            path.append(current)
+        return list(reversed(path))
+
+    def report(self) -> str:
+        path = self.critical_path()
+        path_time = sum(self.timings[n][1] - self.timings[n][0] for n in path)
+        stages = ", ".join(f"{n}={end - start:.2f}s" for n, (start, end) in self.timings.items())
+        return f"total={self.total:.2f}s critical_path={' -> '.join(path)} ({path_time:.2f}s) | {stages}"
+
+    def record_metrics(self):
+        metrics.observe(f"{self.name}.total_s", self.total)
+        for stage, (start, end) in self.timings.items():
+            metrics.observe(f"{self.name}.stage.{stage}_s", end - start)
+        logging.info(f"⏱️ {self.name} timings: {self.report()}")
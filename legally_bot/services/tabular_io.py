@@ -0,0 +1,168 @@
+import asyncio
+import csv
+import io
+import itertools
+import json
+import logging
+from datetime import datetime
+from openpyxl import Workbook, load_workbook
+
+SUPPORTED_INPUTS = (".xlsx", ".csv", ".jsonl", ".json")
+
+def output_format_for(filename: str) -> str:
+    """Results are written in the upload's format; JSON arrays come back as JSONL."""
+    if filename.endswith(".csv"):
+        return "csv"
+    if filename.endswith(".jsonl") or filename.endswith(".json"):
+        return "jsonl"
+    return "xlsx"
+
+def _required_column(columns: list, required: str) -> str:
+    if required in columns:
+        return required
+    if required != "question":
+        raise ValueError(f"File must contain a '{required}' column.")
+    # Try to find a column that looks like a question
+    potential = [c for c in columns if 'vopros' in c.lower() or 'quest' in c.lower()]
+    if potential:
+        return potential[0]
+    raise ValueError("File must contain a 'question' column.")
+
+def _rename(rows, source: str, target: str):
+    for row in rows:
+        if source != target:
+            row[target] = row.pop(source, None)
+        yield row
+
+def _xlsx_rows(file_obj):
+    # read_only streams rows from the zip instead of building the whole sheet
+    wb = load_workbook(file_obj, read_only=True, data_only=True)
+    sheet = wb.active
+    rows = sheet.iter_rows(values_only=True)
+    header = next(rows, None) or ()
+    columns = [str(c) if c is not None else f"column_{i}" for i, c in enumerate(header)]
+
+    def generate():
+        try:
+            for values in rows:
+                if values is None or all(v is None for v in values):
+                    continue
+                yield dict(zip(columns, values))
+        finally:
+            wb.close()
+
+    return columns, generate()
+
+def _csv_rows(file_obj):
+    text = io.TextIOWrapper(file_obj, encoding="utf-8-sig", newline="")
+    reader = csv.DictReader(text)
+    columns = list(reader.fieldnames or [])
+    rows = ({k: (v if v != "" else None) for k, v in row.items()} for row in reader)
+    return columns, (row for row in rows if any(v is not None for v in row.values()))
+
+def _jsonl_rows(file_obj):
+    lines = (line for line in io.TextIOWrapper(file_obj, encoding="utf-8") if line.strip())
+    first = next(lines, None)
+    if first is None:
+        return ["question"], iter(())
+    first_row = json.loads(first)
+    columns = list(first_row.keys())
+
+    def generate():
+        yield first_row
+        for line in lines:
+            yield json.loads(line)
+
+    return columns, generate()
+
+def _json_rows(file_obj):
+    # A JSON array has to be parsed as a whole; prefer JSONL for large uploads
+    data = json.load(file_obj)
+    columns = list(data[0].keys()) if data else ["question"]
+    return columns, iter(data)
+
+def read_rows(file_obj, filename: str, required: str = "question"):
+    """
+    Returns (columns, row iterator) for an uploaded .xlsx/.csv/.jsonl/.json file.
+    Rows are produced one at a time; each dict has the `required` key.
+    """
+    try:
+        if filename.endswith(".xlsx"):
+            columns, rows = _xlsx_rows(file_obj)
+        elif filename.endswith(".csv"):
+            columns, rows = _csv_rows(file_obj)
+        elif filename.endswith(".jsonl"):
+            columns, rows = _jsonl_rows(file_obj)
+        elif filename.endswith(".json"):
+            columns, rows = _json_rows(file_obj)
+        else:
+            raise ValueError("Unsupported file format. Use .xlsx, .csv, .jsonl or .json")
+
+        source = _required_column(columns, required)
+    except Exception as e:
+        logging.error(f"Failed to parse batch file: {e}")
+        raise e
+
+    columns = [required if c == source else c for c in columns]
+    return columns, _rename(rows, source, required)
+
+async def read_chunks(rows, size: int):
+    """
+    Pulls a row iterator from read_rows() in lists of `size` rows on a worker
+    thread (async for chunk in ...), so parsing never blocks the event loop.
+    """
+    while True:
+        chunk = await asyncio.to_thread(lambda: list(itertools.islice(rows, size)))
+        if not chunk:
+            return
+        yield chunk
+
+def _cell(value):
+    if value is None or isinstance(value, (str, int, float, bool, datetime)):
+        return value
+    return json.dumps(value, ensure_ascii=False, default=str)
+
+class ResultWriter:
+    """
+    Appends result rows to an .xlsx (openpyxl write-only), .csv or .jsonl file
+    one at a time. close() returns the finished file as a BytesIO.
+    """
+    def __init__(self, fmt: str, columns: list):
+        self.fmt = fmt
+        self.columns = columns
+        self.count = 0
+        self._buffer = io.BytesIO()
+        if fmt == "xlsx":
+            self._wb = Workbook(write_only=True)
+            self._sheet = self._wb.create_sheet()
+            self._sheet.append(columns)
+        elif fmt == "csv":
+            self._text = io.TextIOWrapper(self._buffer, encoding="utf-8-sig", newline="")
+            self._csv = csv.writer(self._text)
+            self._csv.writerow(columns)
+        elif fmt == "jsonl":
+            self._text = io.TextIOWrapper(self._buffer, encoding="utf-8")
+        else:
+            raise ValueError(f"Unsupported output format: {fmt}")
+
+    @property
+    def extension(self) -> str:
+        return f".{self.fmt}"
+
+    def append(self, row: dict):
+        if self.fmt == "jsonl":
+            self._text.write(json.dumps({c: row.get(c) for c in self.columns}, ensure_ascii=False, default=str) + "\n")
+        elif self.fmt == "csv":
+            self._csv.writerow([_cell(row.get(c)) for c in self.columns])
+        else:
+            self._sheet.append([_cell(row.get(c)) for c in self.columns])
+        self.count += 1
+
+    def close(self) -> io.BytesIO:
+        if self.fmt == "xlsx":
+            self._wb.save(self._buffer)
+        else:
+            self._text.flush()
+            self._text.detach()
+        self._buffer.seek(0)
+        return self._buffer
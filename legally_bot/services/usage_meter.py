@@ -0,0 +1,72 @@
+import asyncio
+import logging
+from contextvars import ContextVar
+from legally_bot.config import settings
+from legally_bot.database.usage_repo import UsageRepository
+from legally_bot.services.metrics import metrics
+
+# (telegram_id, role) of the request currently being served; set by RAGEngine.search
+current_requester: ContextVar[tuple] = ContextVar("current_requester", default=(None, "guest"))
+# Token totals of the shared pipeline run in progress ({provider: tokens}); set inside single-flight runs
+flight_usage: ContextVar[dict] = ContextVar("flight_usage", default=None)
+
+class UsageMeter:
+    """
+    Attributes LLM token usage to the requesting Telegram user and enforces
+    per-role daily/monthly quotas before a pipeline starts.
+    """
+    def __init__(self):
+        self._pending = set()  # Background writes, kept referenced until done
+
+    def record(self, provider: str, tokens: int):
+        """Counts tokens for the current requester without delaying the answer."""
+        user_id, role = current_requester.get()
+        metrics.inc(f"tokens.{provider}", tokens)
+        metrics.inc(f"tokens.role.{role}", tokens)
+        usage = flight_usage.get()
+        if usage is not None:
+            # Shared run: every caller is charged the total afterwards (see charge())
+            usage[provider] = usage.get(provider, 0) + tokens
+            return
+        self.charge(user_id, role, {provider: tokens})
+
+    def charge(self, user_id: int, role: str, usage: dict):
+        """Adds {provider: tokens} to a user's usage in the background."""
+        if user_id is None:
+            return
+        for provider, tokens in usage.items():
+            if not tokens:
+                continue
+            task = asyncio.create_task(self._write(user_id, role, provider, tokens))
+            self._pending.add(task)
+            task.add_done_callback(self._pending.discard)
+
+    async def _write(self, user_id: int, role: str, provider: str, tokens: int):
+        try:
+            await UsageRepository.add_tokens(user_id, role, provider, tokens)
+        except Exception as e:
+            logging.error(f"Failed to record token usage for {user_id}: {e}")
+
+    async def admit(self, user_id: int, role: str, profile: str) -> str:
+        """
+        Returns the profile the user may run. Users over their daily or monthly
+        quota get the cheaper 'lite' profile instead of an error.
+        """
+        if user_id is None or profile != "full":
+            return profile
+        daily = settings.DAILY_TOKEN_QUOTAS.get(role, 0)
+        monthly = settings.MONTHLY_TOKEN_QUOTAS.get(role, 0)
+        if not daily and not monthly:
+            return profile  # 0 = unlimited
+        try:
+            usage = await UsageRepository.get_current_usage(user_id)
+        except Exception as e:
+            logging.error(f"Quota check failed for {user_id}: {e}")
+            return profile
+        if (daily and usage["day"] >= daily) or (monthly and usage["month"] >= monthly):
+            logging.info(f"🪫 User {user_id} ({role}) over token quota {usage}; using lite profile")
+            metrics.inc("quota.degraded")
+            return "lite"
+        return profile
+
+usage_meter = UsageMeter()
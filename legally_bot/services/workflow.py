@@ -1,16 +1,18 @@
-from legally_bot.database.users_repo import UsersRepository
+import logging
 from legally_bot.database.feedback_repo import FeedbackRepository
+from legally_bot.database.stats_repo import StatsRepository
 from legally_bot.services.rag_engine import RAGEngine
+from legally_bot.services.scheduler import Workload
 
 rag = RAGEngine()
 
 class WorkflowService:
     
     @staticmethod
-    async def process_student_question(user_id: int, question: str, lang: str = "ru"):
+    async def process_student_question(user_id: int, question: str, lang: str = "ru", role: str = "student"):
         # 1. Check if user is student ?? (handled in handler)
         # 2. Get answer from RAG
-        result = await rag.search(question, lang=lang)
+        result = await rag.search(question, lang=lang, user_id=user_id, role=role, workload=Workload.CASE)
         
         # 3. Save interaction ?? (Optional, depending on detailed logging requirements)
         # For now, we return the result to the handler to display
@@ -27,19 +29,24 @@ class WorkflowService:
             student_comment=comment
         )
         
-        if rating and rating > 7:
-            # Good job, increment stats
-            await UsersRepository.increment_cases_solved(user_id)
+        # Solved count (rating > 7), average score and error types in the materialized stats
+        try:
+            await StatsRepository.record_feedback(user_id, rating, error_type)
+        except Exception as e:
+            logging.error(f"Failed to update feedback stats for {user_id}: {e}")
 
     @staticmethod
-    async def get_professor_queue():
-        return await FeedbackRepository.get_pending_feedback()
+    async def claim_review(professor_id: int, skip_id: str = None):
+        """Leases the next correction for this professor (never one another professor holds)."""
+        if skip_id:
+            await FeedbackRepository.release(skip_id, professor_id)
+        return await FeedbackRepository.claim_next(professor_id, exclude_id=skip_id)
 
     @staticmethod
-    async def approve_correction(feedback_id: str, professor_id: int):
-        await FeedbackRepository.validate_feedback(feedback_id, "approved")
+    async def approve_correction(feedback_id: str, professor_id: int) -> bool:
         # Logic to retrain/add to dataset could go here
+        return await FeedbackRepository.validate_feedback(feedback_id, "approved", professor_id)
     
     @staticmethod
-    async def reject_correction(feedback_id: str, professor_id: int):
-        await FeedbackRepository.validate_feedback(feedback_id, "rejected")
+    async def reject_correction(feedback_id: str, professor_id: int) -> bool:
+        return await FeedbackRepository.validate_feedback(feedback_id, "rejected", professor_id)
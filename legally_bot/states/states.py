@@ -27,3 +27,4 @@ class AdminStates(StatesGroup):
     waiting_for_case_file = State()
     waiting_for_assignee = State()
     waiting_for_case_id = State()
+    waiting_for_assignment_file = State()
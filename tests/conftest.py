@@ -0,0 +1,9 @@
+import os
+import sys
+
+# Settings are read from the environment at import time; unit tests only need placeholders
+for name in ("BOT_TOKEN", "PINECONE_API_KEY", "PINECONE_ENV", "PINECONE_INDEX_NAME", "GEMINI_API_KEY"):
+    os.environ.setdefault(name, "test")
+os.environ.setdefault("ADMIN_IDS", "1")
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,70 @@
+import asyncio
+import pytest
+from bson import ObjectId
+from legally_bot.database.answer_pool_repo import AnswerPoolRepository
+from legally_bot.database.mongo_db import MongoDB
+from legally_bot.services.answer_pool import AnswerPoolWorker
+from legally_bot.services.answer_status import SEARCH_ERROR, SEARCH_UNAVAILABLE
+
+class FakeQuery:
+    def __init__(self, docs, query):
+        self.docs, self.query = docs, query
+
+    def sort(self, field, direction):
+        self.docs = sorted(self.docs, key=lambda d: d[field])
+        return self
+
+    async def to_list(self, length):
+        bound = self.query.get("_id", {}).get("$gt")
+        return [d for d in self.docs if bound is None or d["_id"] > bound][:length]
+
+class FakeCases:
+    def __init__(self, docs):
+        self.docs = docs
+        self.queries = []
+
+    def find(self, query, projection=None):
+        self.queries.append(query)
+        return FakeQuery(self.docs, query)
+
+@pytest.fixture
+def cases(monkeypatch):
+    docs = [{"_id": ObjectId(), "text": f"case {i}" if i != 3 else ""} for i in range(7)]
+    col = FakeCases(docs)
+    monkeypatch.setattr(MongoDB, "db", {"cases": col})
+    return col
+
+def test_cases_are_paged_by_id(cases, monkeypatch):
+    worker = AnswerPoolWorker()
+    monkeypatch.setattr(worker, "CHUNK_SIZE", 3)
+
+    async def collect():
+        return [chunk async for chunk in worker._case_chunks()]
+
+    chunks = asyncio.run(collect())
+    # Case 3 has no text and is skipped; the last page is short, so no extra query
+    assert [[c["text"] for c in chunk] for chunk in chunks] == [["case 0", "case 1", "case 2"], ["case 4", "case 5"], ["case 6"]]
+    assert cases.queries == [{}, {"_id": {"$gt": cases.docs[2]["_id"]}}, {"_id": {"$gt": cases.docs[5]["_id"]}}]
+
+def test_failed_answers_are_not_pooled(monkeypatch):
+    saved = []
+
+    async def save_answer(case, lang, version, answer, chunks, articles):
+        saved.append(answer)
+
+    monkeypatch.setattr(AnswerPoolRepository, "save_answer", save_answer)
+
+    class FakeBatchService:
+        async def run_batch(self, questions, requested_by, lang, on_result):
+            rows = [
+                {"status": "success", "answer": "Ответ.", "chunks": [], "articles": []},
+                {"status": "success", "answer": SEARCH_ERROR, "chunks": [], "articles": []},
+                {"status": "success", "answer": SEARCH_UNAVAILABLE, "chunks": [], "articles": []},
+                {"status": "failed: timeout", "answer": "Error", "chunks": [], "articles": []},
+            ]
+            for i, row in enumerate(rows):
+                await on_result(i, row)
+
+    cases = [{"_id": i, "text": f"case {i}"} for i in range(4)]
+    assert asyncio.run(AnswerPoolWorker()._generate(FakeBatchService(), cases, "ru", 1)) == 1
+    assert saved == ["Ответ."]
@@ -0,0 +1,46 @@
+import asyncio
+import pytest
+from tenacity import wait_none
+from legally_bot.services.answer_status import (
+    AnswerFailed, FAILURE_ANSWERS, SEARCH_ERROR, SEARCH_UNAVAILABLE, SERVICE_UNAVAILABLE,
+    is_failure, require_answer,
+)
+from legally_bot.services.resilience import with_retry
+
+def test_placeholders_are_failures():
+    for answer in (SEARCH_ERROR, SEARCH_UNAVAILABLE, SERVICE_UNAVAILABLE, f" {SEARCH_ERROR}\n", "", "   ", None):
+        assert is_failure(answer)
+    assert FAILURE_ANSWERS == {SEARCH_ERROR, SEARCH_UNAVAILABLE, SERVICE_UNAVAILABLE}
+
+def test_real_answer_passes():
+    answer = "⚠️ Статья 188 УК РК: кража наказывается..."
+    assert not is_failure(answer)
+    assert require_answer(answer) == answer
+
+def test_require_answer_raises_on_placeholder():
+    with pytest.raises(AnswerFailed, match="Error during search"):
+        require_answer(SEARCH_ERROR)
+    with pytest.raises(AnswerFailed):
+        require_answer(None)
+
+def test_placeholder_is_retried_then_fails():
+    answers = [SERVICE_UNAVAILABLE, SERVICE_UNAVAILABLE, SERVICE_UNAVAILABLE]
+    calls = []
+
+    @with_retry(attempts=3)
+    async def answer_question():
+        calls.append(1)
+        return require_answer(answers.pop(0))
+
+    with pytest.raises(AnswerFailed):
+        asyncio.run(answer_question.retry_with(wait=wait_none())())
+    assert len(calls) == 3
+
+def test_placeholder_is_retried_until_answered():
+    answers = [SEARCH_UNAVAILABLE, "Ответ по статье 188."]
+
+    @with_retry(attempts=3)
+    async def answer_question():
+        return require_answer(answers.pop(0))
+
+    assert asyncio.run(answer_question.retry_with(wait=wait_none())()) == "Ответ по статье 188."
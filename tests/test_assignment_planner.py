@@ -0,0 +1,49 @@
+from collections import Counter
+import pytest
+from legally_bot.services.assignment_planner import plan, plan_round_robin, plan_least_loaded
+
+CASES = [f"case{i}" for i in range(7)]
+COHORT = [101, 102, 103]
+
+def test_round_robin_deals_in_turn():
+    pairs = plan_round_robin(CASES, COHORT)
+    assert [a for _, a in pairs] == [101, 102, 103, 101, 102, 103, 101]
+
+def test_round_robin_copies_go_to_distinct_assignees():
+    pairs = plan_round_robin(CASES, COHORT, copies=2)
+    assert len(pairs) == len(CASES) * 2
+    for case_id in CASES:
+        assignees = [a for c, a in pairs if c == case_id]
+        assert len(set(assignees)) == 2
+    loads = Counter(a for _, a in pairs)
+    assert max(loads.values()) - min(loads.values()) <= 1
+
+def test_copies_are_capped_by_cohort_size():
+    pairs = plan_round_robin(["case0"], COHORT, copies=5)
+    assert sorted(a for _, a in pairs) == COHORT
+    pairs = plan_least_loaded(["case0"], COHORT, copies=5)
+    assert sorted(a for _, a in pairs) == COHORT
+
+def test_empty_cohort():
+    assert plan_round_robin(CASES, []) == []
+    assert plan_least_loaded(CASES, []) == []
+
+def test_least_loaded_fills_lightest_first():
+    pairs = plan_least_loaded(CASES[:4], COHORT, loads={101: 3, 102: 1})
+    assert [a for _, a in pairs] == [103, 102, 103, 102]
+
+def test_least_loaded_evens_out_loads():
+    loads = {101: 5, 102: 0, 103: 2}
+    pairs = plan_least_loaded(CASES, COHORT, copies=2, loads=loads)
+    for case_id in CASES:
+        assert len({a for c, a in pairs if c == case_id}) == 2
+    final = Counter(loads)
+    final.update(a for _, a in pairs)
+    assert max(final.values()) - min(final.values()) <= 1
+
+def test_least_loaded_ties_keep_cohort_order():
+    assert [a for _, a in plan_least_loaded(CASES[:3], COHORT)] == COHORT
+
+@pytest.mark.parametrize("strategy", ["round_robin", "least_loaded"])
+def test_plan_dispatch(strategy):
+    assert len(plan(strategy, CASES, COHORT, copies=2)) == len(CASES) * 2
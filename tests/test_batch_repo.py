@@ -0,0 +1,67 @@
+import asyncio
+import pytest
+from legally_bot.database.batch_repo import BatchJobRepository
+from legally_bot.database.mongo_db import MongoDB
+
+class FakeCollection:
+    def __init__(self, fail_insert_after: int = None):
+        self.docs = []
+        self.fail_insert_after = fail_insert_after
+
+    async def insert_one(self, doc):
+        doc = {**doc, "_id": len(self.docs) + 1}
+        self.docs.append(doc)
+        return type("Result", (), {"inserted_id": doc["_id"]})()
+
+    async def insert_many(self, docs, ordered=True):
+        if self.fail_insert_after is not None and len(self.docs) >= self.fail_insert_after:
+            raise ConnectionError("mongo down")
+        self.docs.extend(docs)
+
+    async def update_one(self, query, update):
+        for doc in self.docs:
+            if doc["_id"] == query["_id"]:
+                doc.update(update["$set"])
+
+    async def delete_many(self, query):
+        self.docs = [d for d in self.docs if d["job_id"] != query["job_id"]]
+
+@pytest.fixture
+def collections(monkeypatch):
+    cols = {BatchJobRepository.jobs: FakeCollection(), BatchJobRepository.items: FakeCollection()}
+
+    class FakeDb:
+        def __getitem__(self, name):
+            return cols[name]
+
+    monkeypatch.setattr(MongoDB, "db", FakeDb())
+    return cols
+
+async def chunks(*batches, error: Exception = None):
+    for rows in batches:
+        yield rows
+    if error:
+        raise error
+
+def create(source):
+    return asyncio.run(BatchJobRepository.create_job("q.xlsx", 1, 1, ["question"], source))
+
+def test_create_job_inserts_items_and_runs(collections):
+    job_id = create(chunks([{"question": "a"}, {"question": "b"}], [{"question": "c"}]))
+    job = collections[BatchJobRepository.jobs].docs[0]
+    assert job["_id"] == job_id
+    assert (job["status"], job["total"]) == ("running", 3)
+    assert [i["index"] for i in collections[BatchJobRepository.items].docs] == [0, 1, 2]
+
+def test_parse_error_fails_job_and_removes_items(collections):
+    with pytest.raises(ValueError):
+        create(chunks([{"question": "a"}, {"question": "b"}], error=ValueError("bad row")))
+    assert collections[BatchJobRepository.jobs].docs[0]["status"] == "failed"
+    assert collections[BatchJobRepository.items].docs == []
+
+def test_insert_error_fails_job_and_removes_items(collections):
+    collections[BatchJobRepository.items].fail_insert_after = 1
+    with pytest.raises(ConnectionError):
+        create(chunks([{"question": "a"}], [{"question": "b"}]))
+    assert collections[BatchJobRepository.jobs].docs[0]["status"] == "failed"
+    assert collections[BatchJobRepository.items].docs == []
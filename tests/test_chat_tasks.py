@@ -0,0 +1,57 @@
+import asyncio
+from legally_bot.services.chat_tasks import ChatTaskRegistry
+
+def test_burst_is_coalesced_into_one_query():
+    queries = []
+
+    async def runner(query):
+        queries.append(query)
+
+    async def main():
+        registry = ChatTaskRegistry(debounce=0.01)
+        registry.submit(1, "first", runner)
+        registry.submit(1, "second", runner)
+        await asyncio.sleep(0.05)
+
+    asyncio.run(main())
+    assert queries == ["first\nsecond"]
+
+def test_superseded_delivery_is_sent_in_full_and_not_merged_again():
+    sent, queries = [], []
+
+    async def send(query):
+        sent.append(f"{query}:start")
+        await asyncio.sleep(0.02)
+        sent.append(f"{query}:end")
+
+    async def main():
+        registry = ChatTaskRegistry(debounce=0)
+
+        async def runner(query):
+            queries.append(query)
+            await registry.deliver(1, send(query))
+
+        registry.submit(1, "first", runner)
+        await asyncio.sleep(0.01)  # "first" is being sent
+        registry.submit(1, "second", runner)
+        await asyncio.sleep(0.1)
+
+    asyncio.run(main())
+    assert queries == ["first", "second"]
+    # The superseded answer still finishes; the new query does not repeat "first"
+    assert sorted(sent) == ["first:end", "first:start", "second:end", "second:start"]
+
+def test_cancel_drops_pending_work():
+    queries = []
+
+    async def runner(query):
+        queries.append(query)
+
+    async def main():
+        registry = ChatTaskRegistry(debounce=0.01)
+        registry.submit(1, "first", runner)
+        assert registry.cancel(1)
+        await asyncio.sleep(0.03)
+
+    asyncio.run(main())
+    assert queries == []
@@ -0,0 +1,66 @@
+import asyncio
+import pytest
+from legally_bot.config import settings
+from legally_bot.database.event_log import EventLogger
+from legally_bot.database.mongo_db import MongoDB
+
+class FakeCollection:
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.docs = []
+
+    async def insert_many(self, docs, ordered=True):
+        if self.fail:
+            raise ConnectionError("mongo down")
+        self.docs.extend(docs)
+
+@pytest.fixture
+def collections(monkeypatch):
+    cols = {}
+
+    class FakeDb:
+        def __getitem__(self, name):
+            return cols.setdefault(name, FakeCollection())
+
+    monkeypatch.setattr(MongoDB, "db", FakeDb())
+    return cols
+
+def test_write_through_without_flusher(collections):
+    logger = EventLogger()
+    assert asyncio.run(logger.log("chat", {"q": 1}))
+    assert collections["chat"].docs == [{"q": 1}]
+    assert logger.pending == 0
+
+def test_failed_flush_is_retried_then_dropped(collections):
+    collections["chat"] = FakeCollection(fail=True)
+    logger = EventLogger()
+
+    async def main():
+        logger._buffers["chat"] = [{"q": 1}, {"q": 2}]
+        logger._pending = 2
+        for _ in range(settings.EVENT_LOG_MAX_RETRIES - 1):
+            await logger.flush()
+            assert logger.pending == 2
+        await logger.flush()
+
+    asyncio.run(main())
+    assert logger.pending == 0
+    assert "chat" not in logger._buffers
+
+def test_unencodable_documents_are_dead_lettered(collections):
+    collections["chat"] = FakeCollection(fail=True)
+    logger = EventLogger()
+
+    async def main():
+        logger._buffers["chat"] = [{"q": 1}, {"q": object()}]
+        logger._pending = 2
+        await logger.flush()
+        # The valid document is retried once Mongo is back
+        collections["chat"].fail = False
+        await logger.flush()
+
+    asyncio.run(main())
+    assert collections["chat"].docs == [{"q": 1}]
+    dead = collections[EventLogger.DEAD_LETTERS].docs
+    assert len(dead) == 1 and dead[0]["collection"] == "chat"
+    assert logger.pending == 0
@@ -0,0 +1,61 @@
+import pytest
+from legally_bot.services.intent_router import IntentRouter, Intent
+
+router = IntentRouter()
+
+@pytest.mark.parametrize("query", ["Привет", "hello!", "Сәлем", "спасибо."])
+def test_greetings(query):
+    assert router.classify(query).intent == Intent.GREETING
+
+@pytest.mark.parametrize("query, article", [
+    ("Статья 15", "15"),
+    ("ст. 188-1", "188-1"),
+    ("article 7?", "7"),
+    ("15 бап", None),
+])
+def test_article_lookup(query, article):
+    decision = router.classify(query)
+    if article is None:
+        assert decision.intent != Intent.ARTICLE_LOOKUP
+    else:
+        assert decision.intent == Intent.ARTICLE_LOOKUP
+        assert decision.article == article
+        assert decision.code is None
+
+@pytest.mark.parametrize("query, code", [
+    ("ст. 15 ГК РК", "civil"),
+    ("статья 188 УК", "criminal"),
+    ("статья 50 гражданского процессуального кодекса", "civil_procedure"),
+    ("article 12 labor code", "labor"),
+    ("бап 5 салық кодексі", "tax"),
+])
+def test_article_lookup_with_code(query, code):
+    decision = router.classify(query)
+    assert decision.intent == Intent.ARTICLE_LOOKUP
+    assert decision.code == code
+
+def test_long_article_question_is_legal_question():
+    decision = router.classify("статья 15 что будет если работодатель не платит зарплату")
+    assert decision.intent == Intent.LEGAL_QUESTION
+
+@pytest.mark.parametrize("title, code", [
+    ("Гражданский кодекс Республики Казахстан (Общая часть)", "civil"),
+    ("Гражданский процессуальный кодекс Республики Казахстан", "civil_procedure"),
+    ("Уголовно-процессуальный кодекс Республики Казахстан", "criminal_procedure"),
+    ("Кодекс Республики Казахстан о браке (супружестве) и семье", "family"),
+    ("Конституция Республики Казахстан", None),
+])
+def test_code_of_source_title(title, code):
+    assert router.code_of(title) == code
+
+@pytest.mark.parametrize("query, intent", [
+    ("можно ли расторгнуть договор аренды", Intent.LEGAL_QUESTION),
+    ("какая погода завтра", Intent.OFF_TOPIC),
+    ("ok", Intent.OFF_TOPIC),
+    ("", Intent.OFF_TOPIC),
+])
+def test_classify(query, intent):
+    assert router.classify(query).intent == intent
+
+def test_cited_articles():
+    assert router.cited_articles("по ст. 15 и статье 16-1 ГК") == ["15", "16-1"]
@@ -0,0 +1,77 @@
+import pytest
+from legally_bot.services import load_shedder as ls
+from legally_bot.services.load_shedder import ProviderHealth
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(ls.time, "monotonic", fake)
+    return fake
+
+def health():
+    return ProviderHealth(failure_threshold=3, cooldown=60, slow_seconds=25)
+
+def test_failures_trip_until_cooldown(clock):
+    h = health()
+    for _ in range(3):
+        h.record_failure("groq")
+    assert not h.is_healthy("groq")
+    clock.now += 60
+    assert h.is_healthy("groq")
+
+def test_slow_provider_recovers_after_fast_probe(clock):
+    h = health()
+    h.record_success("deepseek", 40.0)
+    assert not h.is_healthy("deepseek")
+    assert not h.admit("deepseek")
+
+    clock.now += 60
+    assert h.is_healthy("deepseek")
+    # One probe at a time
+    assert h.admit("deepseek")
+    assert not h.admit("deepseek")
+
+    h.record_success("deepseek", 5.0)
+    assert h.is_healthy("deepseek")
+    assert h.admit("deepseek") and h.admit("deepseek")
+    # The slow reply no longer weighs on the average
+    h.record_success("deepseek", 6.0)
+    assert h.is_healthy("deepseek")
+
+def test_slow_probe_restarts_cooldown(clock):
+    h = health()
+    h.record_success("deepseek", 40.0)
+    clock.now += 60
+    assert h.admit("deepseek")
+    h.record_success("deepseek", 30.0)
+    assert not h.is_healthy("deepseek")
+    clock.now += 60
+    assert h.admit("deepseek")
+
+def test_failed_probe_restarts_cooldown(clock):
+    h = health()
+    h.record_success("deepseek", 40.0)
+    clock.now += 60
+    assert h.admit("deepseek")
+    h.record_failure("deepseek")
+    assert not h.is_healthy("deepseek")
+
+def test_stale_probe_is_replaced(clock):
+    h = health()
+    h.record_success("deepseek", 40.0)
+    clock.now += 60
+    assert h.admit("deepseek")
+    clock.now += 60  # The probe never reported back
+    assert h.admit("deepseek")
+
+def test_fast_provider_is_healthy(clock):
+    h = health()
+    h.record_success("gemini", 3.0)
+    assert h.is_healthy("gemini") and h.admit("gemini")
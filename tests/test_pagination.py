@@ -0,0 +1,60 @@
+from datetime import datetime
+from bson import ObjectId
+import pytest
+from legally_bot.database.pagination import keyset_query, keyset_page, parse_cursor
+
+def test_parse_cursor():
+    oid = ObjectId()
+    assert parse_cursor("n", str(oid)) == {"after": oid}
+    assert parse_cursor("p", str(oid)) == {"before": oid}
+
+@pytest.mark.parametrize("cursor", ["", "not-an-id", "123", None])
+def test_parse_cursor_rejects_invalid_ids(cursor):
+    assert parse_cursor("n", cursor) == {}
+
+def test_keyset_query_bounds_and_sort():
+    oid = ObjectId()
+    assert keyset_query({"status": "x"}) == ({"status": "x"}, [("_id", 1)])
+    assert keyset_query({}, after=oid) == ({"_id": {"$gt": oid}}, [("_id", 1)])
+    assert keyset_query({}, before=oid) == ({"_id": {"$lt": oid}}, [("_id", -1)])
+    assert keyset_query({}, after=oid, descending=True) == ({"_id": {"$lt": oid}}, [("_id", -1)])
+    assert keyset_query({}, before=oid, descending=True) == ({"_id": {"$gt": oid}}, [("_id", 1)])
+
+DOCS = [{"_id": ObjectId.from_datetime(datetime(2024, 1, 1, 0, i))} for i in range(7)]
+
+def fetch(limit, descending=False, **cursor):
+    """Runs keyset_query + keyset_page against an in-memory collection."""
+    query, sort = keyset_query({}, descending=descending, **cursor)
+    docs = list(DOCS)
+    bound = query.get("_id", {})
+    if "$gt" in bound:
+        docs = [d for d in docs if d["_id"] > bound["$gt"]]
+    if "$lt" in bound:
+        docs = [d for d in docs if d["_id"] < bound["$lt"]]
+    docs.sort(key=lambda d: d["_id"], reverse=sort[0][1] == -1)
+    return keyset_page(docs[:limit + 1], limit, **cursor)
+
+@pytest.mark.parametrize("descending", [False, True])
+def test_walk_forward_and_back(descending):
+    ordered = sorted(DOCS, key=lambda d: d["_id"], reverse=descending)
+    pages, page = [], fetch(3, descending)
+    assert not page["has_prev"]
+    while True:
+        pages.append(page["items"])
+        if not page["has_next"]:
+            break
+        page = fetch(3, descending, after=page["last"])
+    assert [d for p in pages for d in p] == ordered
+    assert [len(p) for p in pages] == [3, 3, 1]
+
+    # Back from the last page
+    page = fetch(3, descending, before=pages[-1][0]["_id"])
+    assert page["items"] == pages[1]
+    assert page["has_prev"] and page["has_next"]
+    page = fetch(3, descending, before=page["first"])
+    assert page["items"] == pages[0]
+    assert not page["has_prev"]
+
+def test_empty_page():
+    page = keyset_page([], 3, after=ObjectId())
+    assert page == {"items": [], "has_prev": False, "has_next": False, "first": None, "last": None}
@@ -0,0 +1,120 @@
+import asyncio
+import pytest
+from legally_bot.services import rate_governor as rg
+from legally_bot.services.rate_governor import RateGovernor, TokenBucket
+
+class FakeClock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+@pytest.fixture
+def clock(monkeypatch):
+    fake = FakeClock()
+    monkeypatch.setattr(rg.time, "monotonic", fake)
+    return fake
+
+def test_bucket_refills_at_rate(clock):
+    bucket = TokenBucket(capacity=60, per_minute=60)
+    bucket.take(60)
+    assert bucket.wait_time(1) == pytest.approx(1.0)
+    clock.now += 30
+    assert bucket.wait_time(30) == 0.0
+    clock.now += 1000
+    bucket._refill()
+    assert bucket.level == 60
+
+def test_oversized_request_only_needs_a_full_bucket(clock):
+    bucket = TokenBucket(capacity=100, per_minute=60)
+    assert bucket.wait_time(500) == 0.0
+    bucket.take(500)
+    assert bucket.level == 0
+
+def test_adjust_returns_overestimate(clock):
+    bucket = TokenBucket(capacity=100, per_minute=60)
+    bucket.take(80)
+    bucket.adjust(30)
+    assert bucket.level == pytest.approx(50)
+    bucket.adjust(1000)
+    assert bucket.level == 100
+
+def test_clamp_blocks_until_reset(clock):
+    bucket = TokenBucket(capacity=100, per_minute=6000)
+    bucket.clamp(0, reset_in=5)
+    assert bucket.wait_time(1) == pytest.approx(5)
+    clock.now += 5
+    assert bucket.wait_time(1) == 0.0
+
+def test_saturation(clock):
+    bucket = TokenBucket(capacity=100, per_minute=60)
+    bucket.take(25)
+    assert bucket.saturation() == pytest.approx(0.25)
+
+@pytest.mark.parametrize("value, seconds", [
+    ("7.66s", 7.66),
+    ("1m30.5s", 90.5),
+    ("120ms", 0.12),
+    ("2", 2.0),
+    (None, None),
+])
+def test_parse_duration(value, seconds):
+    result = RateGovernor._parse_duration(value)
+    assert result == (pytest.approx(seconds) if seconds is not None else None)
+
+def governor():
+    return RateGovernor(limits={"groq": (30, 6000), "deepseek": (20, 100000)}, max_wait=1.0)
+
+def test_update_from_headers_clamps_buckets(clock):
+    gov = governor()
+    gov.update_from_headers("deepseek", {
+        "X-RateLimit-Remaining-Requests": "3",
+        "X-RateLimit-Reset-Requests": "2s",
+        "X-RateLimit-Remaining-Tokens": "500",
+        "X-RateLimit-Reset-Tokens": "1m",
+    })
+    limiter = gov.providers["deepseek"]
+    assert limiter.requests.level == 3
+    assert limiter.tokens.level == 500
+
+def test_groq_daily_request_counter_leaves_minute_bucket_alone(clock):
+    gov = governor()
+    gov.update_from_headers("groq", {
+        "x-ratelimit-limit-requests": "14400",
+        "x-ratelimit-remaining-requests": "3",
+        "x-ratelimit-reset-requests": "2m59.56s",
+        "x-ratelimit-remaining-tokens": "5000",
+        "x-ratelimit-reset-tokens": "10s",
+    })
+    limiter = gov.providers["groq"]
+    assert limiter.requests.level == 30
+    assert limiter.tokens.level == 5000
+
+def test_groq_exhausted_daily_quota_blocks_until_reset(clock):
+    gov = governor()
+    gov.update_from_headers("groq", {"x-ratelimit-remaining-requests": "0", "x-ratelimit-reset-requests": "1h"})
+    assert gov.wait_time("groq", 10) == pytest.approx(3600)
+
+def test_update_from_headers_exhausted_blocks(clock):
+    gov = governor()
+    gov.update_from_headers("groq", {"x-ratelimit-remaining-tokens": "0", "x-ratelimit-reset-tokens": "7.5s"})
+    assert gov.wait_time("groq", 10) == pytest.approx(7.5)
+
+def test_update_from_headers_retry_after(clock):
+    gov = governor()
+    gov.update_from_headers("groq", {"Retry-After": "12"})
+    assert gov.wait_time("groq", 10) == pytest.approx(12)
+
+def test_update_from_headers_ignores_garbage_and_unknown(clock):
+    gov = governor()
+    gov.update_from_headers("groq", {"x-ratelimit-remaining-requests": "n/a"})
+    gov.update_from_headers("unknown", {"retry-after": "5"})
+    gov.update_from_headers("groq", None)
+    assert gov.wait_time("groq", 10) == 0.0
+
+def test_acquire_gives_up_after_max_wait(clock):
+    gov = governor()
+    gov.update_from_headers("groq", {"retry-after": "30"})
+    assert asyncio.run(gov.acquire("groq", 10)) is False
+    assert asyncio.run(gov.acquire("unconfigured", 10)) is True
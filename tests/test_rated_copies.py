@@ -0,0 +1,73 @@
+import asyncio
+import pytest
+from legally_bot.config import settings
+from legally_bot.database import case_repo
+from legally_bot.database.case_repo import CaseRepository
+from legally_bot.database.event_log import EventLogger
+from legally_bot.database.mongo_db import MongoDB
+
+class FakeCollection:
+    def __init__(self, name):
+        self.name = name
+        self.docs = []
+
+    async def find_one_and_update(self, query, update, return_document=None, session=None):
+        for doc in self.docs:
+            if doc["_id"] == query["_id"] and doc.get("status") != "rated":
+                doc.update(update["$set"])
+                return dict(doc)
+        return None
+
+    async def insert_one(self, doc, session=None):
+        self.docs.append(doc)
+
+    async def insert_many(self, docs, ordered=True):
+        self.docs.extend(docs)
+
+class FakeDb:
+    def __init__(self):
+        self.cols = {}
+
+    def __getitem__(self, name):
+        return self.cols.setdefault(name, FakeCollection(name))
+
+    def __getattr__(self, name):
+        return self[name]
+
+@pytest.fixture
+def repo(monkeypatch):
+    db = FakeDb()
+    monkeypatch.setattr(MongoDB, "db", db)
+    monkeypatch.setattr(case_repo, "event_log", EventLogger())
+    monkeypatch.setattr(settings, "MONGO_TRANSACTIONS", False)
+
+    async def no_stats(self, rated):
+        pass
+
+    monkeypatch.setattr(CaseRepository, "_record_rating_stats", no_stats)
+    db.assignments.docs = [{"_id": i, "case_id": 100 + i, "status": "assigned"} for i in range(3)]
+    return CaseRepository(db)
+
+def rate(repo, assignment_id):
+    return repo.submit_rating(assignment_id, {"question": 8, "chunk": 7, "article": 9}, "ok", 42)
+
+def test_rated_copy_written_directly(repo, monkeypatch):
+    monkeypatch.setattr(settings, "RATED_COPY_BUFFERED", False)
+    assert asyncio.run(rate(repo, 0))
+    assert not asyncio.run(rate(repo, 0))
+    assert [d["assignment_id"] for d in repo.rated_questions.docs] == [0]
+
+def test_buffered_rated_copies_are_written_in_bulk(repo, monkeypatch):
+    monkeypatch.setattr(settings, "RATED_COPY_BUFFERED", True)
+
+    async def session():
+        case_repo.event_log.start()
+        for i in range(3):
+            assert await rate(repo, i)
+        assert repo.rated_questions.docs == []
+        assert case_repo.event_log.pending == 3
+        await case_repo.event_log.close()
+
+    asyncio.run(session())
+    assert sorted(d["assignment_id"] for d in repo.rated_questions.docs) == [0, 1, 2]
+    assert all(d["ratings"]["article"] == 9 for d in repo.rated_questions.docs)
@@ -0,0 +1,91 @@
+import asyncio
+from legally_bot.services.scheduler import RAGScheduler, Workload
+
+def test_fast_path_and_release():
+    async def main():
+        scheduler = RAGScheduler(slots=2, user_limit=2, batch_user_limit=1)
+        async with scheduler.slot(1, "student", Workload.INTERACTIVE):
+            assert scheduler.active == 1
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert scheduler.active == 0
+    assert scheduler.queue_depth() == 0
+
+def test_chat_starts_while_capped_batch_user_is_queued():
+    async def main():
+        scheduler = RAGScheduler(slots=4, user_limit=2, batch_user_limit=1)
+        running = await scheduler.acquire(100, "admin", Workload.BATCH)
+        # Same batch user again: over the cap, so these wait with slots free
+        waiting = [asyncio.create_task(scheduler.acquire(100, "admin", Workload.BATCH)) for _ in range(3)]
+        await asyncio.sleep(0)
+        assert scheduler.queue_depth() == 3
+        assert scheduler.active == 1
+
+        chat = await asyncio.wait_for(scheduler.acquire(7, "student", Workload.INTERACTIVE), 0.5)
+        assert scheduler.active == 2
+        assert scheduler.queue_depth() == 3
+
+        scheduler._release(chat)
+        scheduler._release(running)
+        await asyncio.sleep(0)
+        assert sum(t.done() for t in waiting) == 1
+        for task in waiting:
+            task.cancel()
+        await asyncio.gather(*waiting, return_exceptions=True)
+
+    asyncio.run(main())
+
+def test_higher_weight_flow_is_served_first():
+    order = []
+
+    async def worker(scheduler, user_id, role, workload):
+        async with scheduler.slot(user_id, role, workload):
+            order.append(workload)
+            await asyncio.sleep(0)
+
+    async def main():
+        scheduler = RAGScheduler(slots=1, user_limit=10, batch_user_limit=10)
+        blocker = await scheduler.acquire(0, "admin", Workload.INTERACTIVE)
+        tasks = [asyncio.create_task(worker(scheduler, 1, "admin", Workload.BATCH)) for _ in range(3)]
+        await asyncio.sleep(0)
+        tasks += [asyncio.create_task(worker(scheduler, 2, "student", Workload.INTERACTIVE)) for _ in range(3)]
+        await asyncio.sleep(0)
+        scheduler._release(blocker)
+        await asyncio.gather(*tasks)
+
+    asyncio.run(main())
+    # Interactive (weight 8*2) overtakes batch (weight 1*4) queued earlier
+    assert order[:3] == [Workload.INTERACTIVE] * 3
+    assert order[3:] == [Workload.BATCH] * 3
+
+def test_per_user_cap_lets_other_users_through():
+    async def main():
+        scheduler = RAGScheduler(slots=3, user_limit=1, batch_user_limit=1)
+        first = await scheduler.acquire(1, "student", Workload.CASE)
+        second = asyncio.create_task(scheduler.acquire(1, "student", Workload.CASE))
+        await asyncio.sleep(0)
+        other = await asyncio.wait_for(scheduler.acquire(2, "student", Workload.CASE), 0.5)
+        assert not second.done()
+        scheduler._release(first)
+        await asyncio.wait_for(second, 0.5)
+        scheduler._release(second.result())
+        scheduler._release(other)
+        return scheduler
+
+    scheduler = asyncio.run(main())
+    assert scheduler.active == 0
+
+def test_cancelled_waiter_leaves_queue():
+    async def main():
+        scheduler = RAGScheduler(slots=1, user_limit=5, batch_user_limit=5)
+        held = await scheduler.acquire(1, "user", Workload.INTERACTIVE)
+        waiter = asyncio.create_task(scheduler.acquire(2, "user", Workload.INTERACTIVE))
+        await asyncio.sleep(0)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        assert scheduler.queue_depth() == 0
+        scheduler._release(held)
+        return scheduler
+
+    assert asyncio.run(main()).active == 0
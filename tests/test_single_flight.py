@@ -0,0 +1,109 @@
+import asyncio
+import pytest
+from legally_bot.services.single_flight import SingleFlight
+
+def test_concurrent_callers_share_one_run():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        results = await asyncio.gather(*(flight.do("key", work) for _ in range(5)))
+        return flight, results
+
+    flight, results = asyncio.run(main())
+    assert results == ["result"] * 5
+    assert calls == [1]
+    assert flight._inflight == {}
+
+def test_different_keys_run_separately():
+    calls = []
+
+    async def work():
+        calls.append(1)
+        return len(calls)
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("a", work), flight.do("b", work))
+
+    assert sorted(asyncio.run(main())) == [1, 2]
+
+def test_exception_reaches_every_caller():
+    async def work():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("boom")
+
+    async def main():
+        flight = SingleFlight("test")
+        return await asyncio.gather(flight.do("key", work), flight.do("key", work), return_exceptions=True)
+
+    results = asyncio.run(main())
+    assert all(isinstance(r, RuntimeError) for r in results)
+
+def test_cancelled_leader_does_not_cancel_joiner():
+    async def work():
+        await asyncio.sleep(0.02)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        joiner = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await leader
+        return await joiner
+
+    assert asyncio.run(main()) == "result"
+
+def test_shared_run_is_cancelled_when_every_caller_gives_up():
+    cancelled = []
+
+    async def work():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        flight = SingleFlight("test")
+        callers = [asyncio.create_task(flight.do("key", work)) for _ in range(2)]
+        await asyncio.sleep(0)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0)
+        return flight
+
+    flight = asyncio.run(main())
+    assert cancelled == [True]
+    assert flight._inflight == {}
+
+def test_caller_arriving_after_abandonment_starts_a_new_run():
+    runs = []
+
+    async def work():
+        runs.append(1)
+        await asyncio.sleep(0.01)
+        return "result"
+
+    async def main():
+        flight = SingleFlight("test")
+        leader = asyncio.create_task(flight.do("key", work))
+        await asyncio.sleep(0)
+        leader.cancel()
+        # Runs right after the leader gives up, before the abandoned run has finished cancelling
+        joiner = asyncio.create_task(flight.do("key", work))
+        await asyncio.gather(leader, return_exceptions=True)
+        return await joiner
+
+    assert asyncio.run(main()) == "result"
+    assert len(runs) == 2
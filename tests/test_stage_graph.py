@@ -0,0 +1,57 @@
+import asyncio
+import pytest
+from legally_bot.services.stage_graph import StageGraph
+
+def test_stages_receive_dependency_results():
+    async def main():
+        graph = StageGraph("test")
+        graph.add("a", lambda r: asyncio.sleep(0, result=2))
+        graph.add("b", lambda r: asyncio.sleep(0, result=3))
+        graph.add("sum", lambda r: asyncio.sleep(0, result=r["a"] + r["b"]), deps=["a", "b"])
+        return await graph.run()
+
+    assert asyncio.run(main()) == {"a": 2, "b": 3, "sum": 5}
+
+def test_independent_branches_overlap():
+    async def main():
+        graph = StageGraph("test")
+        graph.add("slow", lambda r: asyncio.sleep(0.05, result="slow"))
+        graph.add("fast", lambda r: asyncio.sleep(0.01, result="fast"))
+        graph.add("join", lambda r: asyncio.sleep(0, result=None), deps=["slow", "fast"])
+        await graph.run()
+        return graph
+
+    graph = asyncio.run(main())
+    assert graph.total < 0.09
+    assert graph.timings["fast"][0] < graph.timings["slow"][1]
+    assert graph.critical_path() == ["slow", "join"]
+    assert "critical_path=slow -> join" in graph.report()
+
+def test_unknown_dependency_is_rejected():
+    graph = StageGraph("test")
+    with pytest.raises(ValueError):
+        graph.add("b", lambda r: asyncio.sleep(0), deps=["a"])
+
+def test_failure_cancels_running_stages():
+    cancelled = []
+
+    async def boom(r):
+        raise RuntimeError("boom")
+
+    async def long(r):
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    async def main():
+        graph = StageGraph("test")
+        graph.add("long", long)
+        graph.add("boom", boom)
+        graph.add("after", lambda r: asyncio.sleep(0), deps=["boom"])
+        await graph.run()
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(main())
+    assert cancelled == [True]
@@ -0,0 +1,75 @@
+import asyncio
+import json
+from datetime import datetime
+import pytest
+from legally_bot.services.tabular_io import ResultWriter, read_rows, read_chunks, output_format_for
+
+COLUMNS = ["question", "subject", "chunks"]
+ROWS = [
+    {"question": "Что такое иск?", "subject": "Civil", "chunks": [{"key": "a", "score": 0.5}]},
+    {"question": "What is a claim?", "subject": None, "chunks": []},
+    {"question": "Талап деген не?", "subject": "Civil", "chunks": None},
+]
+
+@pytest.mark.parametrize("fmt", ["xlsx", "csv", "jsonl"])
+def test_result_writer_round_trip(fmt):
+    writer = ResultWriter(fmt, COLUMNS)
+    for row in ROWS:
+        writer.append(row)
+    assert writer.count == len(ROWS)
+
+    columns, rows = read_rows(writer.close(), f"result{writer.extension}")
+    rows = list(rows)
+    assert columns == COLUMNS
+    assert [r["question"] for r in rows] == [r["question"] for r in ROWS]
+    assert [r["subject"] for r in rows] == [r["subject"] for r in ROWS]
+    if fmt == "jsonl":
+        assert rows[0]["chunks"] == ROWS[0]["chunks"]
+    else:
+        # Lists are written as JSON text in flat formats
+        assert json.loads(rows[0]["chunks"]) == ROWS[0]["chunks"]
+
+def test_question_column_is_detected_and_renamed():
+    writer = ResultWriter("csv", ["Vopros", "note"])
+    writer.append({"Vopros": "Что такое иск?", "note": "x"})
+    columns, rows = read_rows(writer.close(), "upload.csv")
+    assert columns == ["question", "note"]
+    assert list(rows) == [{"question": "Что такое иск?", "note": "x"}]
+
+def test_missing_required_column():
+    writer = ResultWriter("csv", ["question"])
+    writer.append({"question": "q"})
+    with pytest.raises(ValueError):
+        read_rows(writer.close(), "upload.csv", required="case_id")
+
+def test_empty_rows_are_skipped():
+    writer = ResultWriter("xlsx", ["question", "subject"])
+    writer.append({"question": "q1"})
+    writer.append({})
+    writer.append({"question": "q2", "subject": "s"})
+    _, rows = read_rows(writer.close(), "upload.xlsx")
+    assert [r["question"] for r in rows] == ["q1", "q2"]
+
+def test_xlsx_keeps_datetimes():
+    writer = ResultWriter("xlsx", ["question", "at"])
+    at = datetime(2024, 5, 1, 12, 30)
+    writer.append({"question": "q", "at": at})
+    _, rows = read_rows(writer.close(), "upload.xlsx")
+    assert next(rows)["at"] == at
+
+def test_read_chunks():
+    writer = ResultWriter("jsonl", ["question"])
+    for i in range(5):
+        writer.append({"question": f"q{i}"})
+    _, rows = read_rows(writer.close(), "upload.jsonl")
+
+    async def collect():
+        return [chunk async for chunk in read_chunks(rows, 2)]
+
+    chunks = asyncio.run(collect())
+    assert [len(c) for c in chunks] == [2, 2, 1]
+    assert chunks[2][0]["question"] == "q4"
+
+@pytest.mark.parametrize("filename, fmt", [("a.csv", "csv"), ("a.json", "jsonl"), ("a.jsonl", "jsonl"), ("a.xlsx", "xlsx")])
+def test_output_format_for(filename, fmt):
+    assert output_format_for(filename) == fmt